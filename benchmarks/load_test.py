@@ -0,0 +1,267 @@
+"""Load test of the quiz server: many concurrent sessions fetching and answering questions.
+
+    python -m benchmarks.load_test --sessions 2000 --rate 2000 --duration 20 [--workers N] [--ws]
+    python -m benchmarks.load_test --url http://host:8765 ...
+
+Starts ``python -m src.server`` on a free local port (unless --url is given),
+opens --sessions keep-alive connections (WebSockets with --ws) and starts a
+quiz on each. Every session then alternates between fetching its question
+and answering it, pausing for exponentially distributed think times so
+requests arrive at --rate per second overall. Latency is measured from
+sending a request to reading its whole response, after all sessions have
+started. Prints percentiles per request type as JSON and exits with status
+1 if the overall p99 is above --p99-ms. The client runs in this process, so
+on a small machine it competes with the server for CPU.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from src.server.app import raise_file_limit
+from src.server.protocol import CLOSE, TEXT, read_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+P99_TARGET_MS = 10.0
+
+
+class HttpClient:
+    """One keep-alive connection; follows the server's redirects to the worker holding a session"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.session = None
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(head[0].split(" ")[1])
+        headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in head[1:] if line)}
+        length = int(headers.get("content-length", 0))
+        data = json.loads(await self.reader.readexactly(length)) if length else None
+        if status == 307:
+            self.writer.close()
+            self.port = int(headers["location"].split("/")[2].rsplit(":", 1)[1])
+            await self.connect()
+            return await self.request(method, path, payload)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path}: {status} {data}")
+        return data
+
+    async def start(self, options):
+        self.session = (await self.request("POST", "/sessions", options))["session"]
+
+    async def question(self):
+        return await self.request("GET", f"/sessions/{self.session}/question")
+
+    async def answer(self, question_id, text):
+        return await self.request("POST", f"/sessions/{self.session}/answer", {"id": question_id, "answer": text})
+
+    def close(self):
+        self.writer.close()
+
+
+class WebSocketClient:
+    """One WebSocket connection, which is one session on the server"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        self.writer.write(f"GET /ws HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nUpgrade: websocket\r\n"
+                          f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+                          .encode("latin-1"))
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        if not head.startswith(b"HTTP/1.1 101"):
+            raise RuntimeError(f"WebSocket handshake failed: {head[:40]!r}")
+
+    async def call(self, message):
+        payload = json.dumps(message).encode("utf-8")
+        # Client frames must be masked; an all-zero mask leaves the payload as it is
+        n = len(payload)
+        length = bytes((0x80 | n,)) if n < 126 else bytes((0x80 | 126,)) + n.to_bytes(2, "big")
+        self.writer.write(bytes((0x80 | TEXT,)) + length + bytes(4) + payload)
+        opcode, reply = await read_frame(self.reader)
+        if opcode == CLOSE:
+            raise ConnectionError("server closed the WebSocket")
+        data = json.loads(reply)
+        if "error" in data:
+            raise RuntimeError(f"{message['op']}: {data['status']} {data['error']}")
+        return data
+
+    async def start(self, options):
+        await self.call({"op": "start", **options})
+
+    async def question(self):
+        return await self.call({"op": "question"})
+
+    async def answer(self, question_id, text):
+        return await self.call({"op": "answer", "id": question_id, "answer": text})
+
+    def close(self):
+        self.writer.close()
+
+
+async def user(client, options, started, stop, think, samples, errors):
+    rng = random.Random()
+    try:
+        await client.connect()
+        await client.start(options)
+    except (OSError, RuntimeError, asyncio.IncompleteReadError) as e:
+        errors.append(str(e))
+        return
+    finally:
+        started.release()
+    await stop["begin"].wait()
+    question = None
+    while time.monotonic() < stop["at"]:
+        await asyncio.sleep(rng.expovariate(1.0 / think))
+        begin = time.perf_counter_ns()
+        try:
+            if question is None:
+                kind = "question"
+                question = (await client.question())["question"]
+                if question is None:
+                    # The quiz is over; the next request starts another
+                    samples.setdefault(kind, []).append(time.perf_counter_ns() - begin)
+                    kind, begin = "start", time.perf_counter_ns()
+                    await client.start(options)
+            else:
+                kind = "answer"
+                await client.answer(question["id"], "42")
+                question = None
+        except (OSError, RuntimeError, asyncio.IncompleteReadError) as e:
+            errors.append(str(e))
+            return
+        samples.setdefault(kind, []).append(time.perf_counter_ns() - begin)
+    client.close()
+
+
+async def run(host, port, args):
+    client_class = WebSocketClient if args.ws else HttpClient
+    options = {"kind": "quiz", "length": args.length}
+    samples, errors = {}, []
+    started = asyncio.Semaphore(0)
+    stop = {"begin": asyncio.Event(), "at": 0.0}
+    # Every session sends one request per think time on average
+    think = args.sessions / args.rate
+    tasks = []
+    for _ in range(args.sessions):
+        tasks.append(asyncio.ensure_future(user(client_class(host, port), options, started, stop, think, samples,
+                                                errors)))
+        # Ramp up gradually so the listen backlog is never overrun
+        await asyncio.sleep(0)
+    for _ in range(args.sessions):
+        await started.acquire()
+    stop["at"] = time.monotonic() + args.duration
+    stop["begin"].set()
+    await asyncio.gather(*tasks)
+    result = {"sessions": args.sessions, "target_rate": args.rate, "transport": "websocket" if args.ws else "http",
+              "errors": len(errors), "first_error": errors[0] if errors else None}
+    everything = []
+    for kind, values in sorted(samples.items()):
+        ms = np.asarray(values, dtype=np.float64) / 1e6
+        everything.append(ms)
+        result[f"{kind}_requests"] = len(ms)
+        result.update({f"{kind}_p50_ms": float(np.percentile(ms, 50)), f"{kind}_p99_ms": float(np.percentile(ms, 99))})
+    ms = np.concatenate(everything) if everything else np.zeros(1)
+    result.update(requests=int(len(ms)), throughput_per_s=len(ms) / args.duration, p50_ms=float(np.percentile(ms, 50)),
+                  p99_ms=float(np.percentile(ms, 99)), max_ms=float(ms.max()))
+    return result
+
+
+def _free_port(span):
+    """A port p with p .. p + span all free (the server's shared port and one per worker)"""
+    for _ in range(50):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        if port + span < 65536 and all(_is_free(p) for p in range(port, port + span + 1)):
+            return port
+    raise RuntimeError("no free port range found")
+
+
+def _is_free(port):
+    with socket.socket() as probe:
+        try:
+            probe.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+def start_server(workers, data_dir, timeout=60.0):
+    port = _free_port(workers)
+    process = subprocess.Popen([sys.executable, "-m", "src.server", "--port", str(port), "--workers", str(workers),
+                                "--data", data_dir], cwd=ROOT)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as probe:
+                probe.sendall(b"GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if probe.recv(64).startswith(b"HTTP/1.1 200"):
+                    return process, port
+        except OSError:
+            pass
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("the server did not start")
+        time.sleep(0.2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test",
+                                     description="Load test the quiz server with many concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=2000, help="concurrent sessions (one connection each)")
+    parser.add_argument("--rate", type=float, default=2000.0, help="requests per second over all sessions")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds measured after every session started")
+    parser.add_argument("--length", type=int, default=5, help="questions per quiz; a new quiz starts after")
+    parser.add_argument("--ws", action="store_true", help="use WebSocket sessions instead of HTTP")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="server workers to start")
+    parser.add_argument("--data", default="data", help="question directory for the started server")
+    parser.add_argument("--p99-ms", type=float, default=P99_TARGET_MS, help="fail above this overall p99")
+    parser.add_argument("--output", help="also write the results JSON here")
+    args = parser.parse_args(argv)
+
+    raise_file_limit()
+    process = None
+    if args.url:
+        host, _, port = args.url.split("//", 1)[-1].rstrip("/").partition(":")
+        port = int(port or 80)
+    else:
+        process, port = start_server(args.workers, args.data)
+        host = "127.0.0.1"
+    try:
+        result = asyncio.run(run(host, port, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    result["workers"] = None if args.url else args.workers
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0 if result["p99_ms"] <= args.p99_ms and not result["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Start-to-first-question latency of QuizWindow, on an offscreen Qt platform.
+
+    python -m benchmarks.quiz_window <root> <source>
+
+root must contain a data/ directory; source is one of its CSV file names.
+Prints one JSON object. Run by ``benchmarks.run`` in a fresh process, since
+the UI works from the current directory and keeps process-wide singletons.
+"""
+import os
+import sys
+import json
+import time
+
+
+def measure(root, source, timeout=300.0):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.chdir(root)
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QThreadPool
+    app = QApplication.instance() or QApplication([])
+    started = time.perf_counter()
+    from src.ui.quiz import QuizWindow
+    from src.ui.loader import get_loader
+    imported = time.perf_counter()
+    window = QuizWindow()
+    window.category_box.setCurrentIndex(window.category_box.findData(source))
+    constructed = time.perf_counter()
+    window.start_quiz()
+    # start_quiz may wait on the background loader; the first question is up once the quiz widget shows
+    deadline = constructed + timeout
+    while not (window.quiz_active and window.question_label.text()):
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"no question after {timeout:.0f}s")
+        app.processEvents()
+        time.sleep(0.001)
+    shown = time.perf_counter()
+    window.quiz_active = False
+    window.timer.stop()
+    # Let background loading (and the search index build it starts) finish before the process exits
+    pool, loader = QThreadPool.globalInstance(), get_loader()
+    while True:
+        pool.waitForDone()
+        app.processEvents()
+        if loader.done and not pool.activeThreadCount():
+            break
+    return {
+        "quiz_window_import_ms": 1000 * (imported - started),
+        "quiz_window_construct_ms": 1000 * (constructed - imported),
+        "quiz_window_first_question_ms": 1000 * (shown - constructed),
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__.strip().splitlines()[2].strip(), file=sys.stderr)
+        return 2
+    print(json.dumps(measure(*argv)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Benchmarks for loading, question selection and grading on synthetic banks.
+
+    python -m benchmarks.run --sizes 1000 100000 --output results.json
+    python -m benchmarks.run --compare results.json
+
+Each size gets a synthetic bank (see ``synthetic.write_bank``) and is timed
+for: parsing its CSVs with pandas, cold loads (CSV parse plus binary cache
+build) and warm loads (mapped from the cache), peak Python heap during a
+cold load, per-draw latency of ``QuizEngine`` and ``OAEngine``, answer
+checking and bulk grading throughput, and QuizWindow start-to-first-question
+latency on an offscreen Qt platform. Results are written as JSON together
+with the commit they were measured on; ``--compare`` prints the change
+against an earlier results file.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+from .synthetic import write_bank
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SIZES = (1000, 10000, 100000, 1000000)
+# Metrics where a larger value is better; everything else is a time or size
+HIGHER_IS_BETTER = {"grade_answers_per_s"}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _latencies(prefix, samples_ns):
+    us = np.asarray(samples_ns, dtype=np.float64) / 1000
+    return {f"{prefix}_mean_us": float(us.mean()), f"{prefix}_p50_us": float(np.percentile(us, 50)),
+            f"{prefix}_p99_us": float(np.percentile(us, 99))}
+
+
+def bench_load(data_dir, memory=True):
+    import pandas as pd
+    from src.Engine.question_bank import QuestionBank, csv_paths
+    results = {}
+    _, seconds = _timed(lambda: [pd.read_csv(p, dtype=str, keep_default_na=False) for p in csv_paths(data_dir)])
+    results["csv_read_s"] = seconds
+    if memory:
+        shutil.rmtree(os.path.join(data_dir, ".cache"), ignore_errors=True)
+        tracemalloc.start()
+        QuestionBank.from_path(data_dir)
+        results["load_cold_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        gc.collect()
+    shutil.rmtree(os.path.join(data_dir, ".cache"), ignore_errors=True)
+    _, results["load_cold_s"] = _timed(QuestionBank.from_path, data_dir)
+    gc.collect()
+    bank, results["load_warm_s"] = _timed(QuestionBank.from_path, data_dir)
+    return bank, results
+
+
+def bench_quiz_engine(bank, draws):
+    from src.Engine.quiz_engine import QuizEngine
+    engine = QuizEngine(bank=bank, seed=0)
+    engine.get_random_question()  # builds the sampling pool
+    draw_ns, check_ns = [], []
+    for _ in range(draws):
+        start = time.perf_counter_ns()
+        question = engine.get_random_question()
+        draw_ns.append(time.perf_counter_ns() - start)
+        if question is None:
+            engine.reset()
+            continue
+        start = time.perf_counter_ns()
+        engine.check_answer(question['answer'])
+        check_ns.append(time.perf_counter_ns() - start)
+    return {**_latencies("quiz_draw", draw_ns), **_latencies("check_answer", check_ns)}
+
+
+def bench_oa_engine(bank, batches, category):
+    from src.Engine.oa_engine import OAEngine
+    engine = OAEngine(bank=bank, seed=0)
+    batch_ns = []
+    for _ in range(batches):
+        start = time.perf_counter_ns()
+        batch = engine.get_batch(5, category)
+        batch_ns.append(time.perf_counter_ns() - start)
+        if len(batch) < 5:
+            engine.reset()
+    return _latencies("oa_batch5", batch_ns)
+
+
+def bench_grading(bank, answers):
+    rng = np.random.default_rng(0)
+    rows = rng.choice(bank.rows(), answers).tolist()
+    # Half right, half wrong
+    given = [bank.answer(row) if i % 2 else "wrong" for i, row in enumerate(rows)]
+    _, seconds = _timed(bank.grade, rows, given)
+    return {"grade_answers_per_s": answers / seconds}
+
+
+def bench_quiz_window(root, source):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+               PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH")))))
+    done = subprocess.run([sys.executable, "-m", "benchmarks.quiz_window", root, source], env=env,
+                          capture_output=True, text=True)
+    if done.returncode:
+        print(f"quiz window benchmark failed: {done.stderr.strip()}", file=sys.stderr)
+        return {}
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def run_size(n, work_dir, args):
+    root = os.path.join(work_dir, str(n))
+    data_dir = os.path.join(root, "data")
+    paths, write_s = _timed(write_bank, data_dir, n)
+    print(f"[{n}] wrote {len(paths)} files in {write_s:.1f}s", file=sys.stderr)
+    bank, results = bench_load(data_dir, memory=not args.no_memory)
+    draws = min(args.draws, n)
+    results.update(bench_quiz_engine(bank, draws))
+    results.update(bench_oa_engine(bank, max(draws // 5, 1), bank.categories[0]))
+    results.update(bench_grading(bank, min(args.grade_answers, 10 * n)))
+    if not args.no_ui:
+        results.update(bench_quiz_window(root, os.path.basename(paths[0])))
+    print(f"[{n}] " + ", ".join(f"{k}={v:.4g}" for k, v in results.items()), file=sys.stderr)
+    return results
+
+
+def compare(old, new):
+    """Lines describing each metric's change from old to new results"""
+    old_by_size = {r["size"]: r for r in old["results"]}
+    lines = [f"{old['meta']['commit']} -> {new['meta']['commit']}"]
+    for result in new["results"]:
+        before = old_by_size.get(result["size"])
+        if before is None:
+            continue
+        lines.append(f"size {result['size']}:")
+        for metric, value in result.items():
+            if metric == "size" or metric not in before or not before[metric]:
+                continue
+            change = value / before[metric] - 1
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            lines.append(f"  {metric:<34} {before[metric]:>12.4g} {value:>12.4g}  {change:+7.1%}"
+                         f"{'' if abs(change) < 0.05 else (' better' if better else ' worse')}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Benchmark loading, selection and grading on synthetic banks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="questions per synthetic bank")
+    parser.add_argument("--output", help=f"results JSON (default: {os.path.relpath(RESULTS_DIR)}/<commit>.json)")
+    parser.add_argument("--compare", metavar="RESULTS", help="print changes against an earlier results file")
+    parser.add_argument("--work-dir", help="where synthetic banks are written (default: a temporary directory)")
+    parser.add_argument("--draws", type=int, default=20000, help="questions drawn per engine benchmark")
+    parser.add_argument("--grade-answers", type=int, default=200000, help="answers graded in bulk")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced (slower) cold load")
+    parser.add_argument("--no-ui", action="store_true", help="skip the offscreen QuizWindow benchmark")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="eigenprep-bench-")
+    try:
+        results = [{"size": n, **run_size(n, work_dir, args)} for n in args.sizes]
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    report = {
+        "meta": {"commit": _commit(), "time": time.time(), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(json.load(f), report)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""Synthetic question banks in the data/ CSV schema (category,question,answer,type)"""
+import os
+import csv
+import numpy as np
+
+CATEGORIES = ("Brain Teaser", "Fast Math", "Finance", "Probability")
+WORDS = ("expected", "value", "coin", "dice", "bond", "yield", "option", "price", "probability", "random",
+         "walk", "variance", "portfolio", "return", "interest", "rate", "swap", "delta", "gamma", "card",
+         "deck", "urn", "ball", "draw", "game", "strategy", "payoff", "market", "spread", "volatility")
+
+
+def write_bank(directory, n_questions, n_files=len(CATEGORIES), seed=0):
+    """Write n_questions split over n_files CSVs in directory; returns their paths"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    per_file = np.diff(np.linspace(0, n_questions, n_files + 1).astype(np.int64))
+    first = 0
+    for f, count in enumerate(per_file.tolist()):
+        category = CATEGORIES[f % len(CATEGORIES)]
+        path = os.path.join(directory, f"{category.lower().replace(' ', '-')}-{f}.csv")
+        # Half arithmetic (math answers), half worded questions (text answers)
+        is_math = rng.random(count) < 0.5
+        a, b = rng.integers(2, 999, count), rng.integers(2, 99, count)
+        words = rng.integers(0, len(WORDS), (count, 12))
+        lengths = rng.integers(6, 13, count)
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(("category", "question", "answer", "type"))
+            for i in range(count):
+                if is_math[i]:
+                    writer.writerow((category, f"{a[i]} × {b[i]}", str(a[i] * b[i]), "math"))
+                else:
+                    text = " ".join(WORDS[w] for w in words[i, :lengths[i]])
+                    writer.writerow((category, f"Q{first + i}: what is the {text}?", WORDS[words[i, 0]], "text"))
+        first += count
+        paths.append(path)
+    return paths
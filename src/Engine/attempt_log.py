@@ -0,0 +1,181 @@
+"""Append-only binary log of every answered question.
+
+The file is a 16-byte header followed by fixed 32-byte little-endian records
+(see ``RECORD``), so it can be read back in one ``np.fromfile`` call and a
+torn final record is simply truncated on open. Writes go through a queue to
+a background thread that writes in batches and fsyncs at most every
+``sync_interval`` seconds, so ``append()`` never blocks on disk.
+"""
+import os
+import time
+import queue
+import atexit
+import struct
+import threading
+import traceback
+import numpy as np
+from .question_bank import parse_id
+from .rng import new_seed
+
+LOG_PATH = os.path.join("progress", "attempts.bin")
+
+MAGIC = b"EPAL"
+VERSION = 1
+CORRECT = 1
+OVERRIDDEN = 2
+# The question was generated (generator.py), so it is in no file
+GENERATED = 4
+
+_HEADER = struct.Struct("<4sII4x")
+_RECORD = struct.Struct("<dQQIB3x")
+RECORD = np.dtype([
+    ("time", "<f8"),
+    ("question", "<u8"),
+    ("session", "<u8"),
+    ("latency_ms", "<u4"),
+    ("flags", "u1"),
+    ("pad", "V3"),
+])
+
+
+def count_attempts(path=LOG_PATH):
+    try:
+        return max(os.path.getsize(path) - _HEADER.size, 0) // RECORD.itemsize
+    except OSError:
+        return 0
+
+
+def read_attempts(path=LOG_PATH, start=0):
+    """Structured array of the records from index start onwards (empty if there is no log)"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return np.zeros(0, dtype=RECORD)
+    with open(path, "rb") as f:
+        magic, version, record_size = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} attempt log")
+    count = (size - _HEADER.size) // RECORD.itemsize - start
+    if count <= 0:
+        return np.zeros(0, dtype=RECORD)
+    return np.fromfile(path, dtype=RECORD, count=count, offset=_HEADER.size + start * RECORD.itemsize)
+
+
+class AttemptLog:
+    """Writer for the attempt log; safe to call from any thread"""
+
+    def __init__(self, path=LOG_PATH, sync_interval=1.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._queue = queue.SimpleQueue()
+        self._listeners = []
+        self._file = self._open()
+        self.count = (self._file.tell() - _HEADER.size) // RECORD.itemsize
+        self._thread = threading.Thread(target=self._run, name="attempt-log", daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a+b")
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < _HEADER.size:
+            f.truncate(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+            f.flush()
+        else:
+            f.seek(0)
+            magic, version, record_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+                f.close()
+                raise ValueError(f"{self.path} is not a version {VERSION} attempt log")
+            torn = (size - _HEADER.size) % RECORD.itemsize
+            if torn:
+                f.truncate(size - torn)
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def add_listener(self, callback):
+        """callback(record tuple) is called on the caller's thread for every append"""
+        self._listeners.append(callback)
+
+    def append(self, question_id, correct, overridden=False, latency=0.0, session=0, generated=False):
+        """Queue one answer; latency is in seconds"""
+        flags = (CORRECT if correct else 0) | (OVERRIDDEN if overridden else 0) | (GENERATED if generated else 0)
+        record = (time.time(), parse_id(question_id), session, min(int(latency * 1000), 0xFFFFFFFF), flags)
+        self.count += 1
+        self._queue.put(record)
+        for callback in self._listeners:
+            callback(record)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        dirty = False
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.sync_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [r for r in batch if isinstance(r, tuple)]
+            if records:
+                self._file.write(b"".join(_RECORD.pack(*r) for r in records))
+                self._file.flush()
+                dirty = True
+            now = time.monotonic()
+            if dirty and (stop or now - last_sync >= self.sync_interval):
+                os.fsync(self._file.fileno())
+                last_sync = now
+                dirty = False
+            for marker in batch:
+                if isinstance(marker, threading.Event):
+                    marker.set()
+                elif callable(marker):
+                    try:
+                        marker()
+                    except Exception:
+                        traceback.print_exc()
+            if stop:
+                return
+
+    def call_soon(self, fn):
+        """Run fn() on the writer thread once everything appended so far is written (for snapshots)"""
+        self._queue.put(fn)
+
+    def flush(self):
+        """Block until everything appended so far has been written (not necessarily fsynced)"""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait()
+
+    def close(self):
+        """Write and fsync everything queued so far, then stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_attempt_log():
+    """Process-wide AttemptLog at LOG_PATH, closed (and fsynced) at exit"""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = AttemptLog()
+            atexit.register(_log.close)
+        return _log
+
+
+def new_session_id():
+    """ID of a new session, which is also the seed of its random streams (see rng.py)"""
+    return new_seed()
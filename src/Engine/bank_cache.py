@@ -0,0 +1,213 @@
+"""Binary, memory-mapped cache of parsed question CSVs.
+
+Each ``data/<name>.csv`` is compiled to ``data/.cache/<name>.epq``: a small
+header stamped with the source's mtime, size and SHA-1 plus the matcher
+signature, a section directory, then 8-byte aligned sections (string
+offsets, UTF-8 blobs, question IDs, category/type codes, canonical answer
+values, near-duplicate cluster IDs). Loading maps the file and wraps the sections with ``np.frombuffer``
+and ``memoryview`` so nothing is parsed or copied up front.
+
+Build ahead of time with ``python -m src.Engine.bank_cache``; otherwise
+stale or missing caches are rebuilt on first load by ``ingest.compile_csv``,
+which streams the CSV in chunks.
+"""
+import os
+import sys
+import atexit
+import mmap
+import struct
+import shutil
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+from . import matching
+from .question_bank import DATA_DIR, StringColumn, QuestionTable
+from .instrument import count
+
+MAGIC = b"EPQB"
+VERSION = 4
+CACHE_DIRNAME = ".cache"
+EXTENSION = ".epq"
+
+_HEADER = struct.Struct("<4sIqq20sQI")
+_SECTION = struct.Struct("<qq")
+_OFFSETS = np.dtype("<i8")
+_CODES = np.dtype("<u2")
+_VALUES = np.dtype("<f8")
+_IDS = np.dtype("<u8")
+_N_SECTIONS = 15
+COPY_BLOCK = 1 << 20
+
+_private_dir = None
+
+
+def cache_path_for(csv_path, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(csv_path), CACHE_DIRNAME)
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(csv_path))[0] + EXTENSION)
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def write_table(table, path, mtime_ns, size, digest):
+    names = [StringColumn.from_strings(table.categories), StringColumn.from_strings(table.types)]
+    sections = []
+    for col in names + [table.questions, table.answers, table.canonical_text]:
+        sections += [np.asarray(col.offsets, dtype=_OFFSETS).tobytes(), bytes(col.buffer)]
+    sections += [np.asarray(table.category_codes, dtype=_CODES).tobytes(),
+                 np.asarray(table.type_codes, dtype=_CODES).tobytes(),
+                 np.asarray(table.canonical_values, dtype=_VALUES).tobytes(),
+                 np.asarray(table.ids, dtype=_IDS).tobytes(),
+                 np.asarray(table.clusters, dtype=_IDS).tobytes()]
+    write_sections(path, sections, mtime_ns, size, digest)
+
+
+def _section_size(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    data.flush()
+    return os.fstat(data.fileno()).st_size
+
+
+def write_sections(path, sections, mtime_ns, size, digest):
+    """Write a cache from its sections in order, each bytes or a binary file (copied in blocks)"""
+    pos = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    for data in sections:
+        pos += -pos % 8
+        directory.append((pos, _section_size(data)))
+        pos += directory[-1][1]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, mtime_ns, size, digest, matching.signature(), len(sections)))
+        for entry in directory:
+            f.write(_SECTION.pack(*entry))
+        for (offset, _), data in zip(directory, sections):
+            f.write(b"\0" * (offset - f.tell()))
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            else:
+                data.seek(0)
+                shutil.copyfileobj(data, f, COPY_BLOCK)
+    os.replace(tmp, path)
+
+
+def read_stamp(path):
+    """(mtime_ns, size, sha1) recorded for the cache's source CSV"""
+    with open(path, "rb") as f:
+        magic, version, mtime_ns, size, digest, signature, n_sections = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION or n_sections != _N_SECTIONS:
+        raise ValueError(f"{path} is not a version {VERSION} question cache")
+    if signature != matching.signature():
+        raise ValueError(f"{path} was built with different answer matchers")
+    return mtime_ns, size, digest
+
+
+def restamp(path, mtime_ns, size, digest):
+    with open(path, "r+b") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, mtime_ns, size, digest, matching.signature(), _N_SECTIONS))
+
+
+def read_table(path, source):
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    directory = [_SECTION.unpack_from(mm, _HEADER.size + i * _SECTION.size) for i in range(_N_SECTIONS)]
+    if directory[-1][0] + directory[-1][1] > len(mm):
+        raise ValueError(f"{path} is truncated")
+
+    def array(i, dtype):
+        offset, length = directory[i]
+        return np.frombuffer(mm, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def column(i):
+        offset, length = directory[i + 1]
+        return StringColumn(view[offset:offset + length], array(i, _OFFSETS))
+
+    categories, types, questions, answers, canonical_text = (column(i) for i in range(0, 10, 2))
+    return QuestionTable(source, array(13, _IDS), list(categories), list(types), array(10, _CODES), array(11, _CODES),
+                         questions, answers, canonical_text, array(12, _VALUES), array(14, _IDS))
+
+
+def _private_cache_dir():
+    """Cache directory for read-only data directories: one per process, removed at exit"""
+    global _private_dir
+    if _private_dir is None:
+        _private_dir = tempfile.mkdtemp(prefix="eigenprep-cache-")
+        atexit.register(shutil.rmtree, _private_dir, True)
+    return _private_dir
+
+
+def _load(csv_path, cache_dir=None, force=False):
+    cache_path = cache_path_for(csv_path, cache_dir)
+    source = os.path.basename(csv_path)
+    st = os.stat(csv_path)
+    digest = None
+    if not force:
+        try:
+            mtime_ns, size, cached_digest = read_stamp(cache_path)
+            if (mtime_ns, size) != (st.st_mtime_ns, st.st_size):
+                digest = file_digest(csv_path)
+                if digest != cached_digest:
+                    raise ValueError("source changed")
+                restamp(cache_path, st.st_mtime_ns, st.st_size, digest)
+            table = read_table(cache_path, source)
+            count("load.cache_hits")
+            return table, False
+        except (OSError, ValueError, struct.error):
+            pass
+    count("load.cache_misses")
+    from .ingest import compile_csv
+    try:
+        report = compile_csv(csv_path, cache_path, st.st_mtime_ns, st.st_size)
+    except PermissionError:
+        # Read-only data directory: compile to the private cache instead, where a reload replaces the last build
+        cache_path = cache_path_for(csv_path, _private_cache_dir())
+        try:
+            report = compile_csv(csv_path, cache_path, st.st_mtime_ns, st.st_size)
+        except PermissionError:
+            # Windows cannot replace a build that is still mapped; give this one its own name
+            cache_path = cache_path_for(csv_path, tempfile.mkdtemp(dir=_private_cache_dir()))
+            report = compile_csv(csv_path, cache_path, st.st_mtime_ns, st.st_size)
+    if report.bad_count:
+        print(report.summary(), file=sys.stderr)
+    return read_table(cache_path, source), True
+
+
+def load_table(csv_path, cache_dir=None):
+    """QuestionTable for a CSV, mapped from its cache and rebuilt only if the CSV changed"""
+    return _load(csv_path, cache_dir)[0]
+
+
+def build(data_dir=DATA_DIR, cache_dir=None, force=False):
+    """Compile every CSV in data_dir; returns [(file name, rebuilt?)]"""
+    results = []
+    for fname in sorted(os.listdir(data_dir)):
+        if fname.endswith(".csv"):
+            _, rebuilt = _load(os.path.join(data_dir, fname), cache_dir, force)
+            results.append((fname, rebuilt))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile question CSVs into memory-mapped caches.")
+    parser.add_argument("data_dir", nargs="?", default=DATA_DIR)
+    parser.add_argument("--cache-dir", help="defaults to <data_dir>/.cache")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the CSV is unchanged")
+    args = parser.parse_args(argv)
+    for fname, rebuilt in build(args.data_dir, args.cache_dir, args.force):
+        print(f"{'rebuilt' if rebuilt else 'up to date':<10}  {fname}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""Near-duplicate question detection across the data directory.
+
+    python -m src.Engine.dedup [data_dir] --report duplicates.csv [--write-clusters]
+
+Every question is reduced to a MinHash signature of its character
+shingles. Files are signed in parallel, each streamed in chunks, with
+signatures spilled to memory-mapped scratch files. Locality-sensitive
+hashing over bands of the signatures proposes candidate pairs in
+near-linear time; candidates whose estimated Jaccard similarity reaches
+the threshold are merged into clusters. The report lists every clustered
+question. ``--write-clusters`` appends (or refreshes) a ``cluster`` column in
+the CSVs, which the samplers use to serve at most one question per cluster
+in a session.
+"""
+import os
+import sys
+import csv
+import argparse
+import tempfile
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .matching import normalize_text
+from .question_bank import CLUSTER_COLUMN, DATA_DIR, csv_paths, format_id, question_ids
+
+SHINGLE = 5
+NUM_PERM = 128
+BANDS = 16
+THRESHOLD = 0.8
+CHUNK_SIZE = 2000
+MAX_BUCKET = 64
+_PRIME = (1 << 31) - 1
+_SEED = 0x5EED
+
+
+def _permutations(num_perm=NUM_PERM):
+    rng = np.random.default_rng(_SEED)
+    return (rng.integers(1, _PRIME, num_perm, dtype=np.uint64),
+            rng.integers(0, _PRIME, num_perm, dtype=np.uint64))
+
+
+def read_questions(csv_path):
+    """Yield (first line number, category, question) for each record of a question CSV"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        category, question = header.index("category"), header.index("question")
+        line = reader.line_num
+        for fields in reader:
+            start, line = line + 1, reader.line_num
+            if not fields:
+                continue  # blank line, which write_cluster_column() also leaves without a value
+            # Short rows are signed as they are, so every record keeps its place in the cluster values
+            yield start, *(fields[i] if i < len(fields) else "" for i in (category, question))
+
+
+def shingle_hashes(texts):
+    """(hashes, starts): 31-bit hashes of every SHINGLE-byte window, grouped per text"""
+    encoded = [normalize_text(t).encode("utf-8").ljust(SHINGLE) for t in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    # Polynomial hash of each window, then keep the windows that do not cross into the next text
+    window = np.zeros(len(data) - SHINGLE + 1, dtype=np.uint64)
+    for k in range(SHINGLE):
+        window = window * np.uint64(257) + data[k:len(data) - SHINGLE + 1 + k]
+    ends = np.cumsum(lengths)
+    counts = lengths - SHINGLE + 1
+    valid = np.ones(len(window), dtype=bool)
+    for start, end in zip(ends[:-1] - SHINGLE + 1, ends[:-1]):
+        valid[start:end] = False
+    window = window[valid]
+    window ^= window >> np.uint64(29)
+    window *= np.uint64(0xBF58476D1CE4E5B9)
+    window ^= window >> np.uint64(32)
+    starts = np.zeros(len(texts), dtype=np.int64)
+    starts[1:] = np.cumsum(counts)[:-1]
+    return window % np.uint64(_PRIME), starts
+
+
+def minhash(texts, a, b):
+    """uint32 signatures (len(texts) x len(a)) of the texts' shingle sets"""
+    hashes, starts = shingle_hashes(texts)
+    signatures = np.empty((len(texts), len(a)), dtype=np.uint32)
+    for lo in range(0, len(a), 16):
+        hi = min(lo + 16, len(a))
+        permuted = (a[lo:hi, None] * hashes[None, :] + b[lo:hi, None]) % np.uint64(_PRIME)
+        signatures[:, lo:hi] = np.minimum.reduceat(permuted, starts, axis=1).T
+    return signatures
+
+
+def band_keys(signatures, bands=BANDS):
+    """One 64-bit key per band of each signature"""
+    rows = signatures.shape[1] // bands
+    multipliers = np.random.default_rng(_SEED + 1).integers(1, 1 << 62, rows, dtype=np.uint64) | np.uint64(1)
+    blocks = signatures[:, :bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    return (blocks * multipliers).sum(axis=2)
+
+
+def sign_file(csv_path, scratch_path, num_perm=NUM_PERM, bands=BANDS, chunk_size=CHUNK_SIZE):
+    """Stream one CSV; writes signatures to scratch_path and returns (ids, line numbers, band keys)"""
+    a, b = _permutations(num_perm)
+    ids, lines, keys = [], [], []
+    seen = {}
+    records = read_questions(csv_path)
+    with open(scratch_path, "wb") as out:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            chunk_lines, categories, questions = zip(*chunk)
+            signatures = minhash(questions, a, b)
+            out.write(signatures.tobytes())
+            ids.append(question_ids(categories, questions, seen))
+            lines.append(np.array(chunk_lines, dtype=np.int64))
+            keys.append(band_keys(signatures, bands))
+    if not ids:
+        return np.zeros(0, np.uint64), np.zeros(0, np.int64), np.zeros((0, bands), np.uint64)
+    return np.concatenate(ids), np.concatenate(lines), np.concatenate(keys)
+
+
+def candidate_pairs(keys):
+    """Unique (i, j) pairs, i < j, sharing at least one band key"""
+    pairs = []
+    for band in keys.T:
+        order = np.argsort(band, kind="stable")
+        sorted_keys = band[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for run in np.split(order, bounds):
+            if len(run) < 2:
+                continue
+            if len(run) > MAX_BUCKET:
+                # Oversized bucket: chain neighbours instead of comparing all pairs
+                pairs.append(np.stack([run[:-1], run[1:]], axis=1))
+            else:
+                i, j = np.triu_indices(len(run), 1)
+                pairs.append(np.stack([run[i], run[j]], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+class _Signatures:
+    """Row access to the per-file signature scratch files as one global array"""
+
+    def __init__(self, paths, counts, num_perm):
+        self.maps = [np.memmap(p, dtype=np.uint32, mode="r", shape=(n, num_perm)) if n else None
+                     for p, n in zip(paths, counts)]
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+        self.num_perm = num_perm
+
+    def take(self, rows):
+        out = np.empty((len(rows), self.num_perm), dtype=np.uint32)
+        files = np.searchsorted(self.starts, rows, side="right") - 1
+        for f in np.unique(files):
+            selected = files == f
+            out[selected] = self.maps[f][rows[selected] - self.starts[f]]
+        return out
+
+
+def similar_pairs(signatures, pairs, threshold, chunk=100000):
+    """The candidate pairs whose estimated Jaccard similarity is at least threshold, with the estimates"""
+    kept, similarity = [], []
+    for lo in range(0, len(pairs), chunk):
+        block = pairs[lo:lo + chunk]
+        estimate = (signatures.take(block[:, 0]) == signatures.take(block[:, 1])).mean(axis=1)
+        keep = estimate >= threshold
+        kept.append(block[keep])
+        similarity.append(estimate[keep])
+    if not kept:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+    return np.concatenate(kept), np.concatenate(similarity)
+
+
+def clusters_from_pairs(n, pairs):
+    """Union-find root of every item (items without pairs are their own root)"""
+    parent = np.arange(n)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs.tolist():
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(x) for x in range(n)])
+
+
+def find_duplicates(data_dir=DATA_DIR, threshold=THRESHOLD, workers=None, num_perm=NUM_PERM, bands=BANDS):
+    """Cluster near-duplicate questions across every CSV in data_dir.
+
+    Returns (paths, ids, lines, file_of, cluster_ids) with one entry per
+    question; cluster_ids is the hex ID of the cluster's smallest question ID,
+    or "" for questions without near-duplicates.
+    """
+    paths = csv_paths(data_dir)
+    with tempfile.TemporaryDirectory(prefix="eigenprep-dedup-") as scratch:
+        scratch_paths = [os.path.join(scratch, f"{i}.sig") for i in range(len(paths))]
+        with ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+            results = list(pool.map(sign_file, paths, scratch_paths, [num_perm] * len(paths), [bands] * len(paths)))
+        ids = np.concatenate([r[0] for r in results]) if results else np.zeros(0, np.uint64)
+        lines = np.concatenate([r[1] for r in results]) if results else np.zeros(0, np.int64)
+        keys = np.concatenate([r[2] for r in results]) if results else np.zeros((0, bands), np.uint64)
+        file_of = np.repeat(np.arange(len(paths)), [len(r[0]) for r in results])
+        signatures = _Signatures(scratch_paths, [len(r[0]) for r in results], num_perm)
+        pairs, _ = similar_pairs(signatures, candidate_pairs(keys), threshold)
+        del signatures
+
+    roots = clusters_from_pairs(len(ids), pairs)
+    sizes = np.bincount(roots, minlength=len(ids))
+    clustered = sizes[roots] > 1
+    # Name each cluster after its smallest question ID, so names are stable across runs
+    representative = np.full(len(ids), np.iinfo(np.uint64).max, dtype=np.uint64)
+    np.minimum.at(representative, roots[clustered], ids[clustered])
+    cluster_ids = np.array([format_id(representative[r]) if c else "" for r, c in zip(roots.tolist(),
+                                                                                        clustered.tolist())],
+                           dtype=object)
+    return paths, ids, lines, file_of, cluster_ids
+
+
+def write_report(path, paths, ids, lines, file_of, cluster_ids):
+    """CSV of every clustered question, grouped by cluster; returns the number of clusters"""
+    members = np.flatnonzero(cluster_ids != "")
+    questions = {}
+    for f in np.unique(file_of[members]).tolist():
+        wanted = set(lines[members[file_of[members] == f]].tolist())
+        for line, _, question in read_questions(paths[f]):
+            if line in wanted:
+                questions[f, line] = question
+    order = members[np.lexsort((lines[members], file_of[members], cluster_ids[members].astype(str)))]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["cluster", "question_id", "source", "line", "question"])
+        for i in order.tolist():
+            writer.writerow([cluster_ids[i], format_id(ids[i]), os.path.basename(paths[file_of[i]]), lines[i],
+                             questions.get((file_of[i], lines[i]), "")])
+    return len(set(cluster_ids[members].tolist()))
+
+
+def _records_with_raw_lines(f):
+    """Yield (record, raw lines) pairs from a CSV file object, keeping each record's original text"""
+    raw = []
+
+    def lines():
+        for line in f:
+            raw.append(line)
+            yield line
+
+    for record in csv.reader(lines()):
+        yield record, raw[:]
+        raw.clear()
+
+
+def write_cluster_column(csv_path, cluster_ids):
+    """Set the cluster column of one CSV, leaving every other byte of each record as it was"""
+    tmp = f"{csv_path}.{os.getpid()}.tmp"
+    with open(csv_path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as out:
+        records = _records_with_raw_lines(src)
+        header, _ = next(records)
+        existing = header[-1] == CLUSTER_COLUMN
+        if CLUSTER_COLUMN in header and not existing:
+            raise ValueError(f"{csv_path}: the {CLUSTER_COLUMN} column must be the last column")
+        src.seek(0)
+        values = iter([CLUSTER_COLUMN] + list(cluster_ids))
+        try:
+            for record, raw in _records_with_raw_lines(src):
+                if record:
+                    last = raw[-1]
+                    body = last.rstrip("\r\n")
+                    newline = last[len(body):] or "\n"
+                    if existing:
+                        body = body[:body.rfind(",")]
+                    value = next(values, None)
+                    if value is None:
+                        raise ValueError(f"{csv_path} changed while its clusters were computed")
+                    raw[-1] = f"{body},{value}{newline}"
+                out.writelines(raw)
+            if next(values, None) is not None:
+                raise ValueError(f"{csv_path} changed while its clusters were computed")
+        except BaseException:
+            out.close()
+            os.remove(tmp)
+            raise
+    os.replace(tmp, csv_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.Engine.dedup",
+                                     description="Find near-duplicate questions with MinHash/LSH.")
+    parser.add_argument("data_dir", nargs="?", default=DATA_DIR)
+    parser.add_argument("--report", default="duplicates.csv", help="output CSV of clustered questions")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="minimum estimated Jaccard similarity of question shingles")
+    parser.add_argument("--workers", type=int, help="signing processes (default: CPU count)")
+    parser.add_argument("--write-clusters", action="store_true",
+                        help=f"add a '{CLUSTER_COLUMN}' column to each CSV for the samplers")
+    args = parser.parse_args(argv)
+
+    paths, ids, lines, file_of, cluster_ids = find_duplicates(args.data_dir, args.threshold, args.workers)
+    n_clusters = write_report(args.report, paths, ids, lines, file_of, cluster_ids)
+    clustered = int((cluster_ids != "").sum())
+    print(f"{clustered} of {len(ids)} questions in {n_clusters} near-duplicate clusters; report in {args.report}",
+          file=sys.stderr)
+    if args.write_clusters:
+        for f, path in enumerate(paths):
+            write_cluster_column(path, cluster_ids[file_of == f])
+        print(f"wrote the {CLUSTER_COLUMN} column to {len(paths)} files", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
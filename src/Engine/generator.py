@@ -0,0 +1,254 @@
+"""Procedurally generated Fast Math questions.
+
+Questions are produced in batches: operands for a whole batch are drawn as
+NumPy arrays and exact answers computed with integer arithmetic, then the
+batch becomes an ordinary ``QuestionTable`` (type ``math``), so generated
+questions get stable IDs and are graded by the same matcher as the CSV
+ones. A ``QuestionGenerator`` makes a session's questions from its seed
+and keeps a ring buffer of them ready: one background producer thread
+tops up the buffers of every live generator, so taking the next question
+never waits on generation. Batches come from the session's stream in
+order, whichever thread makes them, so the session can be replayed. To
+the quiz the generator is a virtual category with no end; its sources are
+``generated:<difficulty>``. Generated questions are in no file, so their
+attempts carry the attempt log's ``GENERATED`` flag.
+"""
+import weakref
+import threading
+from collections import deque
+import numpy as np
+from .question_bank import QuestionTable
+from .rng import GENERATE, new_seed, stream
+
+CATEGORY = "Fast Math (Generated)"
+SOURCE_PREFIX = "generated:"
+KINDS = ("multiply", "square", "root", "divide", "percent", "fraction")
+
+# Operand ranges (inclusive) and value sets per difficulty
+LEVELS = {
+    "easy": {
+        "multiply": ((2, 12), (2, 12)),
+        "square": (2, 15),
+        "root": (2, 12),
+        "divide": ((2, 10), (2, 12)),
+        "percent": ((10, 20, 25, 50), 200),
+        "fraction": (2, 4, 5, 10),
+    },
+    "medium": {
+        "multiply": ((11, 49), (3, 19)),
+        "square": (11, 35),
+        "root": (11, 30),
+        "divide": ((3, 19), (11, 49)),
+        "percent": ((5, 15, 20, 25, 30, 40, 75), 800),
+        "fraction": (4, 5, 8, 20, 25),
+    },
+    "hard": {
+        "multiply": ((13, 99), (13, 99)),
+        "square": (31, 125),
+        "root": (25, 99),
+        "divide": ((11, 49), (12, 99)),
+        "percent": ((2.5, 7.5, 12.5, 15, 17.5, 35, 62.5, 87.5), 4000),
+        "fraction": (8, 16, 20, 32, 40, 80),
+    },
+}
+DIFFICULTIES = tuple(LEVELS)
+
+
+def _ints(rng, bounds, n):
+    lo, hi = bounds
+    return rng.integers(lo, hi + 1, n)
+
+
+def _number(values):
+    """Shortest exact decimal text of each value"""
+    return [f"{v:.12g}" for v in values.tolist()]
+
+
+def _multiply(rng, level, n):
+    a, b = _ints(rng, level[0], n), _ints(rng, level[1], n)
+    return [f"{x} × {y}" for x, y in zip(a.tolist(), b.tolist())], (a * b).astype(str).tolist()
+
+
+def _square(rng, level, n):
+    a = _ints(rng, level, n)
+    return [f"{x}²" for x in a.tolist()], (a * a).astype(str).tolist()
+
+
+def _root(rng, level, n):
+    r = _ints(rng, level, n)
+    return [f"√{x}" for x in (r * r).tolist()], r.astype(str).tolist()
+
+
+def _divide(rng, level, n):
+    divisor, quotient = _ints(rng, level[0], n), _ints(rng, level[1], n)
+    return ([f"{x} ÷ {d}" for x, d in zip((divisor * quotient).tolist(), divisor.tolist())],
+            quotient.astype(str).tolist())
+
+
+def _percent(rng, level, n):
+    percents, max_base = level
+    # In tenths of a percent, so the base can be a multiple that makes the answer whole
+    tenths = np.rint(rng.choice(np.asarray(percents, dtype=np.float64), n) * 10).astype(np.int64)
+    step = 1000 // np.gcd(tenths, 1000)
+    base = step * (1 + (rng.random(n) * np.maximum(max_base // step, 1)).astype(np.int64))
+    answers = tenths * base // 1000
+    return ([f"{p}% of {b}" for p, b in zip(_number(tenths / 10), base.tolist())],
+            answers.astype(str).tolist())
+
+
+def _fraction(rng, level, n):
+    # Denominators with only 2 and 5 as factors, so every answer is a terminating decimal
+    den = rng.choice(np.asarray(level, dtype=np.int64), n)
+    num = 1 + (rng.random(n) * (den - 1)).astype(np.int64)
+    g = np.gcd(num, den)
+    num, den = num // g, den // g
+    as_percent = rng.random(n) < 0.5
+    values = num / den
+    texts = _number(np.where(as_percent, values * 100, values))
+    questions = [f"{a}/{b} as a {'percentage' if p else 'decimal'}"
+                 for a, b, p in zip(num.tolist(), den.tolist(), as_percent.tolist())]
+    return questions, [f"{t}%" if p else t for t, p in zip(texts, as_percent.tolist())]
+
+
+_MAKERS = {
+    "multiply": _multiply,
+    "square": _square,
+    "root": _root,
+    "divide": _divide,
+    "percent": _percent,
+    "fraction": _fraction,
+}
+
+
+def generate(n, difficulty="medium", kinds=KINDS, rng=None):
+    """QuestionTable of up to n generated questions (repeats within the batch are dropped)"""
+    rng = stream(new_seed(), GENERATE) if rng is None else rng
+    level = LEVELS[difficulty]
+    chosen = rng.integers(0, len(kinds), n)
+    questions = np.empty(n, dtype=object)
+    answers = np.empty(n, dtype=object)
+    for k, kind in enumerate(kinds):
+        where = np.flatnonzero(chosen == k)
+        if len(where):
+            q, a = _MAKERS[kind](rng, level[kind], len(where))
+            questions[where] = q
+            answers[where] = a
+    # Keep one of each question so a question's ID does not depend on the batch it came in
+    _, first = np.unique(questions.astype(str), return_index=True)
+    first.sort()
+    return generated_table(difficulty, questions[first].tolist(), answers[first].tolist())
+
+
+def generated_table(difficulty, questions, answers):
+    """QuestionTable holding already generated questions (e.g. ones saved with a session)"""
+    return QuestionTable.from_columns(f"{SOURCE_PREFIX}{difficulty}", [CATEGORY] * len(questions),
+                                      questions, answers, ["math"] * len(questions))
+
+
+def difficulty_of(source):
+    """Difficulty named by a generated:<difficulty> source, or None for any other source"""
+    if source and source.startswith(SOURCE_PREFIX) and source[len(SOURCE_PREFIX):] in LEVELS:
+        return source[len(SOURCE_PREFIX):]
+    return None
+
+
+class QuestionGenerator:
+    """Generated questions of one session, from its seed, kept ready in a ring buffer.
+
+    The shared producer refills the buffer a batch at a time once a batch
+    fits; if it has run dry anyway, take() makes the next batch itself.
+    ``take()`` returns ``(table, i)``: ``table.record(i)`` is the question and
+    ``table.check(i, answer)`` grades it.
+    """
+
+    def __init__(self, difficulty="medium", seed=None, kinds=KINDS, capacity=64, batch=16):
+        if difficulty not in LEVELS:
+            raise ValueError(f"Unknown difficulty: {difficulty}")
+        self.difficulty = difficulty
+        self.kinds = kinds
+        self.batch = min(batch, capacity)
+        self.seed = new_seed() if seed is None else seed
+        self.rng = stream(self.seed, GENERATE, DIFFICULTIES.index(difficulty))
+        self._slots = [None] * capacity
+        self._head = 0
+        self._count = 0
+        self._queued = False
+        self._lock = threading.Lock()
+        _producer.request(self)
+
+    def _free(self):
+        return len(self._slots) - self._count
+
+    def _fill(self):
+        """Append the stream's next batch if it fits (call with the lock held); returns whether it did"""
+        if self._free() < self.batch:
+            return False
+        table = generate(self.batch, self.difficulty, self.kinds, self.rng)
+        capacity = len(self._slots)
+        for i in range(len(table)):
+            self._slots[(self._head + self._count) % capacity] = (table, i)
+            self._count += 1
+        return True
+
+    def take(self):
+        """Next question as (table, i)"""
+        with self._lock:
+            if not self._count:
+                self._fill()
+            item = self._slots[self._head]
+            self._slots[self._head] = None
+            self._head = (self._head + 1) % len(self._slots)
+            self._count -= 1
+            low = self._free() >= self.batch
+        if low:
+            _producer.request(self)
+        return item
+
+    def take_many(self, n):
+        """n questions with no repeats (fewer only if the difficulty has too few distinct questions)"""
+        items, seen = [], set()
+        for _ in range(4 * n):
+            if len(items) == n:
+                break
+            table, i = item = self.take()
+            if table.ids[i] not in seen:
+                seen.add(table.ids[i])
+                items.append(item)
+        return items
+
+
+class _Producer:
+    """Daemon thread topping up the ring buffers of QuestionGenerators that asked for it"""
+
+    def __init__(self):
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def request(self, generator):
+        with self._cond:
+            if generator._queued:
+                return
+            generator._queued = True
+            # Weak, so a session dropped before its turn is not kept alive
+            self._queue.append(weakref.ref(generator))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="generator", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                generator = self._queue.popleft()()
+                if generator is None:
+                    continue
+                generator._queued = False
+            with generator._lock:
+                while generator._fill():
+                    pass
+
+
+_producer = _Producer()
@@ -0,0 +1,168 @@
+"""Headless batch grading of OA submissions.
+
+    python -m src.Engine.grade submissions.csv --scores scores.csv --questions questions.csv
+
+Submissions are (candidate, question_id, answer) records in CSV (with a
+header row) or JSONL, where question_id is the stable hex ID from
+``QuestionBank``. They are read in chunks and graded on a process pool;
+each worker maps the shared question bank once and returns per-chunk
+counts, so memory is bounded by the number of candidates and questions,
+not by the number of submissions.
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from .question_bank import DATA_DIR, get_bank
+
+FIELDS = ("candidate", "question_id", "answer")
+
+_bank = None
+
+
+def read_submissions(path, fmt=None):
+    """Yield (candidate, question_id, answer) from a CSV or JSONL file, or stdin for "-" """
+    if fmt is None:
+        fmt = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield tuple(str(record[field]) for field in FIELDS)
+        else:
+            for record in csv.DictReader(f):
+                yield tuple(record[field] for field in FIELDS)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _init_worker(data_dir):
+    global _bank
+    _bank = get_bank(data_dir)
+
+
+def grade_chunk(chunk, bank=None):
+    """Grade [(candidate, question_id, answer)]; returns per-candidate and per-question counts"""
+    bank = bank or _bank
+    rows = np.full(len(chunk), -1, dtype=np.int64)
+    for i, (_, qid, _) in enumerate(chunk):
+        try:
+            row = bank.row_of(qid)
+        except ValueError:
+            continue
+        if row is not None:
+            rows[i] = row
+    known = np.flatnonzero(rows >= 0)
+    correct = np.zeros(len(chunk), dtype=bool)
+    correct[known] = bank.grade(rows[known], [chunk[i][2] for i in known])
+
+    candidates = {}
+    for i in known:
+        counts = candidates.setdefault(chunk[i][0], [0, 0])
+        counts[0] += int(correct[i])
+        counts[1] += 1
+    question_rows, attempts = np.unique(rows[known], return_counts=True)
+    question_correct = np.bincount(np.searchsorted(question_rows, rows[known[correct[known]]]),
+                                   minlength=len(question_rows))
+    return candidates, question_rows, attempts, question_correct, len(chunk) - len(known)
+
+
+class Totals:
+    def __init__(self, n_questions):
+        self.candidates = {}
+        self.attempts = np.zeros(n_questions, dtype=np.int64)
+        self.correct = np.zeros(n_questions, dtype=np.int64)
+        self.unknown = 0
+
+    def add(self, result):
+        candidates, question_rows, attempts, question_correct, unknown = result
+        for candidate, (correct, total) in candidates.items():
+            counts = self.candidates.setdefault(candidate, [0, 0])
+            counts[0] += correct
+            counts[1] += total
+        self.attempts[question_rows] += attempts
+        self.correct[question_rows] += question_correct
+        self.unknown += unknown
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def grade_stream(records, data_dir=DATA_DIR, workers=None, chunk_size=10000):
+    """Grade an iterable of submissions; at most two chunks per worker are in flight"""
+    bank = get_bank(data_dir)
+    totals = Totals(len(bank))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(records, chunk_size):
+            totals.add(grade_chunk(chunk, bank))
+        return totals
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data_dir,)) as pool:
+        pending = set()
+        for chunk in _chunks(records, chunk_size):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    totals.add(future.result())
+            pending.add(pool.submit(grade_chunk, chunk))
+        for future in pending:
+            totals.add(future.result())
+    return totals
+
+
+def write_scores(totals, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["candidate", "correct", "answered", "score"])
+        for candidate, (correct, total) in totals.candidates.items():
+            writer.writerow([candidate, correct, total, f"{correct / total:.4f}"])
+
+
+def write_question_accuracy(totals, bank, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["question_id", "category", "attempts", "correct", "accuracy"])
+        for row in np.flatnonzero(totals.attempts):
+            attempts, correct = totals.attempts[row], totals.correct[row]
+            question = bank.record(row)
+            writer.writerow([question['id'], question['category'], attempts, correct, f"{correct / attempts:.4f}"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.Engine.grade",
+                                     description="Grade OA submissions without the GUI.")
+    parser.add_argument("submissions", help="CSV or JSONL file of candidate,question_id,answer ('-' for stdin)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="defaults to the file extension")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--scores", default="scores.csv", help="per-candidate output CSV")
+    parser.add_argument("--questions", default="question_accuracy.csv", help="per-question output CSV")
+    parser.add_argument("--workers", type=int, help="grading processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    records = read_submissions(args.submissions, args.format)
+    totals = grade_stream(records, args.data_dir, args.workers, args.chunk_size)
+    write_scores(totals, args.scores)
+    write_question_accuracy(totals, get_bank(args.data_dir), args.questions)
+    graded = int(totals.attempts.sum())
+    print(f"graded {graded} submissions from {len(totals.candidates)} candidates", file=sys.stderr)
+    if totals.unknown:
+        print(f"skipped {totals.unknown} submissions with unknown question ids", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Streaming validation and compilation of question CSVs into the binary cache.
+
+    python -m src.Engine.ingest [paths ...] [--report bad_rows.csv] [--workers N] [--chunk-size 50000]
+
+Files are read with ``csv.reader`` in chunks of ``chunk_size`` rows, so
+peak memory depends on the chunk size, not the file size. Every row is
+checked against the ``category,question,answer,type`` schema (field count,
+required values, a known type, a hex cluster ID); bad rows are skipped and
+reported with their line numbers, and a file missing a required column
+raises ``IngestError``. Repeated category and type strings are interned to
+codes. Each chunk's columns (string offsets and UTF-8 blobs, codes,
+canonical answers, IDs) are appended to scratch files next to the cache,
+which are then assembled into the ``.epq`` cache that ``bank_cache`` maps.
+Repeats of a question within a file are numbered, as ``question_ids``
+does, by sorting the spilled IDs on disk. The file's SHA-1 for the cache
+stamp is computed during the same read.
+
+``bank_cache`` compiles through here whenever a cache is missing or stale;
+the command line builds (and validates) caches for several files in
+parallel processes.
+"""
+import io
+import os
+import re
+import sys
+import csv
+import mmap
+import time
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .matching import MATCHERS, canonicalize
+from .question_bank import CLUSTER_COLUMN, COLUMNS, DATA_DIR, StringColumn, csv_paths, hash_key, question_key
+from .bank_cache import _CODES, _IDS, _OFFSETS, _VALUES, cache_path_for, write_sections
+from .instrument import count, span
+
+CHUNK_SIZE = 50000
+# Bad rows kept with their messages per file; later ones are only counted
+MAX_REPORTED = 1000
+MAX_CODES = 1 << 16
+# Bytes that are not UTF-8 are decoded to these lone surrogates (errors="surrogateescape")
+_UNDECODABLE = re.compile("[\udc80-\udcff]")
+csv.field_size_limit(1 << 24)
+
+
+class IngestError(ValueError):
+    """A question file that cannot be used at all (e.g. a required column is missing)"""
+
+
+class IngestReport:
+    """Outcome of compiling one file: rows kept and (line, message) for the rows skipped"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.bad_count = 0
+        self.bad_rows = []
+        self.digest = None
+        self.seconds = 0.0
+
+    def bad(self, line, message):
+        self.bad_count += 1
+        if len(self.bad_rows) < MAX_REPORTED:
+            self.bad_rows.append((line, message))
+
+    def summary(self):
+        text = f"{os.path.basename(self.path)}: {self.rows} questions"
+        if self.bad_count:
+            line, message = self.bad_rows[0]
+            text += f", {self.bad_count} bad rows skipped (first at line {line}: {message})"
+        return text
+
+
+class _HashingReader(io.RawIOBase):
+    """Raw file wrapper hashing the bytes as they are read"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha1 = hashlib.sha1()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        if n:
+            self.sha1.update(memoryview(buffer)[:n])
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def _check_header(header, path):
+    missing = [col for col in COLUMNS if col not in header]
+    if missing:
+        raise IngestError(f"{os.path.basename(path)} is missing the {', '.join(missing)} column"
+                          f"{'s' if len(missing) > 1 else ''} (found: {', '.join(header) or 'nothing'})")
+
+
+def _problem(fields, width, positions, cluster_at):
+    """Why a parsed row is unusable, or None"""
+    if len(fields) != width:
+        return f"expected {width} fields, found {len(fields)}"
+    for name, i in zip(COLUMNS, positions):
+        value = fields[i]
+        if not value.strip():
+            return f"empty {name}"
+        if not value.isascii() and _UNDECODABLE.search(value):
+            return f"{name} is not valid UTF-8"
+    qtype = fields[positions[3]]
+    if qtype not in MATCHERS:
+        return f"unknown type {qtype!r} (expected {', '.join(sorted(MATCHERS))})"
+    if cluster_at is not None and fields[cluster_at]:
+        try:
+            int(fields[cluster_at], 16)
+        except ValueError:
+            return f"cluster {fields[cluster_at]!r} is not a hex ID"
+    return None
+
+
+class _Spill:
+    """Scratch files the columns are appended to, chunk by chunk"""
+    NAMES = ("question_offsets", "question_blob", "answer_offsets", "answer_blob", "canonical_offsets",
+             "canonical_blob", "category_codes", "type_codes", "values", "ids", "clusters")
+
+    def __init__(self, directory):
+        self.files = {name: open(os.path.join(directory, name), "w+b") for name in self.NAMES}
+        self.ends = {"question": 0, "answer": 0, "canonical": 0}
+        for column in self.ends:
+            self.files[f"{column}_offsets"].write(np.zeros(1, dtype=_OFFSETS).tobytes())
+
+    def strings(self, column, values):
+        encoded = [v.encode("utf-8", "surrogateescape") for v in values]
+        ends = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))) + self.ends[column]
+        self.files[f"{column}_offsets"].write(ends.astype(_OFFSETS).tobytes())
+        self.files[f"{column}_blob"].write(b"".join(encoded))
+        if len(ends):
+            self.ends[column] = int(ends[-1])
+
+    def array(self, name, values, dtype):
+        self.files[name].write(np.asarray(values, dtype=dtype).tobytes())
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def _codes(values, names):
+    """uint16 codes of values, adding new (interned) names to the names dict"""
+    codes = np.empty(len(values), dtype=_CODES)
+    for i, value in enumerate(values):
+        code = names.get(value)
+        if code is None:
+            if len(names) >= MAX_CODES:
+                raise IngestError(f"more than {MAX_CODES} distinct categories or types")
+            code = names[sys.intern(value)] = len(names)
+        codes[i] = code
+    return codes
+
+
+def _write_chunk(spill, chunk, categories, types):
+    category, question, answer, qtype, cluster = chunk
+    spill.strings("question", question)
+    spill.strings("answer", answer)
+    canonical_text, canonical_values = canonicalize(answer, qtype)
+    spill.strings("canonical", canonical_text)
+    spill.array("category_codes", _codes(category, categories), _CODES)
+    spill.array("type_codes", _codes(qtype, types), _CODES)
+    spill.array("values", canonical_values, _VALUES)
+    # The first occurrence's ID; repeats are renumbered once the whole file is read
+    spill.array("ids", [hash_key(question_key(c, q)) for c, q in zip(category, question)], _IDS)
+    spill.array("clusters", [int(c, 16) if c else 0 for c in cluster], _IDS)
+
+
+def _number_repeats(spill, directory, n, categories, chunk_size):
+    """Give the k-th repeat of a question the ID question_ids would (hash of its key and k)"""
+    if n < 2:
+        return
+    spill.flush()
+    ids = np.memmap(spill.files["ids"].name, dtype=_IDS, mode="r+", shape=(n,))
+    # Sort a copy on disk to find the repeated IDs without holding every ID on the heap
+    ordered = np.memmap(os.path.join(directory, "sorted_ids"), dtype=_IDS, mode="w+", shape=(n,))
+    for start in range(0, n, chunk_size):
+        ordered[start:start + chunk_size] = ids[start:start + chunk_size]
+    ordered.sort()
+    repeated = []
+    for start in range(0, n - 1, chunk_size):
+        window = ordered[start:start + chunk_size + 1]
+        repeated.append(np.unique(window[1:][window[1:] == window[:-1]]))
+    repeated = np.unique(np.concatenate(repeated))
+    del ordered
+    if not len(repeated):
+        del ids
+        return
+    names = list(categories)
+    codes = np.memmap(spill.files["category_codes"].name, dtype=_CODES, mode="r", shape=(n,))
+    offsets = np.memmap(spill.files["question_offsets"].name, dtype=_OFFSETS, mode="r", shape=(n + 1,))
+    with open(spill.files["question_blob"].name, "rb") as f:
+        blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b""
+    questions = StringColumn(memoryview(blob), offsets)
+    seen = {}
+    for start in range(0, n, chunk_size):
+        chunk = ids[start:start + chunk_size]
+        for i in np.flatnonzero(np.isin(chunk, repeated)).tolist():
+            base = int(chunk[i])
+            k = seen[base] = seen.get(base, -1) + 1
+            if k:
+                row = start + i
+                chunk[i] = hash_key(question_key(names[codes[row]], questions[row]), k)
+    ids.flush()
+    del ids, codes, offsets, questions
+    if isinstance(blob, mmap.mmap):
+        blob.close()
+
+
+def _string_table(names):
+    column = StringColumn.from_strings(list(names))
+    return [np.asarray(column.offsets, dtype=_OFFSETS).tobytes(), bytes(column.buffer)]
+
+
+def compile_csv(csv_path, cache_path, mtime_ns=None, size=None, chunk_size=CHUNK_SIZE):
+    """Validate csv_path and write its cache to cache_path, streaming; returns an IngestReport"""
+    report = IngestReport(csv_path)
+    started = time.perf_counter()
+    if mtime_ns is None or size is None:
+        st = os.stat(csv_path)
+        mtime_ns, size = st.st_mtime_ns, st.st_size
+    directory = os.path.dirname(cache_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    with span("load.ingest", source=os.path.basename(csv_path)), \
+            tempfile.TemporaryDirectory(prefix=".ingest-", dir=directory) as scratch:
+        hashing = _HashingReader(open(csv_path, "rb", buffering=0))
+        spill = _Spill(scratch)
+        categories, types = {}, {}
+        try:
+            text = io.TextIOWrapper(io.BufferedReader(hashing, 1 << 20), encoding="utf-8-sig",
+                                    errors="surrogateescape", newline="")
+            reader = csv.reader(text)
+            try:
+                header = next(reader)
+            except StopIteration:
+                header = []
+            except csv.Error as e:
+                raise IngestError(f"{os.path.basename(csv_path)}: unreadable header ({e})")
+            header = [name.strip() for name in header]
+            _check_header(header, csv_path)
+            positions = [header.index(col) for col in COLUMNS]
+            cluster_at = header.index(CLUSTER_COLUMN) if CLUSTER_COLUMN in header else None
+            width = len(header)
+            chunk = ([], [], [], [], [])
+            line = reader.line_num
+            while True:
+                start_line = line + 1
+                try:
+                    fields = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    line = reader.line_num
+                    report.bad(start_line, str(e))
+                    continue
+                line = reader.line_num
+                if not fields:
+                    continue  # blank line
+                problem = _problem(fields, width, positions, cluster_at)
+                if problem:
+                    report.bad(start_line, problem)
+                    continue
+                for column, i in zip(chunk, positions):
+                    column.append(fields[i])
+                chunk[4].append(fields[cluster_at] if cluster_at is not None else "")
+                if len(chunk[0]) >= chunk_size:
+                    _write_chunk(spill, chunk, categories, types)
+                    report.rows += len(chunk[0])
+                    chunk = ([], [], [], [], [])
+            if chunk[0]:
+                _write_chunk(spill, chunk, categories, types)
+                report.rows += len(chunk[0])
+            # The reader may stop before EOF on a final bad row; hash whatever is left
+            while hashing.read(1 << 20):
+                pass
+            report.digest = hashing.sha1.digest()
+            _number_repeats(spill, scratch, report.rows, categories, chunk_size)
+            f = spill.files
+            sections = (_string_table(categories) + _string_table(types)
+                        + [f["question_offsets"], f["question_blob"], f["answer_offsets"], f["answer_blob"],
+                           f["canonical_offsets"], f["canonical_blob"], f["category_codes"], f["type_codes"],
+                           f["values"], f["ids"], f["clusters"]])
+            write_sections(cache_path, sections, mtime_ns, size, report.digest)
+        finally:
+            spill.close()
+            hashing.close()
+    count("load.bad_rows", report.bad_count)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _compile_one(csv_path, cache_dir, chunk_size):
+    try:
+        return compile_csv(csv_path, cache_path_for(csv_path, cache_dir), chunk_size=chunk_size), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.Engine.ingest",
+                                     description="Validate question CSVs and compile their caches, streaming.")
+    parser.add_argument("paths", nargs="*", default=[DATA_DIR], help="CSV files or directories of them")
+    parser.add_argument("--cache-dir", help="defaults to .cache next to each CSV")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows held in memory at a time")
+    parser.add_argument("--workers", type=int, help="files compiled in parallel (default: CPU count)")
+    parser.add_argument("--report", help="write every reported bad row to this CSV")
+    args = parser.parse_args(argv)
+
+    paths = [p for path in args.paths for p in csv_paths(path)]
+    workers = min(args.workers or os.cpu_count() or 1, max(len(paths), 1))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_compile_one, paths, [args.cache_dir] * len(paths),
+                                    [args.chunk_size] * len(paths)))
+    else:
+        results = [_compile_one(path, args.cache_dir, args.chunk_size) for path in paths]
+
+    failed = 0
+    bad_rows = []
+    for path, (report, error) in zip(paths, results):
+        if error:
+            failed += 1
+            print(f"{os.path.basename(path)}: {error}", file=sys.stderr)
+            continue
+        print(f"{report.summary()} [{report.seconds:.1f}s]", file=sys.stderr)
+        bad_rows.extend((path, line, message) for line, message in report.bad_rows)
+        failed += bool(report.bad_count)
+    if args.report:
+        with open(args.report, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(["file", "line", "problem"])
+            writer.writerows(bad_rows)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
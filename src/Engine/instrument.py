@@ -0,0 +1,241 @@
+"""Timing spans and counters for the hot paths, off unless config.yaml or --profile asks for them.
+
+    with span("load", source=name):
+        ...
+
+    @traced("grade.check")
+    def check(...):
+        ...
+
+While disabled, ``span()`` returns a shared no-op context manager and
+``traced`` functions cost one global lookup per call. ``configure()``
+switches recording on for ``debug: true`` or an enabled ``profile:`` block,
+and ``request()`` for the app's ``--profile`` flag. The trace file is only
+written at exit if asked for, by ``--profile`` or the block's ``trace:``:
+
+    profile:
+      trace: progress/trace.json   # Chrome trace (chrome://tracing, Perfetto), written at exit
+      cprofile: false              # profile the GUI thread from start-up
+      tracemalloc: false           # track allocations from start-up
+
+``start_capture()`` / ``stop_capture()`` run cProfile on the calling thread
+and tracemalloc around any stretch of a session; the main window binds
+them to Ctrl+Shift+P. Spans are kept in a bounded in-memory buffer.
+"""
+import os
+import sys
+import time
+import atexit
+import threading
+from collections import deque
+from functools import wraps
+
+TRACE_PATH = os.path.join("progress", "trace.json")
+PROFILE_DIR = os.path.join("progress", "profile")
+MAX_EVENTS = 500000
+MEMORY_TOP = 50
+
+enabled = False
+_requested = False
+_events = deque(maxlen=MAX_EVENTS)
+_counters = {}
+_counters_lock = threading.Lock()
+_settings = {"trace": TRACE_PATH, "dump_dir": PROFILE_DIR}
+_profiler = None
+_exit_registered = False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _complete(self.name, self.start, self.args)
+        return False
+
+
+def _complete(name, start, args=None):
+    end = time.perf_counter_ns()
+    event = {"name": name, "cat": name.split(".", 1)[0], "ph": "X", "ts": start / 1000,
+             "dur": (end - start) / 1000, "pid": os.getpid(), "tid": threading.get_ident()}
+    if args:
+        event["args"] = args
+    _events.append(event)
+
+
+def span(name, **args):
+    """Context manager timing its block as a trace span (a no-op while disabled)"""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Decorator recording each call as a span named name (default: the function's qualified name)"""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _complete(label, start)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Add n to a counter; each change is also a trace counter event"""
+    if not enabled:
+        return
+    with _counters_lock:
+        value = _counters[name] = _counters.get(name, 0) + n
+    _events.append({"name": name, "cat": name.split(".", 1)[0], "ph": "C", "ts": time.perf_counter_ns() / 1000,
+                    "pid": os.getpid(), "tid": threading.get_ident(), "args": {"value": value}})
+
+
+def counters():
+    with _counters_lock:
+        return dict(_counters)
+
+
+def summary():
+    """{span name: (calls, total ms, max ms)} over the spans recorded so far"""
+    totals = {}
+    for event in list(_events):
+        if event["ph"] == "X":
+            calls, total, longest = totals.get(event["name"], (0, 0.0, 0.0))
+            totals[event["name"]] = (calls + 1, total + event["dur"] / 1000, max(longest, event["dur"] / 1000))
+    return totals
+
+
+def request():
+    """Switch recording, and the trace at exit, on whatever config.yaml says (the app's --profile flag)"""
+    global _requested
+    _requested = True
+    configure({})
+
+
+def configure(config):
+    """Switch recording on or off from a parsed config.yaml; returns whether it is on"""
+    global enabled, _exit_registered
+    profile = config.get("profile") or {}
+    if profile is True:
+        profile = {}
+    on = _requested or bool(config.get("debug")) or (bool(config.get("profile")) and profile.get("enabled", True))
+    _settings.update({key: profile[key] for key in ("trace", "dump_dir") if profile.get(key)})
+    _settings["trace_at_exit"] = _requested or bool(profile.get("trace"))
+    enabled = on
+    if not on:
+        return False
+    if profile.get("tracemalloc"):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    _settings["cprofile"] = bool(profile.get("cprofile"))
+    if not _exit_registered:
+        _exit_registered = True
+        atexit.register(_write_at_exit)
+    return True
+
+
+def profile_on_start():
+    """Whether the configuration asks for cProfile from start-up (call start_capture() on that thread)"""
+    return enabled and _settings.get("cprofile", False)
+
+
+def write_trace(path=None):
+    """Write the recorded spans and counters as Chrome trace JSON; returns the path"""
+    import json
+    path = path or _settings["trace"]
+    names = {t.ident: t.name for t in threading.enumerate()}
+    events = list(_events)
+    metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": names[tid]}}
+                for tid in {e["tid"] for e in events} if tid in names]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp, path)
+    return path
+
+
+def capturing():
+    return _profiler is not None
+
+
+def start_capture():
+    """Start cProfile on the calling thread, and tracemalloc if it is not already running"""
+    global _profiler
+    import cProfile
+    import tracemalloc
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def stop_capture(directory=None):
+    """Stop cProfile and write it, the top allocations and the trace so far; returns the paths written"""
+    global _profiler
+    import tracemalloc
+    directory = directory or _settings["dump_dir"]
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    paths = []
+    if _profiler is not None:
+        _profiler.disable()
+        path = os.path.join(directory, f"profile-{stamp}.prof")
+        _profiler.dump_stats(path)
+        _profiler = None
+        paths.append(path)
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        path = os.path.join(directory, f"memory-{stamp}.txt")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"traced memory: {current / 2 ** 20:.1f} MiB now, {peak / 2 ** 20:.1f} MiB peak\n")
+            for stat in snapshot.statistics("lineno")[:MEMORY_TOP]:
+                f.write(f"{stat}\n")
+        tracemalloc.stop()
+        paths.append(path)
+    if enabled:
+        paths.append(write_trace(os.path.join(directory, f"trace-{stamp}.json")))
+    return paths
+
+
+def _write_at_exit():
+    if not enabled:
+        return
+    if _profiler is not None:
+        stop_capture()
+    lines = [f"{name:<28} {calls:>8} calls {total:>10.1f} ms total {longest:>9.2f} ms max"
+             for name, (calls, total, longest) in sorted(summary().items(), key=lambda x: -x[1][1])]
+    if _settings.get("trace_at_exit"):
+        lines.insert(0, f"trace written to {write_trace()}")
+    print("\n".join(lines), file=sys.stderr)
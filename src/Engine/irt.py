@@ -0,0 +1,239 @@
+"""Two-parameter logistic (2PL) item response model for adaptive assessments.
+
+P(correct) = 1 / (1 + exp(-a * (theta - b))) for a candidate of ability
+theta on a question of discrimination a and difficulty b. Parameters are
+fitted in bulk from the attempt log by joint maximum a posteriori
+estimation: every Newton step is a handful of whole-array NumPy operations
+and ``np.bincount`` reductions, so a cohort's history fits in seconds.
+Each quiz or OA session counts as one candidate.
+
+During an assessment ``AdaptiveSession`` keeps a posterior over ability on
+a fixed grid and asks whichever remaining question is most informative at
+the current estimate.
+"""
+import os
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from .attempt_log import CORRECT, OVERRIDDEN, LOG_PATH, count_attempts, read_attempts
+from .question_bank import parse_id
+
+PARAMS_PATH = os.path.join("progress", "irt.npz")
+
+THETA_SD = 1.0
+DIFFICULTY_SD = 2.0
+LOG_DISCRIMINATION_SD = 0.5
+GRID = np.linspace(-4.0, 4.0, 81)
+# Pools whose parameter arrays are kept for AdaptiveSession
+MAX_POOLS = 64
+
+
+def probability(theta, a, b):
+    return 1.0 / (1.0 + np.exp(-a * (theta - b)))
+
+
+def fit_2pl(persons, items, correct, n_persons, n_items, max_iter=30, tol=1e-3):
+    """Fit abilities, discriminations and difficulties to (person, item, correct) response arrays.
+
+    Returns (theta, a, b); items without responses keep their prior a=1, b=0.
+    """
+    persons = np.asarray(persons, dtype=np.intp)
+    items = np.asarray(items, dtype=np.intp)
+    y = np.asarray(correct, dtype=np.float64)
+    theta = np.zeros(n_persons)
+    b = np.zeros(n_items)
+    log_a = np.zeros(n_items)
+
+    def residuals():
+        a = np.exp(log_a)[items]
+        x = theta[persons] - b[items]
+        p = probability(x, a, 0.0)
+        return a, x, y - p, p * (1.0 - p)
+
+    for _ in range(max_iter):
+        # Alternating diagonal Newton steps on the log posterior: abilities, then all item parameters
+        a, _, r, w = residuals()
+        step_theta = ((np.bincount(persons, a * r, n_persons) - theta / THETA_SD ** 2)
+                      / (np.bincount(persons, a * a * w, n_persons) + 1 / THETA_SD ** 2))
+        theta += np.clip(step_theta, -1.0, 1.0)
+
+        a, x, r, w = residuals()
+        ax = a * x
+        step_b = ((np.bincount(items, -a * r, n_items) - b / DIFFICULTY_SD ** 2)
+                  / (np.bincount(items, a * a * w, n_items) + 1 / DIFFICULTY_SD ** 2))
+        step_a = ((np.bincount(items, ax * r, n_items) - log_a / LOG_DISCRIMINATION_SD ** 2)
+                  / (np.bincount(items, ax * ax * w, n_items) + 1 / LOG_DISCRIMINATION_SD ** 2))
+        b += np.clip(step_b, -1.0, 1.0)
+        log_a += np.clip(step_a, -0.5, 0.5)
+
+        if max(np.abs(step_theta).max(initial=0), np.abs(step_b).max(initial=0),
+               np.abs(step_a).max(initial=0)) < tol:
+            break
+    return theta, np.exp(log_a), b
+
+
+class ItemParameters:
+    """Fitted a and b for every row of a bank (prior values for unanswered questions)"""
+
+    def __init__(self, bank, a=None, b=None, responses=None):
+        n = len(bank)
+        self.bank = bank
+        # Fitted rows stay resolvable (for save()) if their file is reloaded
+        self.tables = bank.tables()
+        self.a = np.ones(n) if a is None else a
+        self.b = np.zeros(n) if b is None else b
+        self.responses = np.zeros(n, dtype=np.int64) if responses is None else responses
+        self._pools = OrderedDict()
+        self._pools_lock = threading.Lock()
+
+    @classmethod
+    def fit(cls, bank, attempts):
+        """Fit from an attempt-log structured array (see attempt_log.RECORD)"""
+        params = cls(bank)
+        if not len(attempts):
+            return params
+        question_ids, question_index = np.unique(attempts["question"], return_inverse=True)
+        id_rows = np.array([-1 if row is None else row for row in map(bank.row_of, question_ids.tolist())],
+                           dtype=np.int64)
+        rows = id_rows[question_index]
+        known = rows >= 0
+        sessions, persons = np.unique(attempts["session"][known], return_inverse=True)
+        fitted_rows, items = np.unique(rows[known], return_inverse=True)
+        correct = (attempts["flags"][known] & (CORRECT | OVERRIDDEN)) != 0
+        _, a, b = fit_2pl(persons, items, correct, len(sessions), len(fitted_rows))
+        params.a[fitted_rows] = a
+        params.b[fitted_rows] = b
+        params.responses[fitted_rows] = np.bincount(items, minlength=len(fitted_rows))
+        return params
+
+    def pool(self, rows=None):
+        """(rows, a, a / 2, b) of a pool of rows as read-only float32 arrays, shared by every session over it"""
+        # Keyed by the array passed in (kept alive by its entry): QuestionBank.rows() hands out one per pool
+        key = None if rows is None else id(rows)
+        with self._pools_lock:
+            cached = self._pools.get(key)
+            if cached is not None:
+                self._pools.move_to_end(key)
+                return cached[1]
+            selected = np.arange(len(self.a)) if rows is None else np.asarray(rows, dtype=np.int64)
+            a = self.a[selected].astype(np.float32)
+            pool = (selected, a, a / 2, self.b[selected].astype(np.float32))
+            for array in pool:
+                array.flags.writeable = False
+            self._pools[key] = (rows, pool)
+            if len(self._pools) > MAX_POOLS:
+                self._pools.popitem(last=False)
+            return pool
+
+    def save(self, path=PARAMS_PATH, log_count=0):
+        ids = np.array([parse_id(self.bank.id_of(row)) for row in np.flatnonzero(self.responses).tolist()],
+                       dtype=np.uint64)
+        fitted = self.responses > 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, ids=ids, a=self.a[fitted], b=self.b[fitted], responses=self.responses[fitted],
+                 log_count=np.int64(log_count))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, bank, path=PARAMS_PATH, log_count=None):
+        """Saved parameters, or None if missing or (given log_count) fitted from a different log length"""
+        try:
+            with np.load(path) as data:
+                if log_count is not None and int(data["log_count"]) != log_count:
+                    return None
+                ids, a, b, responses = data["ids"], data["a"], data["b"], data["responses"]
+        except (OSError, ValueError, KeyError):
+            return None
+        params = cls(bank)
+        for qid, ai, bi, n in zip(ids.tolist(), a.tolist(), b.tolist(), responses.tolist()):
+            row = bank.row_of(qid)
+            if row is not None:
+                params.a[row], params.b[row], params.responses[row] = ai, bi, n
+        return params
+
+
+def get_item_parameters(bank, log_path=LOG_PATH, path=PARAMS_PATH):
+    """Item parameters for the current attempt log, refitted only when the log has grown"""
+    log_count = count_attempts(log_path)
+    params = ItemParameters.load(bank, path, log_count)
+    if params is None:
+        params = ItemParameters.fit(bank, read_attempts(log_path))
+        params.save(path, log_count)
+    return params
+
+
+_local = threading.local()
+
+
+def _scratch(n):
+    """float32 buffer of n items for AdaptiveSession.next_row(), one per thread"""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or len(buffer) < n:
+        buffer = _local.buffer = np.empty(n, dtype=np.float32)
+    return buffer[:n]
+
+
+class AdaptiveSession:
+    """One candidate's adaptive assessment over a pool of bank rows.
+
+    Ability is tracked as a posterior on GRID (standard normal prior), so an
+    answer costs one pass over the grid and picking the next question one
+    pass over the remaining pool. The pool's parameter arrays are shared by
+    every session over it (ItemParameters.pool()) and the selection scratch
+    by every session on a thread, so a session only keeps its posterior and
+    the questions it has asked.
+    """
+
+    def __init__(self, params, rows=None, max_items=10, target_se=0.3):
+        # rows must be ascending, as returned by QuestionBank.rows()
+        self.params = params
+        self.rows, self._weight, self._half_a, self._b = params.pool(rows)
+        self.max_items = min(max_items, len(self.rows))
+        self.target_se = target_se
+        self.log_posterior = -0.5 * (GRID / THETA_SD) ** 2
+        self.asked = []
+        self.theta = 0.0
+        self.standard_error = THETA_SD
+
+    @property
+    def finished(self):
+        return len(self.asked) >= self.max_items or self.standard_error <= self.target_se
+
+    def next_row(self):
+        """Remaining row with the most Fisher information at the current ability estimate, or None"""
+        if self.finished or len(self.asked) >= len(self.rows):
+            return None
+        # a^2 p (1 - p) = (a / (2 cosh(a (theta - b) / 2)))^2, so maximize a / cosh(a |theta - b| / 2)
+        buffer = _scratch(len(self.rows))
+        np.subtract(self._b, np.float32(self.theta), out=buffer)
+        np.abs(buffer, out=buffer)
+        np.multiply(buffer, self._half_a, out=buffer)
+        np.minimum(buffer, np.float32(80.0), out=buffer)
+        np.cosh(buffer, out=buffer)
+        np.divide(self._weight, buffer, out=buffer)
+        buffer[self.asked] = -np.inf
+        i = int(np.argmax(buffer))
+        self.asked.append(i)
+        return int(self.rows[i])
+
+    def restore(self, row):
+        """Mark row as asked, as next_row() would have (when resuming a saved session)"""
+        i = int(np.searchsorted(self.rows, row))
+        if i >= len(self.rows) or self.rows[i] != row:
+            raise KeyError(f"Row {row} is not in this session's pool")
+        self.asked.append(i)
+
+    def record(self, row, correct):
+        """Update the ability posterior with the answer to row"""
+        p = probability(GRID, self.params.a[row], self.params.b[row])
+        self.log_posterior += np.log(p if correct else 1.0 - p)
+        weights = np.exp(self.log_posterior - self.log_posterior.max())
+        weights /= weights.sum()
+        self.theta = float(weights @ GRID)
+        self.standard_error = float(np.sqrt(weights @ (GRID - self.theta) ** 2))
+
+    def percentile(self):
+        """Share of (standard normal) candidates below the current estimate"""
+        return 0.5 * (1.0 + math.erf(self.theta / (THETA_SD * math.sqrt(2.0))))
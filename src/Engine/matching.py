@@ -0,0 +1,204 @@
+import re
+import math
+import hashlib
+import unicodedata
+import numpy as np
+
+# Bump when the built-in normalization changes, so cached canonical forms are rebuilt
+MATCHING_VERSION = 3
+
+_SPACE = re.compile(r"\s+")
+_NUMBER = r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:e[-+]?\d+)?"
+_PLAIN = re.compile(_NUMBER)
+_FRACTION = re.compile(rf"({_NUMBER})\s*/\s*({_NUMBER})")
+_MIXED = re.compile(r"([-+]?)(\d+)\s+(\d+)\s*/\s*(\d+)")
+_SCIENTIFIC = re.compile(rf"({_NUMBER})\s*[x×*]\s*10\s*\^\s*\(?([-+]?\d+)\)?")
+_CURRENCY = re.compile(r"^([-+]?)\s*([$€£¥])\s*")
+_UNIT = re.compile(r"\s*(%|[a-zμ°][a-zμ°/²³]*)$")
+# Commas are only accepted between groups of three digits
+_GROUPED = re.compile(r"(?<![\d,])\d{1,3}(?:,\d{3})+(?![\d,])")
+_PREFIX = re.compile(r"^(?:≈|~|about|approx\.?|approximately)\s*")
+
+# Units an answer may end with (after normalization), by the name they compare as
+UNITS = {
+    "%": ("%", "percent", "pct"),
+    "bp": ("bp", "bps"),
+    "°": ("°", "deg", "degree", "degrees"),
+    "°c": ("°c",),
+    "°f": ("°f",),
+    "ns": ("ns",),
+    "μs": ("μs", "us"),
+    "ms": ("ms",),
+    "s": ("s", "sec", "secs", "second", "seconds"),
+    "min": ("min", "mins", "minute", "minutes"),
+    "h": ("h", "hr", "hrs", "hour", "hours"),
+    "day": ("day", "days"),
+    "week": ("wk", "wks", "week", "weeks"),
+    "month": ("month", "months"),
+    "year": ("yr", "yrs", "year", "years"),
+    "mm": ("mm",),
+    "cm": ("cm",),
+    "m": ("m", "meter", "meters", "metre", "metres"),
+    "km": ("km",),
+    "in": ("in", "inch", "inches"),
+    "ft": ("ft", "foot", "feet"),
+    "mi": ("mi", "mile", "miles"),
+    "m/s": ("m/s",),
+    "km/h": ("km/h", "kph"),
+    "mph": ("mph",),
+    "mg": ("mg",),
+    "g": ("g", "gram", "grams"),
+    "kg": ("kg",),
+    "lb": ("lb", "lbs"),
+    "$": ("$", "dollar", "dollars", "usd"),
+    "€": ("€", "euro", "euros", "eur"),
+    "£": ("£", "pound", "pounds", "gbp"),
+    "¥": ("¥", "yen", "jpy"),
+    "¢": ("cent", "cents"),
+}
+_UNIT_NAMES = {alias: name for name, aliases in UNITS.items() for alias in aliases}
+
+
+def normalize_text(text):
+    """NFKC-normalized, casefolded text with collapsed whitespace and no trailing period"""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return _SPACE.sub(" ", text).strip().rstrip(".").strip()
+
+
+def parse_quantity(text):
+    """(value, unit) of an answer such as "221", "3/4", "1 1/2", "1,250", "$7.88", "12 cm" or "75%".
+
+    unit is the UNITS name of its currency sign or trailing unit ("" if none); value is nan if the
+    answer is not a number, has an unknown trailing word ("5 apples"), both a currency sign and a
+    unit, or commas anywhere but between thousands ("1,5").
+    """
+    s = normalize_text(text).replace("−", "-").replace("⁄", "/")
+    s = _PREFIX.sub("", s)
+    unit = ""
+    m = _CURRENCY.match(s)
+    if m:
+        unit = m.group(2)
+        s = m.group(1) + s[m.end():]
+    m = _UNIT.search(s)
+    if m and m.start():
+        name = _UNIT_NAMES.get(m.group(1))
+        if name is None or unit:
+            return math.nan, ""
+        unit = name
+        s = s[:m.start()]
+    if "," in s:
+        s = _GROUPED.sub(lambda g: g.group().replace(",", ""), s)
+        if "," in s:
+            return math.nan, unit
+    try:
+        if _PLAIN.fullmatch(s):
+            return float(s), unit
+        m = _FRACTION.fullmatch(s)
+        if m:
+            return float(m.group(1)) / float(m.group(2)), unit
+        m = _MIXED.fullmatch(s)
+        if m:
+            value = int(m.group(2)) + int(m.group(3)) / int(m.group(4))
+            return -value if m.group(1) == "-" else value, unit
+        m = _SCIENTIFIC.fullmatch(s)
+        if m:
+            return float(m.group(1)) * 10.0 ** int(m.group(2)), unit
+    except (ValueError, ZeroDivisionError, OverflowError):
+        pass
+    return math.nan, unit
+
+
+def parse_number(text):
+    """Numeric value of an answer (see parse_quantity()), else nan"""
+    return parse_quantity(text)[0]
+
+
+def same_unit(expected_unit, given_unit):
+    """Whether an answer in given_unit may match one in expected_unit: the same, or left out"""
+    return not given_unit or given_unit == expected_unit
+
+
+class TextMatcher:
+    """Exact match after Unicode, case and whitespace normalization"""
+
+    def canonical(self, answer):
+        return normalize_text(answer), math.nan
+
+    def matches(self, expected_text, expected_value, given):
+        return normalize_text(given) == expected_text
+
+    def matches_many(self, expected_text, expected_value, given):
+        return np.array([normalize_text(g) == e for e, g in zip(expected_text, given)], dtype=bool)
+
+
+class NumericMatcher(TextMatcher):
+    """Numeric comparison within a tolerance, falling back to text for non-numeric answers.
+
+    A given unit (or currency) must be the expected one; an answer without a unit is compared by value.
+    The canonical form of a numeric answer is (its UNITS name, its value), both computed once at load;
+    other answers keep their normalized text.
+    """
+
+    def __init__(self, rel_tol=1e-6, abs_tol=1e-9):
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+
+    def canonical(self, answer):
+        value, unit = parse_quantity(answer)
+        return (normalize_text(answer) if math.isnan(value) else unit), value
+
+    def matches(self, expected_text, expected_value, given):
+        if math.isnan(expected_value):
+            return super().matches(expected_text, expected_value, given)
+        value, unit = parse_quantity(given)
+        return (same_unit(expected_text, unit)
+                and math.isclose(value, expected_value, rel_tol=self.rel_tol, abs_tol=self.abs_tol))
+
+    def matches_many(self, expected_text, expected_value, given):
+        expected_value = np.asarray(expected_value, dtype=np.float64)
+        given_value = np.empty(len(given), dtype=np.float64)
+        for i, g in enumerate(given):
+            value, unit = parse_quantity(g)
+            given_value[i] = value if same_unit(expected_text[i], unit) else math.nan
+        result = np.isclose(given_value, expected_value, rtol=self.rel_tol, atol=self.abs_tol)
+        textual = np.flatnonzero(np.isnan(expected_value))
+        if len(textual):
+            result[textual] = super().matches_many([expected_text[i] for i in textual], None,
+                                                   [given[i] for i in textual])
+        return result
+
+
+DEFAULT_MATCHER = TextMatcher()
+MATCHERS = {
+    "text": DEFAULT_MATCHER,
+    "math": NumericMatcher(),
+}
+
+
+def register_matcher(qtype, matcher):
+    """Use matcher for questions of type qtype; register before loading any bank"""
+    MATCHERS[qtype] = matcher
+
+
+def signature():
+    """64-bit fingerprint of the registered matchers and their settings"""
+    parts = [str(MATCHING_VERSION)]
+    for qtype, matcher in sorted(MATCHERS.items()):
+        cls = type(matcher)
+        parts.append(f"{qtype}={cls.__module__}.{cls.__qualname__}{sorted(vars(matcher).items())}")
+    digest = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def get_matcher(qtype):
+    return MATCHERS.get(qtype, DEFAULT_MATCHER)
+
+
+def canonicalize(answers, qtypes):
+    """Canonical (texts, float64 values) for a column of answers with their question types"""
+    texts = []
+    values = np.empty(len(answers), dtype=np.float64)
+    for i, (answer, qtype) in enumerate(zip(answers, qtypes)):
+        text, values[i] = get_matcher(qtype).canonical(answer)
+        texts.append(text)
+    return texts, values
@@ -1,33 +1,131 @@
-import pandas as pd
-import random
+from .question_bank import DATA_DIR, get_bank
+from .search import search
+from .sampler import Sampler
+from .irt import AdaptiveSession, get_item_parameters
+from .papers import PAPER_LENGTH, generate_papers
+from .rng import SAMPLE, new_seed, stream
+from .instrument import traced
+
+SECONDS_PER_QUESTION = 90
 
 class OAEngine:
-    def __init__(self, csv_path):
-        self.questions = pd.read_csv(csv_path)
-        self.current_indices = []
+    def __init__(self, csv_path=None, bank=None, params=None, seed=None):
+        self.bank = bank if bank is not None else get_bank(csv_path or DATA_DIR)
+        # Batches are drawn from the seed's stream; adaptive selection involves no randomness
+        self.seed = new_seed() if seed is None else seed
+        self.sampler = Sampler(self.bank, stream(self.seed, SAMPLE))
+        self.params = params
+        self.adaptive = None
+        self.current_ids = []
+        self.current_rows = {}
         self.answered = {}
+        # Tables the current questions were handed out from, so a reload keeps them gradable
+        self._held = ()
+        self._held_version = None
+
+    def _hold(self):
+        # Only the latest version's tables: older ones are freed once their questions are done with
+        if self._held_version != self.bank.version:
+            self._held_version = self.bank.version
+            self._held = self.bank.tables()
 
+    @traced("sample.batch")
     def get_batch(self, n=5, category=None):
-        if category:
-            filtered = self.questions[self.questions['category'] == category]
-        else:
-            filtered = self.questions
-        available = filtered[~filtered.index.isin(self.current_indices)]
-        if len(available) < n:
-            n = len(available)
-        batch = random.sample(available.index.tolist(), n)
-        self.current_indices.extend(batch)
-        return [filtered.loc[idx].to_dict() for idx in batch]
-
-    def submit_answer(self, idx, user_answer):
-        correct = str(self.questions.loc[idx, 'answer']).strip().lower()
+        batch = []
+        self._hold()
+        for row in self.sampler.draw_many(n, category):
+            question = self.bank.record(row)
+            self.current_rows[question['id']] = row
+            batch.append(question)
+        self.current_ids.extend(q['id'] for q in batch)
+        return batch
+
+    def generate_papers(self, n, quotas=None, length=PAPER_LENGTH, seed=None, max_reuse=None, source=None):
+        """n fixed papers for printing or export, all drawn at once (see papers.py); does not touch this session"""
+        return generate_papers(self.bank, n, quotas, length, seed, max_reuse, source)
+
+    def start_adaptive(self, max_items=10, category=None, source=None):
+        """Begin an adaptive assessment; questions then come from next_adaptive()"""
+        if self.params is None or len(self.params.a) < len(self.bank):
+            # Files reloaded since the fit add rows the parameters do not cover yet
+            self.params = get_item_parameters(self.bank)
+        self._hold()
+        self.adaptive = AdaptiveSession(self.params, self.bank.rows(category=category, source=source), max_items)
+        return self.adaptive
+
+    def resume_adaptive(self, question_ids, answers, max_items=10, category=None, source=None):
+        """Rebuild an adaptive assessment from the questions asked and {index: correct} of those answered.
+
+        Returns the record of the question that was being answered, or None if every asked
+        question has an answer (call next_adaptive() for the next one).
+        """
+        self.reset()
+        self.start_adaptive(max_items, category, source)
+        pending = None
+        for index, question_id in enumerate(question_ids):
+            row = self._row(question_id)
+            self.adaptive.restore(row)
+            self.current_ids.append(question_id)
+            self.current_rows[question_id] = row
+            if index in answers:
+                # The answer text is not kept, only whether it was right
+                self.answered[question_id] = ("", answers[index])
+                self.adaptive.record(row, answers[index])
+            else:
+                pending = self.bank.record(row)
+        return pending
+
+    @traced("sample.adaptive")
+    def next_adaptive(self):
+        """Most informative remaining question, or None once the assessment is finished"""
+        row = self.adaptive.next_row()
+        if row is None:
+            return None
+        self._hold()
+        question = self.bank.record(row)
+        self.current_ids.append(question['id'])
+        self.current_rows[question['id']] = row
+        return question
+
+    def search(self, query, limit=20, source=None):
+        """Questions ranked by how well their text matches query"""
+        return search(self.bank, query, limit, source)
+
+    def _row(self, question_id):
+        # Questions handed out keep their row even if their file has since been reloaded
+        row = self.current_rows.get(question_id)
+        if row is None:
+            row = self.bank.row_of(question_id)
+        if row is None:
+            raise KeyError(f"Unknown question id: {question_id}")
+        return row
+
+    def submit_answer(self, question_id, user_answer):
         user = str(user_answer).strip().lower()
-        self.answered[idx] = (user, user == correct)
-        return user == correct
+        row = self._row(question_id)
+        correct = self.bank.check(row, user_answer)
+        self.answered[question_id] = (user, correct)
+        if self.adaptive is not None:
+            self.adaptive.record(row, correct)
+        return correct
+
+    def submit_answers(self, question_ids, user_answers):
+        """Grade many submissions in one pass; returns a boolean array"""
+        results = self.bank.grade([self._row(qid) for qid in question_ids], user_answers)
+        for qid, user_answer, correct in zip(question_ids, user_answers, results):
+            self.answered[qid] = (str(user_answer).strip().lower(), bool(correct))
+        return results
 
     def score(self):
         return sum(1 for _, correct in self.answered.values() if correct), len(self.answered)
 
-    def reset(self):
-        self.current_indices = []
-        self.answered = {} 
\ No newline at end of file
+    def reset(self, seed=None):
+        """Start a new session from seed (default: a fresh one)"""
+        self.seed = new_seed() if seed is None else seed
+        self.current_ids = []
+        self.current_rows = {}
+        self.answered = {}
+        self._held = ()
+        self._held_version = None
+        self.adaptive = None
+        self.sampler.reset(self.seed) 
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""Bulk generation of fixed mock OA papers for printing or export.
+
+    python -m src.Engine.papers 10000 --length 10 --seed 7 -o papers.jsonl -o papers.pdf
+    python -m src.Engine.papers 500 --quota "Finance=4" --quota "Probability=3" --max-reuse 40 -o papers.csv
+
+Every paper takes a fixed number of questions from each category (its
+quota), never repeats a question or near-duplicate cluster within a paper,
+and questions are reused across papers as evenly as possible. All papers
+are drawn at once as an (papers, length) array of bank rows: for each
+category, the stream of questions is a sequence of random permutations of
+its pool (one "epoch" per pass through the pool) cut into consecutive
+quota-sized slices, so every question is used either floor or ceil of
+papers * quota / pool times. Only a slice straddling two epochs could
+repeat a question; those few are repaired by swapping within the later
+permutation. Questions sharing a cluster count as one pool entry, and each
+reuse of the entry takes the cluster's next member.
+
+The same bank, options and seed give the same papers. Exports stream one
+paper at a time: JSONL (one paper per line), CSV (one question per row,
+with the question IDs ``grade`` expects) and PDF (``ui/printing.py``).
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import numpy as np
+from .question_bank import DATA_DIR, get_bank
+from .rng import PAPERS, new_seed, stream
+from .instrument import traced
+
+PAPER_LENGTH = 10
+FORMATS = (".jsonl", ".csv", ".pdf")
+
+
+def balanced_quotas(bank, length=PAPER_LENGTH, source=None):
+    """{category: count} spreading length over every category, larger pools taking the remainder"""
+    sizes = {c: len(bank.rows(category=c, source=source)) for c in bank.by_category}
+    categories = sorted((c for c in sizes if sizes[c]), key=lambda c: -sizes[c])
+    if not categories:
+        raise ValueError("There are no questions to build papers from")
+    base, extra = divmod(length, len(categories))
+    quotas = {c: base + (i < extra) for i, c in enumerate(categories)}
+    return {c: n for c, n in quotas.items() if n}
+
+
+def _units(bank, rows):
+    """(member rows grouped by unit, unit starts, unit sizes): a unit is a cluster or an unclustered question"""
+    clusters = bank.clusters[rows]
+    unit = np.empty(len(rows), dtype=np.int64)
+    clustered = clusters != 0
+    _, unit[clustered] = np.unique(clusters[clustered], return_inverse=True)
+    n_clusters = int(unit[clustered].max()) + 1 if clustered.any() else 0
+    unit[~clustered] = n_clusters + np.arange(int((~clustered).sum()))
+    order = np.argsort(unit, kind="stable")
+    sizes = np.bincount(unit)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return rows[order], starts, sizes
+
+
+def _repair(perms, overlap):
+    """Swap questions out of each permutation's head that ended the previous one, in place"""
+    for e in range(1, len(perms)):
+        tail = perms[e - 1, -overlap:]
+        bad = np.flatnonzero(np.isin(perms[e, :overlap], tail))
+        if bad.size:
+            free = overlap + np.flatnonzero(~np.isin(perms[e, overlap:], tail))[:bad.size]
+            perms[e, bad], perms[e, free] = perms[e, free], perms[e, bad].copy()
+
+
+def _draw(rng, n, quota, n_units, max_reuse, category):
+    """(n, quota) unit numbers and how many times each one was used before"""
+    if quota > n_units:
+        raise ValueError(f"{category} has {n_units} distinct questions, fewer than the {quota} asked for per paper")
+    epochs = -(-n * quota // n_units)
+    if max_reuse is not None and epochs > max_reuse:
+        raise ValueError(f"{category} has {n_units} distinct questions: at most {max_reuse * n_units // quota} "
+                         f"papers can take {quota} each with no question used more than {max_reuse} times")
+    overlap = quota - 1
+    if epochs > 1 and n_units < 2 * overlap:
+        # Too few questions to keep epoch boundaries apart: draw every paper independently
+        units = rng.random((n, n_units)).argsort(axis=1)[:, :quota]
+        return units, np.broadcast_to(np.arange(n)[:, None], units.shape)
+    perms = rng.random((epochs, n_units)).argsort(axis=1)
+    if epochs > 1 and overlap:
+        _repair(perms, overlap)
+    stream = np.arange(n * quota)
+    return perms.reshape(-1)[:n * quota].reshape(n, quota), (stream // n_units).reshape(n, quota)
+
+
+@traced("sample.papers")
+def generate_papers(bank, n, quotas=None, length=PAPER_LENGTH, seed=None, max_reuse=None, source=None,
+                    shuffle=True):
+    """n papers taking quotas[category] questions from each category (default: length split evenly).
+
+    max_reuse caps how many papers may share a question (ValueError if the pools are too small);
+    shuffle mixes the categories within each paper instead of keeping them in quota order.
+    """
+    if n < 1:
+        raise ValueError("Generate at least one paper")
+    quotas = dict(quotas) if quotas else balanced_quotas(bank, length, source)
+    if seed is None:
+        seed = new_seed()
+    rng = stream(seed, PAPERS)
+    parts = []
+    for category, quota in quotas.items():
+        rows = bank.rows(category=category, source=source)
+        if not len(rows):
+            raise ValueError(f"No questions in category {category!r}")
+        members, starts, sizes = _units(bank, rows)
+        units, uses = _draw(rng, n, quota, len(sizes), max_reuse, category)
+        # Successive uses of a cluster rotate through its members from a random one
+        offsets = rng.integers(0, sizes)
+        parts.append(members[starts[units] + (offsets[units] + uses) % sizes[units]])
+    rows = np.concatenate(parts, axis=1)
+    if shuffle:
+        rows = np.take_along_axis(rows, rng.random(rows.shape).argsort(axis=1), axis=1)
+    return Papers(bank, rows, quotas, seed)
+
+
+class Papers:
+    """Generated papers: rows[i] holds the bank rows of paper i; seed reproduces them"""
+
+    def __init__(self, bank, rows, quotas, seed):
+        self.bank = bank
+        self.rows = rows
+        # The papers keep their questions if a file is reloaded
+        self.tables = bank.tables()
+        self.quotas = quotas
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return [self.bank.record(row) for row in self.rows[i].tolist()]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def uses(self):
+        """Number of papers each bank row appears in"""
+        return np.bincount(self.rows.ravel(), minlength=len(self.bank))
+
+    def write_jsonl(self, path, answers=True):
+        with open(path, "w", encoding="utf-8") as f:
+            for i, paper in enumerate(self):
+                if not answers:
+                    for question in paper:
+                        del question['answer']
+                f.write(json.dumps({"paper": i + 1, "seed": self.seed, "questions": paper}, ensure_ascii=False))
+                f.write("\n")
+
+    def write_csv(self, path, answers=True):
+        fields = ["paper", "position", "question_id", "category", "type", "question"] + (["answer"] if answers else [])
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for i, paper in enumerate(self):
+                writer.writerows([i + 1, k + 1, q['id'], q['category'], q['type'], q['question']]
+                                 + ([q['answer']] if answers else []) for k, q in enumerate(paper))
+
+    def write(self, path, answers=True, title="Mock OA"):
+        """Export by file extension (.jsonl, .csv or .pdf)"""
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".jsonl":
+            self.write_jsonl(path, answers)
+        elif extension == ".csv":
+            self.write_csv(path, answers)
+        elif extension == ".pdf":
+            from ..ui.printing import write_pdf
+            write_pdf(self, path, answers, title)
+        else:
+            raise ValueError(f"Cannot export to {path}: use one of {', '.join(FORMATS)}")
+
+
+def _quota(text):
+    category, _, count = text.rpartition("=")
+    if not category or not count.isdigit() or not int(count):
+        raise argparse.ArgumentTypeError(f"expected CATEGORY=COUNT, got {text!r}")
+    return category.strip(), int(count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.Engine.papers",
+                                     description="Generate many distinct, balanced mock OA papers and export them.")
+    parser.add_argument("papers", type=int, help="number of papers")
+    parser.add_argument("--length", type=int, default=PAPER_LENGTH, help="questions per paper, spread over categories")
+    parser.add_argument("--quota", type=_quota, action="append", metavar="CATEGORY=COUNT",
+                        help="questions per paper from a category (repeatable; replaces --length)")
+    parser.add_argument("--source", help="only use questions from this file")
+    parser.add_argument("--seed", type=int, help="reproduce an earlier run (printed after generating)")
+    parser.add_argument("--max-reuse", type=int, help="fail rather than put a question in more papers than this")
+    parser.add_argument("--no-shuffle", action="store_true", help="keep each paper's questions grouped by category")
+    parser.add_argument("--no-answers", action="store_true", help="leave the answers out of the exports")
+    parser.add_argument("--title", default="Mock OA", help="heading of each paper in the PDF")
+    parser.add_argument("-o", "--output", action="append", default=[], help=f"export file ({', '.join(FORMATS)})")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    for path in args.output:
+        if os.path.splitext(path)[1].lower() not in FORMATS:
+            parser.error(f"cannot export to {path}: use one of {', '.join(FORMATS)}")
+    bank = get_bank(args.data_dir)
+    started = time.perf_counter()
+    try:
+        papers = generate_papers(bank, args.papers, args.quota, args.length, args.seed, args.max_reuse, args.source,
+                                 not args.no_shuffle)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    uses = papers.uses()
+    print(f"generated {len(papers)} papers of {papers.rows.shape[1]} questions in "
+          f"{time.perf_counter() - started:.2f}s (seed {papers.seed}); each question is in at most "
+          f"{uses.max()} papers", file=sys.stderr)
+    for path in args.output:
+        started = time.perf_counter()
+        papers.write(path, not args.no_answers, args.title)
+        print(f"wrote {path} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+import os
+import bisect
+import hashlib
+import weakref
+import threading
+import numpy as np
+from .matching import canonicalize, get_matcher, normalize_text
+from .instrument import span, traced
+
+DATA_DIR = os.path.join("data")
+COLUMNS = ("category", "question", "answer", "type")
+# Optional column of near-duplicate cluster IDs, written by ``python -m src.Engine.dedup``
+CLUSTER_COLUMN = "cluster"
+
+
+class StringColumn:
+    """Immutable UTF-8 string column: one contiguous buffer plus an offsets array"""
+    __slots__ = ("buffer", "offsets")
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return str(self.buffer[start:end], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def prefix_keys(self, indices, skip=0):
+        """UTF-8 bytes skip to skip + 8 of each indexed string (zero-padded, ASCII lowercased) as big-endian uint64"""
+        data = np.frombuffer(self.buffer, dtype=np.uint8)
+        offsets = np.asarray(self.offsets)
+        indices = np.asarray(indices, dtype=np.int64)
+        starts, ends = offsets[indices] + skip, offsets[indices + 1]
+        keys = np.zeros(len(indices), dtype=np.uint64)
+        if not len(data):
+            return keys
+        for k in range(8):
+            position = starts + k
+            byte = np.where(position < ends, data[np.minimum(position, len(data) - 1)], 0).astype(np.uint64)
+            byte[(byte >= 65) & (byte <= 90)] += np.uint64(32)
+            keys |= byte << np.uint64(56 - 8 * k)
+        return keys
+
+
+def question_ids(categories, questions, seen=None):
+    """Stable 64-bit IDs hashed from normalized category and question text.
+
+    Edits to whitespace, case or the answer keep a question's ID. Repeats of
+    the same question within one file get the occurrence number mixed in;
+    pass the same seen dict when hashing a file in chunks.
+    """
+    seen = {} if seen is None else seen
+    ids = np.empty(len(questions), dtype=np.uint64)
+    for i, (category, question) in enumerate(zip(categories, questions)):
+        key = question_key(category, question)
+        n = seen[key] = seen.get(key, -1) + 1
+        ids[i] = hash_key(key, n)
+    return ids
+
+
+def question_key(category, question):
+    return f"{normalize_text(category)}\x1f{normalize_text(question)}"
+
+
+def hash_key(key, occurrence=0):
+    """ID of the occurrence-th repeat (0 for the first) of a question_key within one file"""
+    if occurrence:
+        key = f"{key}\x1f{occurrence}"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def format_id(qid):
+    return f"{int(qid):016x}"
+
+
+def parse_id(qid):
+    return qid if isinstance(qid, int) else int(qid, 16)
+
+
+def parse_clusters(values, n):
+    """uint64 cluster IDs from a column of hex strings (0 where empty or missing)"""
+    clusters = np.zeros(n, dtype=np.uint64)
+    if values is not None:
+        for i, value in enumerate(values):
+            if value:
+                clusters[i] = int(value, 16)
+    return clusters
+
+
+class QuestionTable:
+    """Columnar questions from one source file.
+
+    category/type are stored as codes; each answer also has a canonical text
+    and value precomputed by its type's matcher (see matching.py). clusters
+    holds near-duplicate cluster IDs, 0 for questions without one.
+    """
+    __slots__ = ("source", "ids", "categories", "types", "category_codes", "type_codes", "questions", "answers",
+                 "canonical_text", "canonical_values", "clusters", "__weakref__")
+
+    def __init__(self, source, ids, categories, types, category_codes, type_codes, questions, answers,
+                 canonical_text, canonical_values, clusters):
+        self.source = source
+        self.ids = ids
+        self.categories = categories
+        self.types = types
+        self.category_codes = category_codes
+        self.type_codes = type_codes
+        self.questions = questions
+        self.answers = answers
+        self.canonical_text = canonical_text
+        self.canonical_values = canonical_values
+        self.clusters = clusters
+
+    @classmethod
+    def from_columns(cls, source, category, question, answer, qtype, cluster=None):
+        categories, category_codes = _encode(category)
+        types, type_codes = _encode(qtype)
+        canonical_text, canonical_values = canonicalize(answer, qtype)
+        return cls(source, question_ids(category, question), categories, types, category_codes, type_codes,
+                   StringColumn.from_strings(question), StringColumn.from_strings(answer),
+                   StringColumn.from_strings(canonical_text), canonical_values, parse_clusters(cluster, len(question)))
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        import pandas as pd
+        frame = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        cluster = frame[CLUSTER_COLUMN].tolist() if CLUSTER_COLUMN in frame.columns else None
+        return cls.from_columns(os.path.basename(csv_path), *(frame[col].tolist() for col in COLUMNS), cluster)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def record(self, i):
+        return {
+            'id': format_id(self.ids[i]),
+            'category': self.categories[self.category_codes[i]],
+            'question': self.questions[i],
+            'answer': self.answers[i],
+            'type': self.types[self.type_codes[i]],
+        }
+
+    def check(self, i, given):
+        matcher = get_matcher(self.types[self.type_codes[i]])
+        return matcher.matches(self.canonical_text[i], self.canonical_values[i], given)
+
+
+def _encode(values):
+    names = {}
+    codes = np.fromiter((names.setdefault(v, len(names)) for v in values), dtype=np.uint16, count=len(values))
+    return list(names), codes
+
+
+def csv_paths(path):
+    """A CSV file itself, or every CSV in a directory"""
+    if os.path.isdir(path):
+        return [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".csv")]
+    return [path]
+
+
+class QuestionBank:
+    """All loaded questions, addressed by a global row number.
+
+    Rows are grouped per source file and tables are only ever appended, so a
+    row number stays valid while further files load (possibly from other
+    threads). Reloading a file appends its new table and retires the old
+    row range instead of renumbering: retired rows are left out of every row
+    array and of ``row_of()``, and the bank only keeps a weak reference to a
+    retired table, so it is freed once nothing else holds it. Whoever keeps
+    rows that may be retired holds their tables (``locate()``, ``tables()``)
+    to keep them resolvable; resolving a freed row raises RetiredRowError.
+    Loading or retiring a file only touches that file's rows: per-row
+    arrays grow in place, and the per-category, per-type and per-source row
+    arrays and the ID index are patched; ``version`` counts those changes.
+    ``ready`` is set once the initial load has finished.
+
+    Row numbers are internal to one process: anything kept or shared should
+    use the stable question ID (``record()['id']``, ``row_of()``). An ID that
+    appears in several files resolves to the first live row loaded.
+    """
+
+    def __init__(self, tables=()):
+        self._lock = threading.RLock()
+        self._tables = {}
+        self._layout = ([], [0])
+        self._id_index = {}
+        self._duplicates = {}
+        self._columns = {}
+        self._category_names = {}
+        self._type_names = {}
+        self.categories, self.types = [], []
+        self.type_codes = _EMPTY
+        self.canonical_values = np.zeros(0)
+        self.clusters = np.zeros(0, dtype=np.uint64)
+        self.live_rows = _EMPTY
+        self.by_source, self.by_category, self.by_type = {}, {}, {}
+        self.version = 0
+        # (version, {(category, qtype, source): rows}) of filters combining several groups
+        self._selections = (0, {})
+        self.ready = threading.Event()
+        for table in tables:
+            self.add_table(table)
+
+    @classmethod
+    def from_path(cls, path):
+        """Load a CSV file or every CSV in a directory, through the binary cache when it is fresh"""
+        bank = cls()
+        for csv_path in csv_paths(path):
+            bank.load_file(csv_path)
+        bank.ready.set()
+        return bank
+
+    def load_file(self, csv_path):
+        from .bank_cache import load_table
+        with span("load.file", source=os.path.basename(csv_path)):
+            table = load_table(csv_path)
+            self.add_table(table)
+        return table
+
+    def reload_file(self, csv_path):
+        """Load csv_path again; returns the new table, or None if its content did not change"""
+        from .bank_cache import load_table
+        with span("load.reload", source=os.path.basename(csv_path)):
+            table = load_table(csv_path)
+        current = self._tables.get(table.source)
+        if current is not None and _same_content(current, table):
+            return None
+        self.add_table(table)
+        return table
+
+    def add_table(self, table):
+        with self._lock:
+            slots, starts = self._layout
+            start, end = starts[-1], starts[-1] + len(table)
+            category_codes = _remap(self._category_names, table.categories)[table.category_codes]
+            type_codes = _remap(self._type_names, table.types)[table.type_codes]
+            self.type_codes = self._append("type_codes", type_codes)
+            self.canonical_values = self._append("canonical_values", table.canonical_values)
+            self.clusters = self._append("clusters", table.clusters)
+            # Layout first: readers holding a new row array must be able to resolve it
+            self._layout = (slots + [table], starts + [end])
+            self.categories, self.types = list(self._category_names), list(self._type_names)
+            self._index_ids(table, start)
+            by_category, by_type = dict(self.by_category), dict(self.by_type)
+            live_rows = self.live_rows
+            old = self._tables.get(table.source)
+            if old is not None:
+                live_rows = self._retire(old, by_category, by_type)
+            rows = np.arange(start, end)
+            _add_groups(by_category, self.categories, category_codes, rows)
+            _add_groups(by_type, self.types, type_codes, rows)
+            self._tables[table.source] = table
+            self.by_source = {**self.by_source, table.source: rows}
+            self.live_rows = np.concatenate((live_rows, rows))
+            self.by_category, self.by_type = by_category, by_type
+            self.version += 1
+
+    def remove_source(self, source):
+        """Retire the rows of a file that no longer exists"""
+        with self._lock:
+            old = self._tables.get(source)
+            if old is None:
+                return
+            by_category, by_type = dict(self.by_category), dict(self.by_type)
+            self.live_rows = self._retire(old, by_category, by_type)
+            del self._tables[source]
+            by_source = dict(self.by_source)
+            del by_source[source]
+            self.by_source, self.by_category, self.by_type = by_source, by_category, by_type
+            self.version += 1
+
+    def _retire(self, table, by_category, by_type):
+        """Unindex a table's rows, drop them from the groups and weaken its slot; returns the live rows left"""
+        slots, starts = self._layout
+        t = next(i for i, slot in enumerate(slots) if slot is table)
+        start, end = starts[t], starts[t + 1]
+        self._unindex_ids(table, start)
+        for groups, names in ((by_category, table.categories), (by_type, table.types)):
+            for name in names:
+                group = groups.get(name)
+                if group is not None:
+                    group = _without(group, start, end)
+                    if len(group):
+                        groups[name] = group
+                    else:
+                        del groups[name]
+        self._layout = (slots[:t] + [weakref.ref(table)] + slots[t + 1:], starts)
+        return _without(self.live_rows, start, end)
+
+    def _append(self, name, values):
+        """Per-row column with values appended; grows its buffer geometrically so earlier rows are not copied"""
+        n = self._layout[1][-1]
+        buffer = self._columns.get(name)
+        if buffer is None or len(buffer) < n + len(values):
+            grown = np.empty(max(2 * (n + len(values)), 1024), dtype=values.dtype)
+            if buffer is not None:
+                grown[:n] = buffer[:n]
+            buffer = self._columns[name] = grown
+        buffer[n:n + len(values)] = values
+        return buffer[:n + len(values)]
+
+    def _index_ids(self, table, start):
+        index, duplicates = self._id_index, self._duplicates
+        for row, qid in enumerate(table.ids.tolist(), start):
+            first = index.setdefault(qid, row)
+            if first != row:
+                duplicates.setdefault(qid, []).append(row)
+
+    def _unindex_ids(self, table, start):
+        """Drop a table's rows from the ID index; an ID also in another live table resolves to its first row there"""
+        end = start + len(table)
+        index, duplicates = self._id_index, self._duplicates
+        for qid in set(table.ids.tolist()):
+            others = [row for row in duplicates.pop(qid, ()) if not start <= row < end]
+            if start <= index.get(qid, -1) < end:
+                if others:
+                    others.sort()
+                    index[qid] = others.pop(0)
+                else:
+                    del index[qid]
+            if others:
+                duplicates[qid] = others
+
+    def _live_layout(self):
+        slots, starts = self._layout
+        live = [(t, s) for t, s in zip(slots, starts) if self._tables.get(getattr(t, "source", None)) is t]
+        return [t for t, _ in live], [s for _, s in live]
+
+    def __len__(self):
+        return self._layout[1][-1]
+
+    @property
+    def sources(self):
+        return list(self.by_source)
+
+    def tables(self):
+        """[(table, first row)] of the current table of every file, in row order"""
+        return list(zip(*self._live_layout()))
+
+    def locate(self, row):
+        """(table, index in table) of a row; holding the pair keeps that version of the question gradable"""
+        slots, starts = self._layout
+        t = bisect.bisect_right(starts, row) - 1
+        table = slots[t]
+        if type(table) is weakref.ref:
+            table = table()
+            if table is None:
+                raise RetiredRowError(f"Row {row} belonged to a file that has since been reloaded or removed")
+        return table, row - starts[t]
+
+    def record(self, row):
+        table, i = self.locate(row)
+        return table.record(i)
+
+    def row_of(self, qid):
+        """Row holding the question with this ID (hex string or int), or None"""
+        return self._id_index.get(parse_id(qid))
+
+    def id_of(self, row):
+        table, i = self.locate(row)
+        return format_id(table.ids[i])
+
+    def question(self, row):
+        table, i = self.locate(row)
+        return table.questions[i]
+
+    def category(self, row):
+        table, i = self.locate(row)
+        return table.categories[table.category_codes[i]]
+
+    def qtype(self, row):
+        return self.types[self.type_codes[row]]
+
+    def source(self, row):
+        return self.locate(row)[0].source
+
+    def answer(self, row):
+        table, i = self.locate(row)
+        return table.answers[i]
+
+    @traced("grade.check")
+    def check(self, row, given):
+        """Whether given is an accepted answer for row"""
+        table, i = self.locate(row)
+        return table.check(i, given)
+
+    @traced("grade.bulk")
+    def grade(self, rows, answers):
+        """Boolean array marking which answers are correct for their rows, one matcher call per type"""
+        rows = np.asarray(rows, dtype=np.int64)
+        result = np.zeros(len(rows), dtype=bool)
+        type_codes = self.type_codes[rows]
+        expected_values = self.canonical_values[rows]
+        for code in np.unique(type_codes):
+            selected = np.flatnonzero(type_codes == code)
+            expected_text = []
+            for row in rows[selected]:
+                table, i = self.locate(row)
+                expected_text.append(table.canonical_text[i])
+            result[selected] = get_matcher(self.types[code]).matches_many(
+                expected_text, expected_values[selected], [answers[i] for i in selected])
+        return result
+
+    def sort_keys(self, rows, column, skip=0):
+        """uint64 keys ordering rows by column: 'id', 'category', 'type', 'question' or 'answer'.
+
+        Text columns are keyed by 8 bytes from byte skip (see StringColumn.prefix_keys), so rows with
+        equal keys are ordered by the next 8 bytes, and so on; the other keys are exact.
+        """
+        tables, starts = self._layout
+        rows = np.asarray(rows, dtype=np.int64)
+        keys = np.empty(len(rows), dtype=np.uint64)
+        tables = [t() if type(t) is weakref.ref else t for t in tables]
+        names_attr = {"category": "categories", "type": "types"}.get(column)
+        if names_attr:
+            rank = {n: i for i, n in enumerate(sorted({n for t in tables if t is not None
+                                                       for n in getattr(t, names_attr)},
+                                                      key=str.casefold))}
+        which = np.searchsorted(starts, rows, side="right") - 1
+        for t in np.unique(which).tolist():
+            table, selected = tables[t], np.flatnonzero(which == t)
+            if table is None:
+                raise RetiredRowError(f"Rows from {starts[t]} belonged to a file that has since been reloaded")
+            local = rows[selected] - starts[t]
+            if column == "id":
+                keys[selected] = table.ids[local]
+            elif names_attr:
+                ranks = np.array([rank[n] for n in getattr(table, names_attr)], dtype=np.uint64)
+                keys[selected] = ranks[getattr(table, f"{column}_codes")[local]]
+            else:
+                keys[selected] = getattr(table, f"{column}s").prefix_keys(local, skip)
+        return keys
+
+    def rows(self, category=None, qtype=None, source=None):
+        """Row numbers matching every given filter, in ascending order (a shared array: do not modify it)"""
+        filters = ((self.by_category, category), (self.by_type, qtype), (self.by_source, source))
+        filters = [(index, key) for index, key in filters if key is not None]
+        if not filters:
+            return self.live_rows
+        if len(filters) == 1:
+            index, key = filters[0]
+            return index.get(key, _EMPTY)
+        # Intersections are kept until the bank changes, so sessions over one pool share its rows
+        version, cache = self._selections
+        if version != self.version:
+            version, cache = self._selections = (self.version, {})
+        key = (category, qtype, source)
+        selected = cache.get(key)
+        if selected is None:
+            selected = filters[0][0].get(filters[0][1], _EMPTY)
+            for index, name in filters[1:]:
+                selected = np.intersect1d(selected, index.get(name, _EMPTY), assume_unique=True)
+            cache[key] = selected
+        return selected
+
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class RetiredRowError(KeyError):
+    """A row of a reloaded or removed file whose table nothing holds any more"""
+
+
+def _remap(names, table_names):
+    """Bank-wide code of each of a table's names, adding new names"""
+    return np.array([names.setdefault(n, len(names)) for n in table_names], dtype=np.int64)
+
+
+def _add_groups(groups, names, codes, rows):
+    """Append rows (all beyond any grouped row) to their groups"""
+    if not len(rows):
+        return
+    order = np.argsort(codes, kind="stable")
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    for part in np.split(order, bounds):
+        name = names[codes[part[0]]]
+        group = groups.get(name)
+        groups[name] = rows[part] if group is None else np.concatenate((group, rows[part]))
+
+
+def _without(rows, start, end):
+    """Ascending rows without those in [start, end)"""
+    lo, hi = np.searchsorted(rows, (start, end))
+    return np.concatenate((rows[:lo], rows[hi:])) if hi > lo else rows
+
+
+def _same_content(a, b):
+    return (len(a) == len(b) and a.categories == b.categories and a.types == b.types
+            and np.array_equal(a.ids, b.ids) and np.array_equal(a.category_codes, b.category_codes)
+            and np.array_equal(a.type_codes, b.type_codes) and np.array_equal(a.clusters, b.clusters)
+            and bytes(a.questions.buffer) == bytes(b.questions.buffer)
+            and bytes(a.answers.buffer) == bytes(b.answers.buffer))
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def register_bank(path=DATA_DIR):
+    """(bank, created) for path; a newly created bank is empty and its creator must load it and set ready"""
+    key = os.path.abspath(path)
+    with _banks_lock:
+        bank = _banks.get(key)
+        if bank is not None:
+            return bank, False
+        bank = _banks[key] = QuestionBank()
+        return bank, True
+
+
+def get_bank(path=DATA_DIR):
+    """Process-wide QuestionBank for a data directory or CSV file, loaded on first use.
+
+    Blocks until the initial load has finished, including one already
+    running on background loader threads.
+    """
+    bank, created = register_bank(path)
+    if created:
+        try:
+            for csv_path in csv_paths(path):
+                bank.load_file(csv_path)
+        finally:
+            bank.ready.set()
+    bank.ready.wait()
+    return bank
@@ -1,32 +1,65 @@
-import pandas as pd
-import random
+from .question_bank import DATA_DIR, get_bank
+from .search import search
+from .scheduler import get_selector
+from .generator import QuestionGenerator, difficulty_of
+from .rng import new_seed
+from .instrument import traced
 
 class QuizEngine:
-    def __init__(self, csv_path):
-        self.questions = pd.read_csv(csv_path)
-        self.current_index = None
-        self.asked_indices = set()
+    """One quiz session; the same seed (and bank) asks the same questions, see rng.py"""
 
-    def get_random_question(self, category=None):
-        if category:
-            filtered = self.questions[self.questions['category'] == category]
-        else:
-            filtered = self.questions
-        available = filtered[~filtered.index.isin(self.asked_indices)]
-        if available.empty:
+    def __init__(self, csv_path=None, bank=None, mode="random", seed=None):
+        self.bank = bank if bank is not None else get_bank(csv_path or DATA_DIR)
+        self.sampler = get_selector(mode, self.bank)
+        self.reset(seed)
+
+    @traced("sample.question")
+    def get_random_question(self, category=None, source=None):
+        """Next question (optionally only from one file); a generated:<difficulty> category never runs out"""
+        difficulty = difficulty_of(category)
+        if difficulty is not None:
+            return self._generated_question(difficulty)
+        row = self.sampler.draw(category, source)
+        if row is None:
             return None
-        idx = random.choice(available.index.tolist())
-        self.current_index = idx
-        self.asked_indices.add(idx)
-        return filtered.loc[idx].to_dict()
+        # Graded against the table drawn from, even if its file is reloaded or removed meanwhile
+        table, i = self.current = self.bank.locate(row)
+        self.current_generated = False
+        question = table.record(i)
+        self.current_id = question['id']
+        self.asked_ids.add(self.current_id)
+        return question
+
+    def _generated_question(self, difficulty):
+        generator = self.generators.get(difficulty)
+        if generator is None:
+            generator = self.generators[difficulty] = QuestionGenerator(difficulty, self.seed)
+        table, i = self.current = generator.take()
+        self.current_generated = True
+        question = table.record(i)
+        self.current_id = question['id']
+        self.asked_ids.add(self.current_id)
+        return question
+
+    def search(self, query, limit=20, source=None):
+        """Questions ranked by how well their text matches query"""
+        return search(self.bank, query, limit, source)
 
     def check_answer(self, user_answer):
-        if self.current_index is None:
+        if self.current_id is None:
             return False
-        correct = str(self.questions.loc[self.current_index, 'answer']).strip().lower()
-        user = str(user_answer).strip().lower()
-        return user == correct
+        table, i = self.current
+        correct = table.check(i, user_answer)
+        if not self.current_generated and hasattr(self.sampler, "review"):
+            self.sampler.review(self.current_id, correct)
+        return correct
 
-    def reset(self):
-        self.current_index = None
-        self.asked_indices.clear() 
\ No newline at end of file
+    def reset(self, seed=None):
+        """Start a new session from seed (default: a fresh one)"""
+        self.seed = new_seed() if seed is None else seed
+        self.current_id = None
+        self.current = None
+        self.current_generated = False
+        self.asked_ids = set()
+        self.generators = {}
+        self.sampler.reset(self.seed)
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""Regenerate a past session from its ID (its seed, see rng.py) and check it against the attempt log.
+
+    python -m src.Engine.replay 4417362880218305417 --source finance.csv
+    python -m src.Engine.replay 4417362880218305417 --oa --max-items 10 --source finance.csv
+
+A quiz in "random" mode asks the questions its seed draws from the bank,
+so the same bank and options give the same quiz. An adaptive assessment
+picks each question from the answers so far, so it is replayed with the
+correctness the log recorded and item parameters fitted on the attempts
+logged before it (the assessment used the ones fitted when it was opened,
+so attempts logged in between can change later questions).
+Spaced-repetition quizzes depend on the schedule at the time and cannot
+be regenerated.
+"""
+import sys
+import argparse
+import numpy as np
+from .attempt_log import CORRECT, LOG_PATH, read_attempts
+from .question_bank import DATA_DIR, get_bank, parse_id
+from .generator import QuestionGenerator, difficulty_of
+from .irt import ItemParameters
+
+
+def replay_quiz(bank, seed, length=5, category=None, source=None):
+    """Records of the questions a quiz with this seed asked (generated:<difficulty> sources included)"""
+    difficulty = difficulty_of(source)
+    if difficulty is not None:
+        return [table.record(i) for table, i in QuestionGenerator(difficulty, seed).take_many(length)]
+    from .quiz_engine import QuizEngine
+    engine = QuizEngine(bank=bank, seed=seed)
+    questions = []
+    for _ in range(length):
+        question = engine.get_random_question(category, source)
+        if question is None:
+            break
+        questions.append(question)
+    return questions
+
+
+def replay_assessment(bank, seed, results, max_items=10, category=None, source=None, params=None):
+    """Records of the questions an adaptive assessment with this seed asked, given its answers were results[i]"""
+    from .oa_engine import OAEngine
+    engine = OAEngine(bank=bank, params=params, seed=seed)
+    engine.start_adaptive(max_items, category, source)
+    questions = []
+    for correct in results:
+        question = engine.next_adaptive()
+        if question is None:
+            break
+        questions.append(question)
+        engine.adaptive.record(engine.current_rows[question['id']], correct)
+    return questions
+
+
+def logged(session, log_path=LOG_PATH):
+    """(question IDs, correct, records before the session's first) the attempt log holds for a session"""
+    records = read_attempts(log_path)
+    mine = np.flatnonzero(records["session"] == session)
+    before = records[:mine[0]] if len(mine) else records
+    records = records[mine]
+    return records["question"].tolist(), ((records["flags"] & CORRECT) != 0).tolist(), before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.Engine.replay",
+                                     description="Regenerate a past session from its ID and compare it with "
+                                                 "the attempts logged for it.")
+    parser.add_argument("session", type=int, help="session ID (the seed of its random draws)")
+    parser.add_argument("--oa", action="store_true", help="the session was an adaptive assessment")
+    parser.add_argument("--length", type=int, default=5, help="questions in the quiz")
+    parser.add_argument("--max-items", type=int, default=10, help="questions in the assessment")
+    parser.add_argument("--category")
+    parser.add_argument("--source", help="file (or generated:<difficulty>) the session drew from")
+    parser.add_argument("--log", default=LOG_PATH, help="attempt log to compare with")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    ids, results, before = logged(args.session, args.log)
+    bank = get_bank(args.data_dir)
+    if args.oa:
+        if not ids:
+            print(f"No attempts logged for session {args.session}; an assessment needs its answers",
+                  file=sys.stderr)
+            return 1
+        questions = replay_assessment(bank, args.session, results, args.max_items, args.category, args.source,
+                                      ItemParameters.fit(bank, before))
+    else:
+        questions = replay_quiz(bank, args.session, args.length, args.category, args.source)
+    mismatches = 0
+    for i, question in enumerate(questions):
+        if i < len(ids):
+            status = "ok" if parse_id(question['id']) == ids[i] else "DIFFERENT"
+            mismatches += status != "ok"
+        else:
+            status = "not answered"
+        print(f"{i + 1:>3}  {question['id']}  {status:<12}  {question['question'][:70]}")
+    if len(ids) > len(questions):
+        mismatches += len(ids) - len(questions)
+        print(f"{len(ids) - len(questions)} logged attempts were not regenerated", file=sys.stderr)
+    if mismatches:
+        print(f"{mismatches} question(s) differ from the log", file=sys.stderr)
+        return 1
+    matched = f"{len(ids)} match the log" if ids else "none were logged"
+    print(f"session {args.session}: {len(questions)} questions regenerated, {matched}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Seedable random streams for quiz and assessment sessions.
+
+Every session has one 63-bit seed (the session ID the attempt log and
+checkpoints already record). Each use of randomness within the session
+draws from its own stream: a counter-based Philox generator keyed by
+``SeedSequence(seed, spawn_key=(purpose, ...))``, so streams of one seed
+are independent of each other, and of every other seed, however many
+sessions run at once in threads or worker processes. Nothing is shared,
+so there is nothing to lock, and replaying a seed gives the same draws.
+"""
+import os
+import numpy as np
+
+# Stream purposes (the first spawn key word); never renumber, or old seeds replay differently
+SAMPLE = 1
+GENERATE = 2
+PAPERS = 3
+
+BUFFER = 256
+
+
+def new_seed():
+    """Fresh 63-bit seed (it fits the attempt log's session column and JSON integers)"""
+    return int.from_bytes(os.urandom(8), "little") >> 1
+
+
+def stream(seed, purpose, *key):
+    """numpy Generator for one purpose (and optional sub-key) of a seed"""
+    return np.random.Generator(np.random.Philox(np.random.SeedSequence(seed, spawn_key=(purpose,) + key)))
+
+
+class Uniforms:
+    """Scalar draws from a Generator, pre-drawn BUFFER at a time (one call per draw costs more than the draw)"""
+
+    def __init__(self, rng, size=BUFFER):
+        self.rng = rng
+        self.size = size
+        self._values = []
+
+    def below(self, n):
+        """Random integer in [0, n)"""
+        if not self._values:
+            self._values = self.rng.random(self.size).tolist()
+        return int(self._values.pop() * n)
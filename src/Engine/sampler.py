@@ -0,0 +1,104 @@
+from .rng import SAMPLE, Uniforms, new_seed, stream
+from .instrument import traced
+
+
+class _Pool:
+    __slots__ = ("rows", "cursor", "moved")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursor = 0
+        self.moved = {}
+
+
+class Sampler:
+    """Draws bank rows without replacement until every row of a pool is used.
+
+    Each (category, source) pool is consumed by a sparse Fisher-Yates
+    shuffle over the bank's own (shared, read-only) row array: positions
+    before the cursor hold rows already drawn, every draw swaps one random
+    remaining position into place, and ``moved`` records only the
+    positions whose row has been swapped, so a draw is O(1) and a session
+    keeps state proportional to its draws, not to the bank. Rows drawn from
+    any pool are skipped by the others, as are rows in a near-duplicate
+    cluster already drawn from. reset() forgets the draws, costing only as
+    much as they did. When the bank gains tables the pools are rebuilt but
+    the drawn rows are kept, since existing row numbers stay valid.
+
+    rng is a numpy Generator (default: a stream of a fresh seed). Every
+    pool restarts in row order, so draws depend only on the bank and the
+    stream; reset(seed) switches to the seed's stream, making the session
+    replayable.
+    """
+
+    def __init__(self, bank, rng=None):
+        self.bank = bank
+        self._uniforms = Uniforms(rng if rng is not None else stream(new_seed(), SAMPLE))
+        self._pools = {}
+        self._drawn = set()
+        self._clusters = set()
+        self._version = None
+
+    def _pool(self, key):
+        version = self.bank.version
+        if self._version != version:
+            self._version = version
+            self._pools.clear()
+        pool = self._pools.get(key)
+        if pool is None:
+            category, source = key
+            pool = self._pools[key] = _Pool(self.bank.rows(category=category, source=source))
+        return pool
+
+    def draw(self, category=None, source=None):
+        """Next unused row of the pool, or None once the pool is exhausted"""
+        pool = self._pool((category, source))
+        cursor, moved, drawn = pool.cursor, pool.moved, self._drawn
+        item, pop, get = pool.rows.item, moved.pop, moved.get
+        cluster_of = self.bank.clusters.item
+        below = self._uniforms.below
+        n = len(pool.rows)
+        while cursor < n:
+            j = cursor + below(n - cursor)
+            head = pop(cursor, None)
+            if head is None:
+                head = item(cursor)
+            if j == cursor:
+                row = head
+            else:
+                row = get(j)
+                if row is None:
+                    row = item(j)
+                moved[j] = head
+            cursor += 1
+            if row not in drawn:
+                drawn.add(row)
+                cluster = cluster_of(row)
+                if cluster:
+                    if cluster in self._clusters:
+                        continue
+                    self._clusters.add(cluster)
+                pool.cursor = cursor
+                return row
+        pool.cursor = cursor
+        return None
+
+    @traced("sample.draw_many")
+    def draw_many(self, n, category=None, source=None):
+        rows = []
+        while len(rows) < n:
+            row = self.draw(category, source)
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def reset(self, seed=None):
+        """Make every row available again; with a seed, draw from its SAMPLE stream from now on"""
+        for pool in self._pools.values():
+            pool.cursor = 0
+            pool.moved.clear()
+        self._drawn.clear()
+        self._clusters.clear()
+        if seed is not None:
+            self._uniforms = Uniforms(stream(seed, SAMPLE))
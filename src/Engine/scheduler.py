@@ -0,0 +1,336 @@
+"""Spaced-repetition question selection (SM-2).
+
+Each question that has been answered carries an ease factor, an interval
+and a due time. Due times live in binary heaps, one per (category, source)
+filter that has been asked for, so picking the next question is a heap pop
+(O(log n)) and every answer is one push per heap. Outdated heap entries are
+skipped lazily when they reach the top. Questions that were never answered
+are introduced through a ``Sampler`` once nothing is due. At most one
+question per near-duplicate cluster is drawn in a session.
+
+The SM-2 state is one process-wide ``Schedule``; each engine selects
+through its own ``Scheduler`` view of it (own bank, heaps, drawn set and
+sampler). Like ``StatsAggregator``, the schedule is updated from
+attempt-log records and snapshotted with the number of records it
+covers, so start-up only replays the log tail.
+"""
+import os
+import time
+import heapq
+import atexit
+import weakref
+import threading
+import numpy as np
+from .attempt_log import CORRECT, OVERRIDDEN, LOG_PATH, count_attempts, get_attempt_log, read_attempts
+from .question_bank import parse_id
+from .sampler import Sampler
+from .instrument import traced
+
+SNAPSHOT_PATH = os.path.join("progress", "schedule.npz")
+SNAPSHOT_EVERY = 500
+
+DAY = 86400.0
+RELEARN_SECONDS = 600.0
+FAST_SECONDS = 15.0
+MIN_EASE = 1.3
+START_EASE = 2.5
+
+# Positions in a per-question state list
+EASE, INTERVAL, REPS, DUE, STAMP = range(5)
+
+
+def quality(correct, overridden=False, latency=0.0):
+    """SM-2 response quality (0-5) of one attempt"""
+    if overridden:
+        return 3
+    if not correct:
+        return 1
+    return 5 if latency <= FAST_SECONDS else 4
+
+
+class Schedule:
+    """SM-2 state of every answered question, by ID; one per process, shared by all Scheduler views.
+
+    Every update is pushed into the heaps of the live views, each over its own bank.
+    """
+
+    def __init__(self):
+        self.state = {}
+        self.log_offset = 0
+        self._stamp = 0
+        self._views = weakref.WeakSet()
+        self._lock = threading.RLock()
+
+    def review(self, question_id, correct, overridden=False, latency=0.0, when=None):
+        """Reschedule a question after an answer; latency is in seconds"""
+        self._update(parse_id(question_id), quality(correct, overridden, latency),
+                     time.time() if when is None else when)
+
+    def add_record(self, record):
+        """AttemptLog listener: record is (time, question, session, latency_ms, flags)"""
+        when, question_id, _, latency_ms, flags = record
+        with self._lock:
+            self._update(question_id, quality(flags & CORRECT, flags & OVERRIDDEN, latency_ms / 1000), when)
+            self.log_offset += 1
+
+    def _update(self, question_id, q, when):
+        with self._lock:
+            state = self.state.get(question_id)
+            if state is None:
+                state = self.state[question_id] = [START_EASE, 0.0, 0, 0.0, 0]
+            if q >= 3:
+                state[REPS] += 1
+                if state[REPS] == 1:
+                    state[INTERVAL] = 1.0
+                elif state[REPS] == 2:
+                    state[INTERVAL] = 6.0
+                else:
+                    state[INTERVAL] *= state[EASE]
+                state[DUE] = when + state[INTERVAL] * DAY
+            else:
+                state[REPS] = 0
+                state[INTERVAL] = 0.0
+                state[DUE] = when + RELEARN_SECONDS
+            state[EASE] = max(MIN_EASE, state[EASE] + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+            self._stamp += 1
+            state[STAMP] = self._stamp
+            for view in list(self._views):
+                view._push(question_id, state)
+
+    def catch_up(self, log_path=LOG_PATH):
+        """Replay attempt-log records written after the snapshot was taken"""
+        if count_attempts(log_path) < self.log_offset:
+            with self._lock:
+                self.state.clear()
+                for view in list(self._views):
+                    view._forget()
+                self.log_offset = 0
+        tail = read_attempts(log_path, self.log_offset)
+        for record in zip(tail["time"].tolist(), tail["question"].tolist(), tail["session"].tolist(),
+                          tail["latency_ms"].tolist(), tail["flags"].tolist()):
+            self.add_record(record)
+
+    def save(self, path=SNAPSHOT_PATH):
+        with self._lock:
+            ids = np.fromiter(self.state, dtype=np.uint64, count=len(self.state))
+            values = np.array(list(self.state.values()), dtype=np.float64).reshape(-1, 5)
+            log_offset = self.log_offset
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, ids=ids, ease=values[:, EASE], interval=values[:, INTERVAL], reps=values[:, REPS],
+                 due=values[:, DUE], log_offset=np.int64(log_offset))
+        os.replace(tmp, path)
+
+    def load(self, path=SNAPSHOT_PATH):
+        """Restore a snapshot; returns False (leaving the schedule empty) if there is no usable one"""
+        try:
+            with np.load(path) as data:
+                columns = [data[name].tolist() for name in ("ids", "ease", "interval", "reps", "due")]
+                log_offset = int(data["log_offset"])
+        except (OSError, ValueError, KeyError):
+            return False
+        with self._lock:
+            self.state = {i: [ease, interval, int(reps), due, 0] for i, ease, interval, reps, due in zip(*columns)}
+            for view in list(self._views):
+                view._forget()
+            self.log_offset = log_offset
+        return True
+
+
+class Scheduler:
+    """One session's view of a Schedule over a bank, with the same draw/draw_many/reset interface as Sampler.
+
+    The drawn questions, the heaps and the sampler of unseen questions belong to the view, so
+    engines over different banks, or resetting at different times, do not disturb each other.
+    """
+
+    def __init__(self, bank, rng=None, schedule=None):
+        self.bank = bank
+        self.schedule = schedule if schedule is not None else get_schedule()
+        self.drawn = set()
+        self.drawn_clusters = set()
+        self._new = Sampler(bank, rng)
+        self._no_new = set()
+        self._heaps = {}
+        self._version = None
+        self._lock = self.schedule._lock
+        with self._lock:
+            self.schedule._views.add(self)
+
+    @property
+    def state(self):
+        return self.schedule.state
+
+    def review(self, question_id, correct, overridden=False, latency=0.0, when=None):
+        """Reschedule a question after an answer; latency is in seconds"""
+        self.schedule.review(question_id, correct, overridden, latency, when)
+
+    def _forget(self):
+        self._heaps.clear()
+        self._no_new.clear()
+
+    def _push(self, question_id, state):
+        if not self._heaps or self._version != self.bank.version:
+            return
+        row = self.bank.row_of(question_id)
+        if row is None:
+            return
+        category, source = self.bank.category(row), self.bank.source(row)
+        entry = (state[DUE], state[STAMP], question_id)
+        for (c, s), heap in self._heaps.items():
+            if (c is None or c == category) and (s is None or s == source):
+                heapq.heappush(heap, entry)
+
+    def _heap(self, key):
+        version = self.bank.version
+        if self._version != version:
+            self._version = version
+            self._heaps.clear()
+            self._no_new.clear()
+        heap = self._heaps.get(key)
+        if heap is None:
+            category, source = key
+            ids, rows = [], []
+            for question_id in self.state:
+                row = self.bank.row_of(question_id)
+                if row is not None:
+                    ids.append(question_id)
+                    rows.append(row)
+            in_pool = np.isin(np.array(rows, dtype=np.int64), self.bank.rows(category=category, source=source))
+            heap = []
+            for i in np.flatnonzero(in_pool).tolist():
+                state = self.state[ids[i]]
+                heap.append((state[DUE], state[STAMP], ids[i]))
+            heapq.heapify(heap)
+            self._heaps[key] = heap
+        return heap
+
+    def _top(self, heap):
+        """Discard outdated or already-drawn entries; the valid top entry, or None"""
+        while heap:
+            _, stamp, question_id = heap[0]
+            if self.state[question_id][STAMP] == stamp and question_id not in self.drawn:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _draw_new(self, key):
+        if key in self._no_new:
+            return None
+        for _ in range(2):
+            while True:
+                row = self._new.draw(*key)
+                if row is None:
+                    break
+                question_id = parse_id(self.bank.id_of(row))
+                if question_id not in self.state and question_id not in self.drawn:
+                    return question_id
+            # Every unanswered question has been offered once; start over a single time
+            self._new.reset()
+        self._no_new.add(key)
+        return None
+
+    def _next(self, heap, key, now):
+        top = self._top(heap)
+        if top is not None and top[0] <= now:
+            return heapq.heappop(heap)[2]
+        question_id = self._draw_new(key)
+        if question_id is None and top is not None:
+            question_id = heapq.heappop(heap)[2]
+        return question_id
+
+    def draw(self, category=None, source=None, now=None):
+        """Row of the most overdue question, else an unseen one, else the next to fall due; None if exhausted"""
+        now = time.time() if now is None else now
+        key = (category, source)
+        with self._lock:
+            heap = self._heap(key)
+            while True:
+                question_id = self._next(heap, key, now)
+                if question_id is None:
+                    return None
+                # Skipped near-duplicates count as drawn, so reset() puts them back
+                self.drawn.add(question_id)
+                row = self.bank.row_of(question_id)
+                cluster = int(self.bank.clusters[row])
+                if cluster:
+                    if cluster in self.drawn_clusters:
+                        continue
+                    self.drawn_clusters.add(cluster)
+                return row
+
+    @traced("sample.draw_many")
+    def draw_many(self, n, category=None, source=None):
+        rows = []
+        while len(rows) < n:
+            row = self.draw(category, source)
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def reset(self, seed=None):
+        """Start a new session; drawn but unanswered questions become selectable again.
+
+        A seed reseeds the draws of unseen questions; which questions are due depends on the schedule.
+        """
+        with self._lock:
+            if seed is not None:
+                self._new.reset(seed)
+                self._no_new.clear()
+            drawn, self.drawn = self.drawn, set()
+            self.drawn_clusters = set()
+            for question_id in drawn:
+                state = self.state.get(question_id)
+                if state is None:
+                    # An unseen question went unanswered; offer new questions again
+                    self._no_new.clear()
+                else:
+                    self._push(question_id, state)
+
+    def due_count(self, category=None, source=None, now=None):
+        """Questions due for review that have not been drawn this session (O(n))"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return sum(1 for due, stamp, question_id in self._heap((category, source))
+                       if due <= now and self.state[question_id][STAMP] == stamp and question_id not in self.drawn)
+
+
+def get_selector(mode, bank):
+    """Question selector for a SELECTION_MODES key"""
+    return SELECTION_MODES[mode](bank)
+
+
+_schedule = None
+_schedule_lock = threading.Lock()
+
+
+def get_schedule():
+    """Process-wide Schedule, restored from its snapshot and kept current with the attempt log.
+
+    As with get_stats(), call it from the thread that appends attempts. Snapshots are written on
+    the attempt log's writer thread.
+    """
+    global _schedule
+    with _schedule_lock:
+        if _schedule is None:
+            schedule = Schedule()
+            log = get_attempt_log()
+            log.flush()
+            schedule.load()
+            schedule.catch_up(log.path)
+
+            def on_attempt(record):
+                schedule.add_record(record)
+                if schedule.log_offset % SNAPSHOT_EVERY == 0:
+                    log.call_soon(schedule.save)
+            log.add_listener(on_attempt)
+            atexit.register(schedule.save)
+            _schedule = schedule
+        return _schedule
+
+
+SELECTION_MODES = {
+    "random": Sampler,
+    "spaced": Scheduler,
+}
@@ -0,0 +1,188 @@
+"""Full-text search over question and answer text.
+
+Each source table gets its own inverted index: a sorted vocabulary (so a
+prefix is a contiguous range found by bisection) and CSR postings arrays of
+document numbers and term frequencies. Indexes are keyed by table, so when
+one file is reloaded only that file is reindexed. Queries are ranked with
+BM25, using collection statistics summed over all indexed tables; the last
+query word also matches as a prefix, for search-as-you-type.
+"""
+import re
+import bisect
+import threading
+from array import array
+import numpy as np
+from .matching import normalize_text
+from .instrument import traced
+
+_TOKEN = re.compile(r"\w+")
+K1 = 1.2
+B = 0.75
+MAX_PREFIX_TERMS = 64
+
+
+def tokenize(text):
+    return _TOKEN.findall(normalize_text(text))
+
+
+class TableIndex:
+    """Inverted index of one QuestionTable"""
+    __slots__ = ("terms", "offsets", "docs", "freqs", "lengths")
+
+    def __init__(self, terms, offsets, docs, freqs, lengths):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.freqs = freqs
+        self.lengths = lengths
+
+    @classmethod
+    def build(cls, table):
+        n = len(table)
+        vocabulary = {}
+        term_ids = array('q')
+        lengths = np.zeros(n, dtype=np.float32)
+        for i, (question, answer) in enumerate(zip(table.questions, table.answers)):
+            tokens = tokenize(f"{question} {answer}")
+            lengths[i] = len(tokens)
+            term_ids.extend([vocabulary.setdefault(t, len(vocabulary)) for t in tokens])
+        terms = sorted(vocabulary)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[vocabulary[t] for t in terms]] = np.arange(len(terms))
+        docs = np.repeat(np.arange(n, dtype=np.int64), lengths.astype(np.int64))
+        # One key per (term, document) pair; unique() sorts them by term, then document
+        keys, freqs = np.unique(rank[np.frombuffer(term_ids, dtype=np.int64)] * max(n, 1) + docs,
+                                return_counts=True)
+        offsets = np.searchsorted(keys // max(n, 1), np.arange(len(terms) + 1))
+        return cls(terms, offsets, (keys % max(n, 1)).astype(np.int32), freqs.astype(np.float32), lengths)
+
+    def term_range(self, prefix):
+        """Vocabulary positions [lo, hi) of the terms starting with prefix"""
+        lo = bisect.bisect_left(self.terms, prefix)
+        return lo, bisect.bisect_left(self.terms, prefix + "\U0010ffff", lo)
+
+    def lookup(self, term):
+        lo = bisect.bisect_left(self.terms, term)
+        return lo if lo < len(self.terms) and self.terms[lo] == term else None
+
+    def document_frequency(self, t):
+        return int(self.offsets[t + 1] - self.offsets[t])
+
+
+class SearchIndex:
+    """BM25 search over every table of a QuestionBank that has been indexed"""
+
+    def __init__(self, bank):
+        self.bank = bank
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def complete(self):
+        return all(self._indexes.get(table.source, (None,))[0] is table for table, _ in self.bank.tables())
+
+    @traced("search.sync")
+    def sync(self):
+        """Index tables that are new or replaced since the last call; returns how many were indexed"""
+        with self._lock:
+            tables = self.bank.tables()
+            current = {table.source for table, _ in tables}
+            for source in list(self._indexes):
+                if source not in current:
+                    del self._indexes[source]
+            built = 0
+            for table, _ in tables:
+                indexed = self._indexes.get(table.source)
+                if indexed is None or indexed[0] is not table:
+                    self._indexes[table.source] = (table, TableIndex.build(table))
+                    built += 1
+            return built
+
+    @traced("search.query")
+    def search(self, query, limit=20, source=None):
+        """[(row, score)] best first, over the tables indexed so far"""
+        words = tokenize(query)
+        if not words:
+            return []
+        parts = []
+        for table, start in self.bank.tables():
+            indexed = self._indexes.get(table.source)
+            if indexed is not None and indexed[0] is table and (source is None or table.source == source):
+                parts.append((indexed[1], start))
+        if not parts:
+            return []
+
+        # Collection statistics over every searched table
+        n_docs = sum(len(index.lengths) for index, _ in parts)
+        avg_length = max(sum(float(index.lengths.sum()) for index, _ in parts) / max(n_docs, 1), 1.0)
+        matches = []
+        for w, word in enumerate(words):
+            prefix = w == len(words) - 1
+            per_table = []
+            for index, _ in parts:
+                if prefix:
+                    lo, hi = index.term_range(word)
+                    terms = np.arange(lo, hi)
+                    if len(terms) > MAX_PREFIX_TERMS:
+                        # Keep the most common completions
+                        df = np.diff(index.offsets[lo:hi + 1])
+                        terms = terms[np.argpartition(df, -MAX_PREFIX_TERMS)[-MAX_PREFIX_TERMS:]]
+                    terms = terms.tolist()
+                else:
+                    t = index.lookup(word)
+                    terms = [] if t is None else [t]
+                per_table.append(terms)
+            matches.append(per_table)
+
+        best_rows, best_scores = [], []
+        for p, (index, start) in enumerate(parts):
+            scores = None
+            norm = K1 * (1 - B + B * index.lengths / avg_length)
+            for per_table in matches:
+                for t in per_table[p]:
+                    term = index.terms[t]
+                    df = sum(other.document_frequency(o) for other, _ in parts
+                             for o in [other.lookup(term)] if o is not None)
+                    idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    lo, hi = index.offsets[t], index.offsets[t + 1]
+                    docs, freqs = index.docs[lo:hi], index.freqs[lo:hi]
+                    if scores is None:
+                        scores = np.zeros(len(index.lengths), dtype=np.float32)
+                    scores[docs] += idf * freqs * (K1 + 1) / (freqs + norm[docs])
+            if scores is None:
+                continue
+            hits = np.flatnonzero(scores)
+            if len(hits) > limit:
+                hits = hits[np.argpartition(scores[hits], -limit)[-limit:]]
+            best_rows.append(hits + start)
+            best_scores.append(scores[hits])
+        if not best_rows:
+            return []
+        rows, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return list(zip(rows[order].tolist(), scores[order].tolist()))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(bank):
+    """The shared SearchIndex for bank (not synced; call sync() off the GUI thread)"""
+    with _indexes_lock:
+        index = _indexes.get(id(bank))
+        if index is None or index.bank is not bank:
+            index = _indexes[id(bank)] = SearchIndex(bank)
+        return index
+
+
+def search(bank, query, limit=20, source=None):
+    """Question records (with a 'score') best matching query, indexing any tables not yet indexed"""
+    index = get_search_index(bank)
+    index.sync()
+    results = []
+    for row, score in index.search(query, limit, source):
+        record = bank.record(row)
+        record['score'] = score
+        results.append(record)
+    return results
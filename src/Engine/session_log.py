@@ -0,0 +1,162 @@
+"""Checkpoints of the quiz or assessment in progress, so a closed or crashed session can be resumed.
+
+A checkpoint is a small snapshot written once when the session starts (a
+header, the question IDs and a little JSON of settings) followed by fixed
+24-byte delta records appended as the session goes: a question handed
+out, an answer graded, or the clock when the window was closed. Nothing
+else is re-serialized, so writing after each answer is a single small
+append and resuming reads one file. A torn final record is dropped on
+load. There is one checkpoint per kind of session (see ``checkpoint_path``);
+it is deleted when the session ends normally.
+"""
+import os
+import json
+import time
+import struct
+from .question_bank import format_id, parse_id
+
+CHECKPOINT_DIR = os.path.join("progress", "sessions")
+
+MAGIC = b"EPSC"
+VERSION = 1
+QUIZ = 1
+OA = 2
+KIND_NAMES = {QUIZ: "quiz", OA: "oa"}
+
+# Record operations
+ASKED = 1      # question appended to the session (adaptive sessions choose them as they go)
+ANSWERED = 2   # answer to the question at index
+PAUSED = 3     # window closed with the clock at this value
+
+CORRECT = 1
+OVERRIDDEN = 2
+
+_HEADER = struct.Struct("<4sIB3xQdII")
+_RECORD = struct.Struct("<BBxxIQd")
+
+
+def checkpoint_path(kind, directory=CHECKPOINT_DIR):
+    return os.path.join(directory, f"{KIND_NAMES[kind]}.ckpt")
+
+
+class SessionState:
+    """A checkpoint read back: the questions, the answers so far and the clock"""
+
+    def __init__(self, kind, session_id, created, question_ids, meta):
+        self.kind = kind
+        self.session_id = session_id
+        self.created = created
+        self.question_ids = question_ids
+        self.meta = meta
+        # {index: (correct, overridden)}
+        self.answers = {}
+        self.clock = meta.get("clock", 0)
+
+    @property
+    def score(self):
+        return sum(1 for correct, overridden in self.answers.values() if correct or overridden)
+
+    def next_index(self):
+        """Index of the first question without an answer"""
+        i = 0
+        while i in self.answers:
+            i += 1
+        return i
+
+
+def load_session(path):
+    """SessionState saved at path, or None if there is none; ValueError if it is not a checkpoint"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is not a session checkpoint")
+    magic, version, kind, session_id, created, n_questions, meta_size = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} session checkpoint")
+    offset = _HEADER.size
+    ids = struct.unpack_from(f"<{n_questions}Q", data, offset)
+    offset += 8 * n_questions
+    meta = json.loads(data[offset:offset + meta_size].decode("utf-8"))
+    offset += meta_size
+    state = SessionState(kind, session_id, created, [format_id(q) for q in ids], meta)
+    usable = offset + (len(data) - offset) // _RECORD.size * _RECORD.size
+    for op, flags, index, question, clock in _RECORD.iter_unpack(data[offset:usable]):
+        if op == ASKED:
+            state.question_ids.append(format_id(question))
+        elif op == ANSWERED:
+            state.answers[index] = (bool(flags & CORRECT), bool(flags & OVERRIDDEN))
+        state.clock = clock
+    return state
+
+
+class Checkpoint:
+    """Appends a session's delta records; every record is flushed and fsynced before returning"""
+
+    def __init__(self, path, file, session_id):
+        self.path = path
+        self.session_id = session_id
+        self._file = file
+
+    @classmethod
+    def create(cls, path, kind, session_id, question_ids=(), meta=None, clock=0):
+        """Start a checkpoint, replacing any earlier one at path"""
+        meta = dict(meta or {}, clock=clock)
+        blob = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        ids = [parse_id(q) for q in question_ids]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, kind, session_id, time.time(), len(ids), len(blob)))
+            f.write(struct.pack(f"<{len(ids)}Q", *ids))
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return cls(path, open(path, "ab"), session_id)
+
+    @classmethod
+    def reopen(cls, path, session_id):
+        """Keep appending to the checkpoint at path, dropping a torn final record"""
+        f = open(path, "r+b")
+        _, _, _, _, _, n_questions, meta_size = _HEADER.unpack(f.read(_HEADER.size))
+        start = _HEADER.size + 8 * n_questions + meta_size
+        size = f.seek(0, os.SEEK_END)
+        torn = (size - start) % _RECORD.size
+        if torn:
+            f.truncate(size - torn)
+            f.seek(0, os.SEEK_END)
+        return cls(path, f, session_id)
+
+    def _append(self, op, flags=0, index=0, question_id=0, clock=0):
+        if self._file is None:
+            return
+        self._file.write(_RECORD.pack(op, flags, index, parse_id(question_id), clock))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def asked(self, question_id, clock=0):
+        self._append(ASKED, 0, 0, question_id, clock)
+
+    def answered(self, index, question_id, correct, overridden=False, clock=0):
+        flags = (CORRECT if correct else 0) | (OVERRIDDEN if overridden else 0)
+        self._append(ANSWERED, flags, index, question_id, clock)
+
+    def paused(self, clock):
+        self._append(PAUSED, clock=clock)
+
+    def close(self):
+        """Stop writing; the checkpoint stays on disk to be resumed"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """The session is over: close and delete the checkpoint"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
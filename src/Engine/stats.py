@@ -0,0 +1,217 @@
+"""Incremental per-category and per-question answer statistics.
+
+Counters are updated as each attempt is logged, so reading them costs
+O(categories) no matter how long the history is. Answer times go into
+log-bucketed sketches (about 2% relative error on any percentile) that
+stay small and can be merged. The aggregates are periodically saved as a
+snapshot recording how many attempt-log records it covers; on start-up
+only the log tail after that point is replayed.
+"""
+import os
+import math
+import json
+import atexit
+import threading
+from .attempt_log import CORRECT, GENERATED, OVERRIDDEN, LOG_PATH, count_attempts, get_attempt_log, read_attempts
+from .question_bank import DATA_DIR, format_id, get_bank, parse_id
+from .generator import CATEGORY as GENERATED_CATEGORY
+
+SNAPSHOT_PATH = os.path.join("progress", "stats.json")
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EVERY = 500
+UNKNOWN_CATEGORY = "Unknown"
+
+
+class LatencySketch:
+    """Sparse log-bucketed histogram of positive values with relative accuracy"""
+    __slots__ = ("buckets",)
+    GAMMA = 1.04
+    _LOG_GAMMA = math.log(GAMMA)
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets or {}
+
+    def add(self, value, count=1):
+        key = math.ceil(math.log(max(value, 1e-3)) / self._LOG_GAMMA)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        total = sum(self.buckets.values())
+        if not total:
+            return math.nan
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # DDSketch's estimate for the bucket (GAMMA^(key-1), GAMMA^key]: 2 GAMMA^key / (1 + GAMMA) is
+                # within (GAMMA - 1) / (GAMMA + 1) relative error of every value in it (not its midpoint)
+                return 2 * self.GAMMA ** key / (1 + self.GAMMA)
+        return math.nan
+
+
+class AnswerStats:
+    __slots__ = ("attempts", "correct", "overrides", "time_sum", "times")
+
+    def __init__(self):
+        self.attempts = 0
+        self.correct = 0
+        self.overrides = 0
+        self.time_sum = 0.0
+        self.times = LatencySketch()
+
+    def add(self, flags, seconds):
+        self.attempts += 1
+        self.correct += bool(flags & (CORRECT | OVERRIDDEN))
+        self.overrides += bool(flags & OVERRIDDEN)
+        self.time_sum += seconds
+        self.times.add(seconds)
+
+    @property
+    def accuracy(self):
+        return self.correct / self.attempts if self.attempts else math.nan
+
+    @property
+    def override_rate(self):
+        return self.overrides / self.attempts if self.attempts else math.nan
+
+    @property
+    def mean_time(self):
+        return self.time_sum / self.attempts if self.attempts else math.nan
+
+    def to_dict(self):
+        return {"attempts": self.attempts, "correct": self.correct, "overrides": self.overrides,
+                "time_sum": self.time_sum, "times": dict(self.times.buckets)}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.attempts = data["attempts"]
+        stats.correct = data["correct"]
+        stats.overrides = data["overrides"]
+        stats.time_sum = data["time_sum"]
+        stats.times = LatencySketch({int(k): v for k, v in data["times"].items()})
+        return stats
+
+
+class StatsAggregator:
+    """Running AnswerStats per category and per question ID"""
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.categories = {}
+        self.questions = {}
+        self.log_offset = 0
+        self._lock = threading.Lock()
+
+    def category_of(self, question_id, flags=0):
+        if flags & GENERATED:
+            return GENERATED_CATEGORY
+        row = self.bank.row_of(question_id)
+        if row is None:
+            return UNKNOWN_CATEGORY
+        return self.bank.category(row)
+
+    def add(self, question_id, flags, seconds):
+        question_id = parse_id(question_id)
+        category = self.category_of(question_id, flags)
+        with self._lock:
+            for index, key in ((self.categories, category), (self.questions, question_id)):
+                stats = index.get(key)
+                if stats is None:
+                    stats = index[key] = AnswerStats()
+                stats.add(flags, seconds)
+            self.log_offset += 1
+
+    def add_record(self, record):
+        """AttemptLog listener: record is (time, question, session, latency_ms, flags)"""
+        _, question_id, _, latency_ms, flags = record
+        self.add(question_id, flags, latency_ms / 1000)
+
+    def reset(self):
+        with self._lock:
+            self.categories, self.questions = {}, {}
+            self.log_offset = 0
+
+    def catch_up(self, log_path=LOG_PATH):
+        """Fold in attempt-log records written after the snapshot was taken"""
+        if count_attempts(log_path) < self.log_offset:
+            # The log was replaced or truncated: the snapshot no longer describes it
+            self.reset()
+        tail = read_attempts(log_path, self.log_offset)
+        for question_id, latency_ms, flags in zip(tail["question"].tolist(), tail["latency_ms"].tolist(),
+                                                  tail["flags"].tolist()):
+            self.add(question_id, flags, latency_ms / 1000)
+
+    def summary(self):
+        """[(category, AnswerStats)] sorted by category name"""
+        with self._lock:
+            return sorted(self.categories.items())
+
+    def question_stats(self, question_id):
+        return self.questions.get(parse_id(question_id))
+
+    def save(self, path=SNAPSHOT_PATH):
+        # Copy under the lock; the (slow) serialization then runs on the calling thread alone
+        with self._lock:
+            data = {
+                "version": SNAPSHOT_VERSION,
+                "log_offset": self.log_offset,
+                "categories": {k: v.to_dict() for k, v in self.categories.items()},
+                "questions": {format_id(k): v.to_dict() for k, v in self.questions.items()},
+            }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def load(self, path=SNAPSHOT_PATH):
+        """Restore a snapshot; returns False (leaving everything empty) if there is no usable one"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                return False
+            categories = {k: AnswerStats.from_dict(v) for k, v in data["categories"].items()}
+            questions = {parse_id(k): AnswerStats.from_dict(v) for k, v in data["questions"].items()}
+        except (OSError, ValueError, KeyError):
+            return False
+        with self._lock:
+            self.categories, self.questions = categories, questions
+            self.log_offset = data["log_offset"]
+        return True
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_stats(data_dir=DATA_DIR):
+    """Process-wide StatsAggregator, restored from its snapshot and kept current with the attempt log.
+
+    Call it from the thread that appends attempts (the GUI thread), so no
+    append can slip in between the catch-up and the listener registration.
+    Snapshots are written on the attempt log's writer thread.
+    """
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            stats = StatsAggregator(get_bank(data_dir))
+            log = get_attempt_log()
+            log.flush()
+            stats.load()
+            stats.catch_up(log.path)
+
+            def on_attempt(record):
+                stats.add_record(record)
+                if stats.log_offset % SNAPSHOT_EVERY == 0:
+                    log.call_soon(stats.save)
+            log.add_listener(on_attempt)
+            atexit.register(stats.save)
+            _stats = stats
+        return _stats
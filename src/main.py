@@ -1,11 +1,64 @@
 import sys
-import os
+import time
+
+LAUNCHED = time.perf_counter()
+
+import argparse
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent, QTimer
 from .ui.main_window import MainWindow
 
+IMPORTED = time.perf_counter()
+
+class StartupTimer(QObject):
+    """Reports import, window construction and first-paint timings on stderr"""
+
+    def __init__(self):
+        super().__init__()
+        self.marks = [("imports", IMPORTED)]
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def eventFilter(self, obj, event):
+        # Children cover the whole window, so watch paint events application-wide
+        if event.type() == QEvent.Paint:
+            QApplication.instance().removeEventFilter(self)
+            QTimer.singleShot(0, self.report)
+        return False
+
+    def report(self):
+        self.mark("first paint")
+        previous = LAUNCHED
+        parts = []
+        for name, stamp in self.marks:
+            parts.append(f"{name} {1000 * (stamp - previous):.1f} ms")
+            previous = stamp
+        heavy = [mod for mod in ("pandas", "numpy", "yaml") if mod in sys.modules]
+        print(f"startup: {', '.join(parts)}; total {1000 * (previous - LAUNCHED):.1f} ms; "
+              f"loaded: {', '.join(heavy) or 'none'}", file=sys.stderr)
+
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(prog="python -m src.main")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="print import and first-paint timings to stderr")
+    parser.add_argument("--profile", action="store_true",
+                        help="record timing spans (written to progress/trace.json at exit) and enable "
+                             "Ctrl+Shift+P profile captures")
+    args, qt_args = parser.parse_known_args()
+
+    if args.profile:
+        from .Engine import instrument
+        instrument.request()
+    app = QApplication(sys.argv[:1] + qt_args)
+    timer = None
+    if args.measure_startup:
+        timer = StartupTimer()
+        timer.mark("qt init")
     window = MainWindow()
+    if timer is not None:
+        timer.mark("window")
+        app.installEventFilter(timer)
     window.show()
     sys.exit(app.exec_())
 
@@ -0,0 +1,287 @@
+"""HTTP and WebSocket API over the quiz and assessment engines, served by one or more worker processes.
+
+    python -m src.server [--host 127.0.0.1] [--port 8765] [--workers N] [--data data]
+
+HTTP (JSON bodies):
+
+    GET    /health                       worker, session count, bank size
+    POST   /sessions                     {"kind": "quiz"|"oa", "category", "source", "length"|"max_items", "seed"}
+    GET    /sessions/<token>             score so far
+    GET    /sessions/<token>/question    {"question": {...} or null, "finished"}
+    POST   /sessions/<token>/answer      {"id", "answer"}
+    DELETE /sessions/<token>
+
+WebSocket at /ws: one session per connection, driven by JSON messages
+{"op": "start", ...same options as POST /sessions}, {"op": "question"},
+{"op": "answer", "id", "answer"} and {"op": "score"}; replies echo "op".
+Starting a session returns its seed; starting one with that seed (and the
+same bank and answers) asks the same questions again.
+
+The parent process loads the bank once, so the binary cache is fresh and
+item parameters are fitted, then starts the workers. Each worker maps the
+bank from the cache (the pages are shared between processes, and no
+pandas parsing happens while serving) and runs one asyncio loop. Workers
+share the listening port through SO_REUSEPORT; as sessions live in the
+worker that created them, each worker also listens on port + 1 + its
+number, and a request for a session held by another worker is redirected
+there (307). Connections that stay open, and WebSockets, never need it.
+"""
+import os
+import sys
+import json
+import signal
+import socket
+import asyncio
+import argparse
+import traceback
+import multiprocessing
+from ..Engine.question_bank import DATA_DIR, QuestionBank
+from ..Engine.irt import get_item_parameters
+from .protocol import (MAX_HEADER, ApiError, CLOSE, PING, PONG, TEXT, accept_websocket, frame, is_websocket,
+                       read_frame, read_request, response)
+from .sessions import SessionStore, public, worker_of
+
+HOST = "127.0.0.1"
+PORT = 8765
+BACKLOG = 4096
+EXPIRE_INTERVAL = 60
+# Wait for the client to read once this much response data is queued
+HIGH_WATER = 256 * 1024
+
+
+class Api:
+    """Routes requests and WebSocket messages of one worker to its sessions"""
+
+    def __init__(self, store, port=PORT, workers=1):
+        self.store = store
+        self.port = port
+        self.workers = workers
+
+    def start(self, options):
+        session = self.store.create(options)
+        return {"session": session.token, "kind": session.kind, "worker": self.store.worker,
+                "seed": session.engine.seed}
+
+    @staticmethod
+    def question(session):
+        question = session.question()
+        return {"question": None if question is None else public(question), "finished": session.finished}
+
+    @staticmethod
+    def answer(session, data):
+        answer = data.get("answer")
+        if not isinstance(answer, str):
+            raise ApiError(400, "answer must be a string")
+        return session.answer(data.get("id"), answer)
+
+    def session(self, request, token):
+        worker = worker_of(token)
+        if worker is not None and worker != self.store.worker and self.workers > 1 and worker < self.workers:
+            host = request.headers.get("host", HOST).rsplit(":", 1)[0]
+            raise ApiError(307, f"Session is held by worker {worker}",
+                           {"Location": f"http://{host}:{self.port + 1 + worker}{request.path}"})
+        return self.store.get(token)
+
+    def dispatch(self, request):
+        """(status, payload, extra headers) for an HTTP request"""
+        parts = request.path.strip("/").split("/")
+        method = request.method
+        if parts == ["health"] and method == "GET":
+            return 200, {"worker": self.store.worker, "sessions": len(self.store.sessions),
+                         "questions": len(self.store.bank)}, None
+        if parts[0] != "sessions" or len(parts) > 3:
+            raise ApiError(404, "Not found")
+        if len(parts) == 1:
+            if method != "POST":
+                raise ApiError(405, "Use POST to start a session")
+            return 201, self.start(request.json()), None
+        session = self.session(request, parts[1])
+        action = parts[2] if len(parts) == 3 else None
+        if action is None and method == "GET":
+            return 200, session.score(), None
+        if action is None and method == "DELETE":
+            self.store.remove(session.token)
+            return 204, None, None
+        if action == "question" and method == "GET":
+            return 200, self.question(session), None
+        if action == "answer" and method == "POST":
+            return 200, self.answer(session, request.json()), None
+        raise ApiError(405 if action in (None, "question", "answer") else 404, "Not found")
+
+    def message(self, session, data):
+        """(session, reply) for one WebSocket message"""
+        op = data.get("op")
+        if op == "start":
+            if session is not None:
+                self.store.remove(session.token)
+            reply = self.start(data)
+            return self.store.get(reply["session"]), reply
+        if session is None:
+            raise ApiError(409, "Send {\"op\": \"start\"} first")
+        if op == "question":
+            return session, self.question(session)
+        if op == "answer":
+            return session, self.answer(session, data)
+        if op == "score":
+            return session, session.score()
+        raise ApiError(400, "op must be start, question, answer or score")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ApiError as e:
+                    writer.write(response(e.status, {"error": str(e)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                if request.path == "/ws" and is_websocket(request):
+                    writer.write(accept_websocket(request))
+                    await self.websocket(reader, writer)
+                    break
+                try:
+                    status, payload, headers = self.dispatch(request)
+                except ApiError as e:
+                    status, payload, headers = e.status, {"error": str(e)}, e.headers
+                except Exception:
+                    traceback.print_exc()
+                    status, payload, headers = 500, {"error": "Internal server error"}, None
+                writer.write(response(status, payload, headers, request.keep_alive))
+                if not request.keep_alive:
+                    break
+                if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def websocket(self, reader, writer):
+        session = None
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == CLOSE:
+                    writer.write(frame(CLOSE, payload[:2]))
+                    return
+                if opcode == PING:
+                    writer.write(frame(PONG, payload))
+                    continue
+                if opcode != TEXT:
+                    continue
+                reply = {}
+                try:
+                    data = json.loads(payload)
+                    if not isinstance(data, dict):
+                        raise ValueError
+                    reply["op"] = data.get("op")
+                    session, result = self.message(session, data)
+                    reply.update(result)
+                except ValueError:
+                    reply.update(error="Messages must be JSON objects", status=400)
+                except ApiError as e:
+                    reply.update(error=str(e), status=e.status)
+                except Exception:
+                    traceback.print_exc()
+                    reply.update(error="Internal server error", status=500)
+                writer.write(frame(TEXT, json.dumps(reply, separators=(",", ":")).encode("utf-8")))
+                if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    await writer.drain()
+        finally:
+            # The connection was the session
+            if session is not None:
+                self.store.remove(session.token)
+
+
+def raise_file_limit():
+    """Allow as many open sockets as the hard limit permits (thousands of connections need it)"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def listen(host, port, reuse_port=False):
+    sock = socket.create_server((host, port), backlog=BACKLOG, reuse_port=reuse_port)
+    sock.setblocking(False)
+    return sock
+
+
+async def _expire(store):
+    while True:
+        await asyncio.sleep(EXPIRE_INTERVAL)
+        store.expire()
+
+
+async def _serve(api, sockets):
+    servers = [await asyncio.start_server(api.handle, sock=sock, limit=MAX_HEADER) for sock in sockets]
+    expiry = asyncio.ensure_future(_expire(api.store))
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        expiry.cancel()
+
+
+def serve(worker, host=HOST, port=PORT, data_dir=DATA_DIR, workers=1):
+    """Run one worker until interrupted"""
+    bank = QuestionBank.from_path(data_dir)
+    store = SessionStore(worker, bank)
+    store.params  # load the cached item parameters before serving
+    sockets = [listen(host, port, reuse_port=workers > 1)]
+    if workers > 1:
+        sockets.append(listen(host, port + 1 + worker))
+    try:
+        asyncio.run(_serve(Api(store, port, workers), sockets))
+    except KeyboardInterrupt:
+        pass
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.server",
+                                     description="Serve quizzes and assessments over HTTP and WebSocket.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--data", default=DATA_DIR, help="question CSV directory")
+    args = parser.parse_args(argv)
+
+    workers = max(args.workers, 1)
+    raise_file_limit()
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        print("SO_REUSEPORT is not available on this platform; using one worker", file=sys.stderr)
+        workers = 1
+    # Build the binary cache and fit item parameters once, so the workers only map and load them
+    bank = QuestionBank.from_path(args.data)
+    get_item_parameters(bank)
+    del bank
+    print(f"serving {args.data} on http://{args.host}:{args.port} with {workers} worker(s)", file=sys.stderr)
+    if workers == 1:
+        serve(0, args.host, args.port, args.data)
+        return 0
+    processes = [multiprocessing.Process(target=serve, args=(i, args.host, args.port, args.data, workers),
+                                         name=f"server-{i}", daemon=True) for i in range(workers)]
+    # Stopping the parent (Ctrl+C or SIGTERM) stops the workers too
+    signal.signal(signal.SIGTERM, _interrupt)
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    return 0
@@ -0,0 +1,166 @@
+"""Just enough HTTP/1.1 (keep-alive, Content-Length bodies) and WebSocket (RFC 6455) for the API.
+
+Requests and messages are small JSON documents, so bodies are read whole
+and there is no chunked encoding, compression or TLS; put a reverse proxy
+in front for those.
+"""
+import json
+import base64
+import hashlib
+import asyncio
+
+MAX_HEADER = 16 * 1024
+MAX_BODY = 64 * 1024
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+REASONS = {
+    101: "Switching Protocols", 200: "OK", 201: "Created", 204: "No Content", 307: "Temporary Redirect",
+    400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 410: "Gone",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+# WebSocket opcodes
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+
+
+class ApiError(Exception):
+    """An error response: HTTP status and a message returned as {"error": message}"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "version", "headers", "body")
+
+    def __init__(self, method, path, query, version, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise ApiError(400, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return data
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        return connection != "close" if self.version == "HTTP/1.1" else connection == "keep-alive"
+
+
+async def read_request(reader):
+    """Next request on the connection, or None once the client has closed it"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ApiError(413, "Request headers too large")
+    request_line, *lines = head[:-4].decode("latin-1").split("\r\n")
+    try:
+        method, target, version = request_line.split(" ")
+    except ValueError:
+        raise ApiError(400, "Malformed request line")
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise ApiError(400, "Malformed Content-Length")
+    if length > MAX_BODY:
+        raise ApiError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    path, _, query = target.partition("?")
+    return Request(method, path, query, version, headers, body)
+
+
+def response(status, payload=None, headers=None, keep_alive=True):
+    """Bytes of an HTTP response with payload (any JSON value) as its body"""
+    body = b"" if payload is None else json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+             f"Content-Length: {len(body)}",
+             "Connection: keep-alive" if keep_alive else "Connection: close"]
+    if body:
+        lines.append("Content-Type: application/json")
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def is_websocket(request):
+    return (request.headers.get("upgrade", "").lower() == "websocket"
+            and "sec-websocket-key" in request.headers)
+
+
+def accept_websocket(request):
+    """Bytes of the 101 response completing the WebSocket handshake"""
+    key = request.headers["sec-websocket-key"].encode("latin-1")
+    accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode("ascii")
+    return (f"HTTP/1.1 101 {REASONS[101]}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1")
+
+
+def _unmask(payload, mask):
+    # XOR as one big integer; far faster than a per-byte loop
+    n = len(payload)
+    key = int.from_bytes((mask * (n // 4 + 1))[:n], "little")
+    return (int.from_bytes(payload, "little") ^ key).to_bytes(n, "little")
+
+
+async def read_frame(reader):
+    """(opcode, payload) of the next complete message, or (CLOSE, b"") when the connection ends"""
+    message, message_opcode, size = [], None, 0
+    while True:
+        try:
+            first, second = await reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length = int.from_bytes(await reader.readexactly(2), "big")
+            elif length == 127:
+                length = int.from_bytes(await reader.readexactly(8), "big")
+            size += length
+            if size > MAX_BODY:
+                return CLOSE, b""
+            mask = await reader.readexactly(4) if second & 0x80 else None
+            payload = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return CLOSE, b""
+        if mask:
+            payload = _unmask(payload, mask)
+        opcode, fin = first & 0x0F, first & 0x80
+        if opcode >= CLOSE:
+            # Control frames may arrive between the fragments of a message
+            return opcode, payload
+        if opcode:
+            message_opcode = opcode
+        message.append(payload)
+        if fin:
+            return message_opcode, b"".join(message)
+
+
+def frame(opcode, payload=b""):
+    """Bytes of one unmasked (server to client) frame"""
+    n = len(payload)
+    if n < 126:
+        header = bytes((0x80 | opcode, n))
+    elif n < 1 << 16:
+        header = bytes((0x80 | opcode, 126)) + n.to_bytes(2, "big")
+    else:
+        header = bytes((0x80 | opcode, 127)) + n.to_bytes(8, "big")
+    return header + payload
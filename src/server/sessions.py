@@ -0,0 +1,205 @@
+"""Per-user quiz and assessment sessions held by one server worker.
+
+Every session owns its engine (sampler state, adaptive ability estimate)
+over the worker's shared, read-only QuestionBank, and its engine draws
+from the session's own seed (given by the client, or fresh), so sessions
+in different workers never share random state and any session can be
+replayed. Tokens name the worker that holds the session, so a request
+that reaches another worker can be redirected to it.
+"""
+import time
+import secrets
+from ..Engine.quiz_engine import QuizEngine
+from ..Engine.oa_engine import SECONDS_PER_QUESTION, OAEngine
+from ..Engine.generator import difficulty_of
+from ..Engine.irt import get_item_parameters
+from .protocol import ApiError
+
+QUIZ_LENGTH = 5
+MAX_QUIZ_LENGTH = 100
+OA_LENGTH = 10
+MAX_OA_LENGTH = 50
+SESSION_TTL = 3600
+MAX_SESSIONS = 50000
+
+
+def public(question):
+    """The fields of a question a client may see before answering it"""
+    return {"id": question['id'], "category": question['category'], "question": question['question'],
+            "type": question['type']}
+
+
+def worker_of(token):
+    worker, _, _ = token.partition(".")
+    return int(worker) if worker.isdigit() else None
+
+
+def _seed(options):
+    seed = options.get("seed")
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed < 2 ** 63):
+        raise ApiError(400, "seed must be a whole number from 0 to 2**63 - 1")
+    return seed
+
+
+def _filter(options, key):
+    value = options.get(key)
+    if value is not None and not isinstance(value, str):
+        raise ApiError(400, f"{key} must be a string")
+    return value
+
+
+def _length(options, key, default, limit):
+    value = options.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= limit:
+        raise ApiError(400, f"{key} must be a whole number from 1 to {limit}")
+    return value
+
+
+class QuizSession:
+    kind = "quiz"
+
+    def __init__(self, token, bank, category=None, source=None, length=QUIZ_LENGTH, seed=None):
+        self.token = token
+        self.engine = QuizEngine(bank=bank, seed=seed)
+        self.category = category
+        self.source = source
+        self.length = length
+        self.current = None
+        self.answered = 0
+        self.correct = 0
+        self.touched = time.monotonic()
+
+    @property
+    def finished(self):
+        return self.current is None and self.answered >= self.length
+
+    def question(self):
+        """The question waiting for an answer, drawing the next one if needed; None once finished"""
+        if self.current is None and self.answered < self.length:
+            self.current = self.engine.get_random_question(self.category, self.source)
+            if self.current is None:
+                # The category has fewer questions than asked for
+                self.length = self.answered
+        return self.current
+
+    def answer(self, question_id, text):
+        if self.current is None:
+            raise ApiError(409, "No question is waiting for an answer")
+        if question_id is not None and question_id != self.current['id']:
+            raise ApiError(409, "That is not the current question")
+        correct = self.engine.check_answer(text)
+        result = {"correct": correct, "answer": self.current['answer']}
+        self.current = None
+        self.answered += 1
+        self.correct += correct
+        return result
+
+    def score(self):
+        return {"kind": self.kind, "correct": self.correct, "answered": self.answered, "length": self.length,
+                "finished": self.finished}
+
+
+class AssessmentSession:
+    """An adaptive assessment; like the OA window it gives no feedback until the end"""
+    kind = "oa"
+
+    def __init__(self, token, bank, params, category=None, source=None, max_items=OA_LENGTH, seed=None):
+        self.token = token
+        self.engine = OAEngine(bank=bank, params=params, seed=seed)
+        self.engine.start_adaptive(max_items, category, source)
+        self.deadline = time.monotonic() + max_items * SECONDS_PER_QUESTION
+        self.current = None
+        self.touched = time.monotonic()
+
+    @property
+    def time_left(self):
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    @property
+    def finished(self):
+        return self.current is None and self.engine.adaptive.finished or not self.time_left
+
+    def question(self):
+        if self.current is None and not self.finished:
+            self.current = self.engine.next_adaptive()
+        return None if not self.time_left else self.current
+
+    def answer(self, question_id, text):
+        if not self.time_left:
+            raise ApiError(410, "The assessment's time is up")
+        if self.current is None:
+            raise ApiError(409, "No question is waiting for an answer")
+        if question_id is not None and question_id != self.current['id']:
+            raise ApiError(409, "That is not the current question")
+        self.engine.submit_answer(self.current['id'], text)
+        self.current = None
+        return {"accepted": True}
+
+    def score(self):
+        correct, answered = self.engine.score()
+        result = {"kind": self.kind, "correct": correct, "answered": answered,
+                  "max_items": self.engine.adaptive.max_items, "time_left": round(self.time_left, 1),
+                  "finished": self.finished}
+        if result["finished"]:
+            session = self.engine.adaptive
+            result.update(theta=session.theta, standard_error=session.standard_error,
+                          percentile=session.percentile())
+        return result
+
+
+class SessionStore:
+    """The sessions of one worker; idle ones expire after ttl seconds"""
+
+    def __init__(self, worker, bank, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.worker = worker
+        self.bank = bank
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self._params = None
+
+    @property
+    def params(self):
+        # Fitted (and cached to disk) by the parent process before the workers start
+        if self._params is None:
+            self._params = get_item_parameters(self.bank)
+        return self._params
+
+    def create(self, options):
+        if len(self.sessions) >= self.max_sessions:
+            raise ApiError(503, "Too many sessions on this worker")
+        kind = options.get("kind", "quiz")
+        category, source = _filter(options, "category"), _filter(options, "source")
+        generated = difficulty_of(category) is not None
+        if not generated and not len(self.bank.rows(category=category, source=source)):
+            raise ApiError(404, "No questions match that category and source")
+        seed = _seed(options)
+        token = f"{self.worker}.{secrets.token_urlsafe(12)}"
+        if kind == "quiz":
+            session = QuizSession(token, self.bank, category, source,
+                                  _length(options, "length", QUIZ_LENGTH, MAX_QUIZ_LENGTH), seed)
+        elif kind == "oa" and not generated:
+            session = AssessmentSession(token, self.bank, self.params, category, source,
+                                        _length(options, "max_items", OA_LENGTH, MAX_OA_LENGTH), seed)
+        else:
+            raise ApiError(400, "kind must be 'quiz' or 'oa' (assessments use questions from the files)")
+        self.sessions[token] = session
+        return session
+
+    def get(self, token):
+        session = self.sessions.get(token)
+        if session is None:
+            raise ApiError(404, "No such session (it may have expired)")
+        session.touched = time.monotonic()
+        return session
+
+    def remove(self, token):
+        return self.sessions.pop(token, None) is not None
+
+    def expire(self):
+        """Drop sessions idle for longer than ttl; returns how many"""
+        cutoff = time.monotonic() - self.ttl
+        idle = [token for token, session in self.sessions.items() if session.touched < cutoff]
+        for token in idle:
+            del self.sessions[token]
+        return len(idle)
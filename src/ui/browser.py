@@ -0,0 +1,478 @@
+import os
+from array import array
+import numpy as np
+from PyQt5.QtWidgets import (
+    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QTableView, QHeaderView,
+    QAbstractItemView
+)
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex
+from ..Engine.instrument import traced
+from .pixmaps import scaled_pixmap
+from .watcher import get_watcher
+from .loader import get_loader
+
+LOGO_PATH = os.path.join("assets", "eigenprep.png")
+COLUMNS = (("ID", "id"), ("Category", "category"), ("Type", "type"), ("Question", "question"), ("Answer", "answer"))
+# Rows handed to the view per fetchMore()
+FETCH_SIZE = 500
+# Rows checked against the filter per event-loop turn
+FILTER_CHUNK = 2000
+FILTER_DELAY_MS = 200
+ANSWER_PREVIEW = 80
+ROW_HEIGHT = 30
+# Tied runs up to this long are sorted by their text directly rather than key by key
+SMALL_RUN = 64
+
+
+def elide(text, limit):
+    """First line of text cut to limit characters"""
+    line, _, rest = text.partition("\n")
+    if len(line) <= limit and not rest:
+        return line
+    return line[:limit].rstrip() + "…"
+
+
+class SortedRows:
+    """Rows ordered by one column, refined lazily.
+
+    Rows are argsorted by their bank.sort_keys(): exact for IDs, categories and
+    types, the first 8 bytes for question and answer text. A run of rows whose
+    text keys tie is ordered by the next 8 bytes only when resolve() reaches
+    it, and so on into the runs that still tie (a most-significant-digit radix
+    sort done on demand), so a sorted 500k-row category only ever compares the
+    rows scrolled through and never builds their strings. Runs ordered to some
+    depth but not yet resolved wait on a stack, innermost last.
+    """
+
+    def __init__(self, bank, rows, column=None, descending=False):
+        self.bank = bank
+        self.column = column
+        self.descending = descending
+        self.pending = []
+        if column is None:
+            self.rows = rows
+            self.resolved = len(rows)
+            return
+        keys = self._keys(rows, 0)
+        order = np.argsort(keys, kind="stable")
+        self.rows = rows[order]
+        self.resolved = len(rows)
+        if column in ("question", "answer"):
+            self.resolved = 0
+            self._push(0, keys[order], 8)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _keys(self, rows, skip):
+        keys = self.bank.sort_keys(rows, self.column, skip)
+        return ~keys if self.descending else keys
+
+    def _text(self, row):
+        # Same order as the keys: UTF-8 bytes with ASCII letters lowercased
+        return getattr(self.bank, self.column)(row).encode("utf-8").lower()
+
+    def _push(self, lo, keys, skip):
+        # Positions where a tie with the next row starts; rows between them are already in place
+        self.pending.append((lo, keys, skip, np.flatnonzero(keys[1:] == keys[:-1])))
+
+    def resolve(self, end):
+        """Put rows[:end] in their final order"""
+        ended = ~np.uint64(0) if self.descending else np.uint64(0)
+        while self.resolved < end:
+            lo, keys, skip, ties = self.pending[-1]
+            i = self.resolved - lo
+            if i >= len(keys):
+                self.pending.pop()
+                continue
+            t = int(np.searchsorted(ties, i))
+            if t == len(ties):
+                self.resolved = lo + len(keys)
+                continue
+            if ties[t] > i:
+                self.resolved = lo + int(ties[t])
+                continue
+            j = int(np.searchsorted(keys, keys[i], side="right"))
+            # A key of all padding means the tied texts have ended: they are equal
+            if keys[i] == ended:
+                self.resolved = lo + j
+                continue
+            rows = self.rows[lo + i:lo + j]
+            if j - i <= SMALL_RUN:
+                self.rows[lo + i:lo + j] = sorted(rows.tolist(), key=self._text, reverse=self.descending)
+                self.resolved = lo + j
+                continue
+            sub = self._keys(rows, skip)
+            order = np.argsort(sub, kind="stable")
+            self.rows[lo + i:lo + j] = rows[order]
+            self._push(lo + i, sub[order], skip + 8)
+
+
+class QuestionModel(QAbstractTableModel):
+    """Questions of the bank as a lazily fetched, filtered and sorted table.
+
+    Only row numbers are held: cell text is read from the bank's columns when
+    the view asks for it, so only what is on screen is ever decoded. The view
+    gets FETCH_SIZE rows at a time through canFetchMore()/fetchMore(). A text
+    filter scans the sorted rows FILTER_CHUNK at a time between events,
+    appending matches as it finds them; a filter that narrows the previous one
+    only rescans that one's matches. Answers are elided to one short line
+    unless their row is expanded.
+    """
+
+    def __init__(self, bank, parent=None):
+        super().__init__(parent)
+        self.bank = bank
+        self.base = np.zeros(0, dtype=np.int64)
+        self.sort_column = None
+        self.descending = False
+        self.order = SortedRows(bank, self.base)
+        self.query = ""
+        self.matches = None
+        self.scanned = 0
+        self.candidates = None
+        self.loaded = 0
+        self.expanded = set()
+        self.scan_timer = QTimer(self)
+        self.scan_timer.timeout.connect(self.scan)
+
+    # Sequence shown: every sorted row, or the matches found so far
+
+    @property
+    def filtering(self):
+        return self.scan_timer.isActive()
+
+    @property
+    def available(self):
+        return len(self.order) if self.matches is None else len(self.matches)
+
+    def row_at(self, i):
+        if self.matches is None:
+            return int(self.order.rows[i])
+        return self.matches[i]
+
+    def set_rows(self, rows):
+        """Show these bank rows (e.g. one category), keeping the sort and filter"""
+        self.base = np.asarray(rows, dtype=np.int64)
+        # Keeps the rows shown resolvable if their file is reloaded before the next refresh
+        self.tables = self.bank.tables()
+        self._rebuild()
+
+    def set_filter(self, text):
+        query = text.strip().casefold()
+        if query == self.query:
+            return
+        # A filter containing the previous one can only match rows that one matched
+        narrower = self.query and self.query in query and self.matches is not None and not self.filtering
+        previous = np.frombuffer(self.matches, dtype=np.int64).copy() if narrower else None
+        self.query = query
+        self._restart(previous)
+
+    def _rebuild(self):
+        self.beginResetModel()
+        self.order = SortedRows(self.bank, self.base, self.sort_column, self.descending)
+        self.expanded.clear()
+        self._restart(None, reset=False)
+        self.endResetModel()
+
+    def _restart(self, candidates, reset=True):
+        if reset:
+            self.beginResetModel()
+        self.scan_timer.stop()
+        self.loaded = 0
+        if self.query:
+            self.matches = array('q')
+            self.candidates = candidates
+            self.scanned = 0
+            self.scan_timer.start(0)
+        else:
+            self.matches = None
+        if reset:
+            self.endResetModel()
+
+    @traced("render.browse_filter")
+    def scan(self):
+        """Check the next FILTER_CHUNK rows against the filter"""
+        pool = self.order.rows if self.candidates is None else self.candidates
+        end = min(self.scanned + FILTER_CHUNK, len(pool))
+        if self.candidates is None:
+            self.order.resolve(end)
+        bank, query = self.bank, self.query
+        for row in pool[self.scanned:end].tolist():
+            if query in bank.question(row).casefold() or query in bank.answer(row).casefold():
+                self.matches.append(row)
+        self.scanned = end
+        if end >= len(pool):
+            self.scan_timer.stop()
+        # Fill the first page as matches come in; the view fetches the rest on scrolling
+        if self.loaded < FETCH_SIZE and self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    # QAbstractTableModel
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded < self.available
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        end = min(self.loaded + FETCH_SIZE, self.available)
+        if end <= self.loaded:
+            return
+        if self.matches is None:
+            self.order.resolve(end)
+        self.beginInsertRows(QModelIndex(), self.loaded, end - 1)
+        self.loaded = end
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        row = self.row_at(index.row())
+        column = COLUMNS[index.column()][1]
+        if column == "id":
+            return self.bank.id_of(row)
+        if column == "category":
+            return self.bank.category(row)
+        if column == "type":
+            return self.bank.qtype(row)
+        text = self.bank.question(row) if column == "question" else self.bank.answer(row)
+        if row in self.expanded:
+            return text
+        if role == Qt.ToolTipRole:
+            return None
+        return elide(text, ANSWER_PREVIEW) if column == "answer" else text.replace("\n", " ")
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = COLUMNS[column][1] if column >= 0 else None
+        self.descending = order == Qt.DescendingOrder
+        self._rebuild()
+
+    def toggle(self, index):
+        """Expand or collapse the row at index; returns whether it is now expanded"""
+        row = self.row_at(index.row())
+        if row in self.expanded:
+            self.expanded.discard(row)
+        else:
+            self.expanded.add(row)
+        self.dataChanged.emit(self.index(index.row(), 0), self.index(index.row(), len(COLUMNS) - 1))
+        return row in self.expanded
+
+
+class BrowserWindow(QWidget):
+    """Browse and review every loaded question, a category at a time or all together"""
+
+    def __init__(self, main_window=None):
+        super().__init__()
+        self.setWindowTitle("EigenPrep Question Browser")
+        self.setMinimumSize(1000, 700)
+        self.main_window = main_window
+        self.model = None
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self.update_status)
+        self.init_ui()
+        self.apply_modern_styling()
+        loader = get_loader()
+        if loader.done:
+            self.attach(loader.bank)
+        else:
+            self.status_label.setText("Loading questions…")
+            loader.finished.connect(self.attach_loaded)
+            loader.start()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(40, 40, 40, 40)
+        layout.setSpacing(16)
+
+        # Logo and title
+        header = QHBoxLayout()
+        if os.path.exists(LOGO_PATH):
+            logo = QLabel()
+            logo.setPixmap(scaled_pixmap(LOGO_PATH, 70))
+            logo.setFixedSize(70, 70)
+            header.addWidget(logo, alignment=Qt.AlignLeft | Qt.AlignTop)
+        title = QLabel("Question Browser")
+        title.setFont(QFont("Segoe UI", 22, QFont.Bold))
+        title.setStyleSheet("color: #2c3e50;")
+        header.addWidget(title, alignment=Qt.AlignVCenter)
+        header.addStretch()
+        layout.addLayout(header)
+
+        controls = QHBoxLayout()
+        self.category_box = QComboBox()
+        self.category_box.setFont(QFont("Segoe UI", 13))
+        self.category_box.setMinimumWidth(220)
+        self.category_box.currentIndexChanged.connect(self.show_category)
+        controls.addWidget(self.category_box)
+        self.filter_input = QLineEdit()
+        self.filter_input.setFont(QFont("Segoe UI", 13))
+        self.filter_input.setPlaceholderText("Filter questions and answers...")
+        self.filter_input.textChanged.connect(lambda: self.filter_timer.start(FILTER_DELAY_MS))
+        controls.addWidget(self.filter_input, 1)
+        layout.addLayout(controls)
+
+        self.status_label = QLabel("")
+        self.status_label.setFont(QFont("Segoe UI", 11))
+        self.status_label.setStyleSheet("color: #7f8c8d;")
+        layout.addWidget(self.status_label)
+
+        self.table = QTableView()
+        self.table.setFont(QFont("Segoe UI", 12))
+        self.table.setWordWrap(True)
+        self.table.setTextElideMode(Qt.ElideRight)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.table.setSortingEnabled(False)
+        # Fixed row heights: the view never measures rows it is not showing
+        vertical = self.table.verticalHeader()
+        vertical.setVisible(False)
+        vertical.setSectionResizeMode(QHeaderView.Fixed)
+        vertical.setDefaultSectionSize(ROW_HEIGHT)
+        self.table.activated.connect(self.toggle_row)
+        self.table.doubleClicked.connect(self.toggle_row)
+        layout.addWidget(self.table, 1)
+
+        hint = QLabel("Double-click or press Enter on a question to show its full answer. Click a heading to sort.")
+        hint.setFont(QFont("Segoe UI", 11))
+        hint.setStyleSheet("color: #7f8c8d;")
+        layout.addWidget(hint)
+
+        close_btn = QPushButton("Back to Menu")
+        close_btn.setFont(QFont("Segoe UI", 12, QFont.Medium))
+        close_btn.clicked.connect(self.close)
+        layout.addWidget(close_btn, alignment=Qt.AlignRight)
+
+    def apply_modern_styling(self):
+        self.setStyleSheet("""
+            QWidget { font-family: 'Segoe UI', Arial, sans-serif; background: white; }
+            QComboBox, QLineEdit {
+                border: 1.5px solid #215bbb;
+                border-radius: 8px;
+                padding: 8px 12px;
+            }
+            QTableView {
+                border: 1.5px solid #215bbb;
+                border-radius: 8px;
+                gridline-color: #ecf0f1;
+                selection-background-color: #d6e4f7;
+                selection-color: #2c3e50;
+            }
+            QHeaderView::section {
+                background: #f5f7fa;
+                color: #2c3e50;
+                border: none;
+                padding: 8px;
+                font-weight: 600;
+            }
+            QPushButton {
+                background: #215bbb;
+                color: white;
+                border: none;
+                border-radius: 12px;
+                padding: 12px 24px;
+                font-weight: 500;
+            }
+            QPushButton:hover {
+                background: #3570d1;
+            }
+            QPushButton:pressed {
+                background: #174080;
+            }
+        """)
+
+    def attach_loaded(self):
+        get_loader().finished.disconnect(self.attach_loaded)
+        self.attach(get_loader().bank)
+
+    def attach(self, bank):
+        self.bank = bank
+        self.model = QuestionModel(bank, self)
+        self.model.rowsInserted.connect(self.update_status)
+        self.model.modelReset.connect(self.update_status)
+        self.table.setModel(self.model)
+        # Set widths once; ResizeToContents would measure every row
+        header = self.table.horizontalHeader()
+        for column, width in enumerate((150, 140, 70)):
+            header.setSectionResizeMode(column, QHeaderView.Interactive)
+            header.resizeSection(column, width)
+        header.setSectionResizeMode(3, QHeaderView.Stretch)
+        header.setSectionResizeMode(4, QHeaderView.Stretch)
+        header.setSortIndicatorShown(True)
+        header.setSectionsClickable(True)
+        header.sortIndicatorChanged.connect(self.model.sort)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        get_watcher().bank_changed.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self, *args):
+        """(Re)list the categories and rows, keeping the current choice if it still exists"""
+        current = self.category_box.currentData()
+        self.category_box.blockSignals(True)
+        self.category_box.clear()
+        self.category_box.addItem(f"All categories ({len(self.bank.live_rows):,})", None)
+        for category in sorted(self.bank.by_category, key=str.casefold):
+            self.category_box.addItem(f"{category} ({len(self.bank.by_category[category]):,})", category)
+        index = self.category_box.findData(current) if current is not None else 0
+        self.category_box.setCurrentIndex(max(index, 0))
+        self.category_box.blockSignals(False)
+        self.show_category()
+
+    @traced("render.browse")
+    def show_category(self, *args):
+        self.model.set_rows(self.bank.rows(category=self.category_box.currentData()))
+        self.table.scrollToTop()
+
+    def apply_filter(self):
+        if self.model is None:
+            return
+        self.model.set_filter(self.filter_input.text())
+        self.table.scrollToTop()
+        self.status_timer.start(100)
+        self.update_status()
+
+    def update_status(self, *args):
+        model = self.model
+        total = len(model.order)
+        if model.matches is None:
+            self.status_label.setText(f"{total:,} questions")
+        elif model.filtering:
+            self.status_label.setText(f"{len(model.matches):,} matches so far… ({model.scanned:,} of "
+                                      f"{len(model.candidates) if model.candidates is not None else total:,} checked)")
+        else:
+            self.status_label.setText(f"{len(model.matches):,} of {total:,} questions match")
+        if not model.filtering:
+            self.status_timer.stop()
+
+    def toggle_row(self, index):
+        if not index.isValid():
+            return
+        if self.model.toggle(index):
+            self.table.resizeRowToContents(index.row())
+        else:
+            self.table.setRowHeight(index.row(), ROW_HEIGHT)
+
+    def closeEvent(self, event):
+        if self.model is not None:
+            self.model.scan_timer.stop()
+            get_watcher().bank_changed.disconnect(self.refresh)
+        if self.main_window is not None:
+            self.main_window.show()
+        super().closeEvent(event)
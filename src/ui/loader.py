@@ -0,0 +1,136 @@
+import os
+import threading
+from functools import partial
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+class TaskSignals(QObject):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+class Task(QRunnable):
+    """Runs fn(*args) on a pool thread and reports the result through queued signals"""
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.done.emit(result)
+
+def run_async(fn, *args, on_done=None, on_failed=None):
+    task = Task(fn, *args)
+    if on_done is not None:
+        task.signals.done.connect(on_done)
+    if on_failed is not None:
+        task.signals.failed.connect(on_failed)
+    QThreadPool.globalInstance().start(task)
+    return task
+
+class BankLoader(QObject):
+    """Prefetches every question file into the shared QuestionBank on the global thread pool.
+
+    The bank modules (and NumPy) are first imported on the pool too, so the menu paints without them.
+    """
+    progress = pyqtSignal(int, int)
+    source_loaded = pyqtSignal(str)
+    source_failed = pyqtSignal(str, str)
+    finished = pyqtSignal()
+
+    def __init__(self, data_dir=None):
+        super().__init__()
+        self.data_dir = data_dir
+        self.bank = None
+        self.starting = False
+        self.pending = set()
+        self.total = 0
+        self.tasks = []
+        self.remaining = 0
+        self.remaining_lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self.bank is not None
+
+    @property
+    def done(self):
+        return self.started and self.bank.ready.is_set()
+
+    def is_loaded(self, source):
+        return self.started and source in self.bank.by_source
+
+    def start(self):
+        if self.starting:
+            return
+        self.starting = True
+        self.tasks.append(run_async(self._register, on_done=self._begin))
+
+    def _register(self):
+        from ..Engine.question_bank import DATA_DIR, csv_paths, register_bank
+        data_dir = self.data_dir or DATA_DIR
+        bank, created = register_bank(data_dir)
+        return data_dir, bank, created, csv_paths(data_dir) if created else []
+
+    def _begin(self, registered):
+        self.data_dir, self.bank, created, paths = registered
+        if not created:
+            # Loaded, or being loaded, by a synchronous get_bank() elsewhere
+            self.tasks.append(run_async(self.bank.ready.wait, on_done=self._finish))
+            return
+        self.pending = {os.path.basename(p) for p in paths}
+        self.total = self.remaining = len(paths)
+        if not paths:
+            self._finish()
+        for path in paths:
+            source = os.path.basename(path)
+            self.tasks.append(run_async(self._load_file, path,
+                                        on_done=partial(self._loaded, source),
+                                        on_failed=partial(self._failed, source)))
+
+    def _load_file(self, path):
+        # Runs on a pool thread; ready is set here rather than in a queued slot
+        # so a get_bank() blocking the GUI thread cannot deadlock
+        try:
+            return self.bank.load_file(path)
+        finally:
+            with self.remaining_lock:
+                self.remaining -= 1
+                if self.remaining == 0:
+                    self.bank.ready.set()
+
+    def _loaded(self, source, table):
+        self.source_loaded.emit(source)
+        self._settle(source)
+
+    def _failed(self, source, error):
+        self.source_failed.emit(source, error)
+        self._settle(source)
+
+    def _settle(self, source):
+        self.pending.discard(source)
+        self.progress.emit(self.total - len(self.pending), self.total)
+        if not self.pending:
+            self._finish()
+
+    def _finish(self, *args):
+        self.tasks = []
+        self.bank.ready.set()
+        self.finished.emit()
+        # Build the search index in the background once everything is loaded
+        from ..Engine.search import get_search_index
+        self.tasks.append(run_async(get_search_index(self.bank).sync))
+
+_loader = None
+
+def get_loader():
+    """The application-wide BankLoader; must be first called from the GUI thread"""
+    global _loader
+    if _loader is None:
+        _loader = BankLoader()
+    return _loader
@@ -1,20 +1,25 @@
 import os
-import yaml
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, 
     QMessageBox, QSpacerItem, QSizePolicy, QGraphicsDropShadowEffect,
-    QFrame
+    QFrame, QShortcut
 )
-from PyQt5.QtGui import QPixmap, QFont, QLinearGradient, QPalette, QColor, QPainter, QIcon
-from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, pyqtProperty, QRect
-from .quiz import QuizWindow
+from PyQt5.QtGui import QFont, QLinearGradient, QPalette, QColor, QPainter, QIcon, QKeySequence
+from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, pyqtProperty, QRect, QTimer
+from .pixmaps import scaled_pixmap
+from .loader import get_loader, run_async
+from .watcher import get_watcher
+from ..Engine import instrument
 
 CONFIG_PATH = os.path.join("config", "config.yaml")
 
 def get_version():
+    """Read config.yaml (switching on instrumentation if it asks for it) and return the version"""
     try:
+        import yaml
         with open(CONFIG_PATH, "r") as f:
             cfg = yaml.safe_load(f)
+        instrument.configure(cfg)
         return str(cfg.get("version", "1.0.0"))
     except Exception:
         return "Error Fetching Version"
@@ -25,8 +30,9 @@ class AnimatedButton(QPushButton):
     def __init__(self, text, parent=None):
         super().__init__(text, parent)
         self.setMouseTracking(True)
-        
-        # Apply shadow effect
+    
+    def add_shadow(self):
+        # Applied after the first paint; blur effects are costly to set up
         shadow = QGraphicsDropShadowEffect()
         shadow.setOffset(0, 4)
         shadow.setBlurRadius(15)
@@ -59,8 +65,8 @@ class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("EigenPrep - Quantitative Interview Preparation")
-        self.setMinimumSize(1000, 750)
-        self.version = get_version()
+        self.setMinimumSize(1000, 800)
+        self.version = None
         
         # Set window icon
         icon_path = os.path.join("assets", "eigenprep-nav.png")
@@ -68,6 +74,10 @@ class MainWindow(QWidget):
             self.setWindowIcon(QIcon(icon_path))
         
         self.quiz_window = None
+        self.stats_window = None
+        self.oa_window = None
+        self.browser_window = None
+        self.shadows_applied = False
         self.init_ui()
         self.apply_modern_styling()
     
@@ -92,20 +102,13 @@ class MainWindow(QWidget):
         # Logo section
         logo_section = QVBoxLayout()
         logo_path = os.path.join("assets", "eigenprep.png")
+        self.logo = None
         
         if os.path.exists(logo_path):
-            #pixmap = QPixmap(logo_path).scaled(180, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            pixmap = QPixmap(logo_path).scaled(250, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             logo = QLabel()
-            logo.setPixmap(pixmap)
+            logo.setPixmap(scaled_pixmap(logo_path, 250))
             logo.setFixedSize(250, 250)
-            
-            # Add shadow to logo
-            logo_shadow = QGraphicsDropShadowEffect()
-            logo_shadow.setOffset(0, 2)
-            logo_shadow.setBlurRadius(10)
-            logo_shadow.setColor(QColor(0, 0, 0, 30))
-            logo.setGraphicsEffect(logo_shadow)
+            self.logo = logo
         else:
             logo = QLabel("EigenPrep")
             logo.setFont(QFont("Segoe UI", 32, QFont.Bold))
@@ -155,10 +158,12 @@ class MainWindow(QWidget):
         buttons_layout.addSpacerItem(QSpacerItem(20, 30, QSizePolicy.Minimum, QSizePolicy.Fixed))
         
         # Button configurations
+        self.menu_buttons = []
         button_configs = [
             ("Start Quiz", "Begin your quantitative practice session", True, self.start_quiz),
             ("Online Assessment", "Take a timed mock interview assessment", True, self.start_oa),
-            ("View Statistics", "Track your progress and performance", False, None),
+            ("View Statistics", "Track your progress and performance", True, self.show_stats),
+            ("Browse Questions", "Review every question and answer, filtered and sorted", True, self.show_browser),
             ("Settings", "Customize your learning experience", False, None),
             ("Exit Application", "Close EigenPrep", True, self.close)
         ]
@@ -172,6 +177,7 @@ class MainWindow(QWidget):
             btn.setFont(QFont("Segoe UI", 14, QFont.Medium))
             btn.setEnabled(enabled)
             btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+            self.menu_buttons.append(btn)
             
             if callback:
                 btn.clicked.connect(callback)
@@ -202,13 +208,19 @@ class MainWindow(QWidget):
         built_by.setFont(QFont("Segoe UI", 11))
         built_by.setStyleSheet("color: #7f8c8d;")
         
-        version_label = QLabel(f"Version {self.version}")
-        version_label.setFont(QFont("Segoe UI", 11))
-        version_label.setStyleSheet("color: #7f8c8d;")
+        self.load_status_label = QLabel("")
+        self.load_status_label.setFont(QFont("Segoe UI", 11))
+        self.load_status_label.setStyleSheet("color: #7f8c8d;")
+        
+        self.version_label = QLabel("Version …")
+        self.version_label.setFont(QFont("Segoe UI", 11))
+        self.version_label.setStyleSheet("color: #7f8c8d;")
         
         footer_layout.addWidget(built_by)
         footer_layout.addStretch()
-        footer_layout.addWidget(version_label)
+        footer_layout.addWidget(self.load_status_label)
+        footer_layout.addSpacing(20)
+        footer_layout.addWidget(self.version_label)
         
         container_layout.addWidget(footer_frame)
         
@@ -217,6 +229,63 @@ class MainWindow(QWidget):
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.addWidget(main_container)
     
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.shadows_applied:
+            self.shadows_applied = True
+            QTimer.singleShot(0, self.apply_shadows)
+            QTimer.singleShot(0, self.start_background_loading)
+    
+    def start_background_loading(self):
+        """Read the version and prefetch every question file off the GUI thread, then watch them for edits"""
+        self.version_task = run_async(get_version, on_done=self.set_version)
+        loader = get_loader()
+        if not loader.done:
+            loader.progress.connect(self.update_load_status)
+            loader.finished.connect(lambda: self.load_status_label.setText(""))
+            loader.finished.connect(get_watcher().start)
+            self.load_status_label.setText("Loading questions…")
+            loader.start()
+        else:
+            get_watcher().start()
+    
+    def set_version(self, version):
+        self.version = version
+        self.version_label.setText(f"Version {version}")
+        if instrument.enabled:
+            self.enable_profiling()
+
+    def enable_profiling(self):
+        """Ctrl+Shift+P starts a cProfile/tracemalloc capture of the GUI thread; pressing it again saves it"""
+        self.profile_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+        self.profile_shortcut.setContext(Qt.ApplicationShortcut)
+        self.profile_shortcut.activated.connect(self.toggle_capture)
+        if instrument.profile_on_start():
+            instrument.start_capture()
+
+    def toggle_capture(self):
+        if not instrument.capturing():
+            instrument.start_capture()
+            self.load_status_label.setText("Profiling… press Ctrl+Shift+P again to save")
+            return
+        paths = instrument.stop_capture()
+        self.load_status_label.setText("")
+        QMessageBox.information(self, "Profile Saved", "Saved:\n" + "\n".join(paths))
+    
+    def update_load_status(self, loaded, total):
+        self.load_status_label.setText(f"Loading questions… {loaded}/{total}")
+    
+    def apply_shadows(self):
+        """Add drop shadows once the menu has painted"""
+        for btn in self.menu_buttons:
+            btn.add_shadow()
+        if self.logo is not None:
+            logo_shadow = QGraphicsDropShadowEffect()
+            logo_shadow.setOffset(0, 2)
+            logo_shadow.setBlurRadius(10)
+            logo_shadow.setColor(QColor(0, 0, 0, 30))
+            self.logo.setGraphicsEffect(logo_shadow)
+    
     def apply_modern_styling(self):
         """Apply modern styling to the entire application"""
         self.setStyleSheet("""
@@ -258,6 +327,7 @@ class MainWindow(QWidget):
     
     def start_quiz(self):
         try:
+            from .quiz import QuizWindow
             self.quiz_window = QuizWindow(main_window=self)
             self.quiz_window.setAttribute(Qt.WA_DeleteOnClose)
             self.hide()
@@ -265,27 +335,32 @@ class MainWindow(QWidget):
         except Exception as e:
             print("Error launching QuizWindow:", e)
     
+    def show_stats(self):
+        try:
+            from .stats import StatsWindow
+            self.stats_window = StatsWindow(main_window=self)
+            self.stats_window.setAttribute(Qt.WA_DeleteOnClose)
+            self.hide()
+            self.stats_window.show()
+        except Exception as e:
+            print("Error launching StatsWindow:", e)
+    
+    def show_browser(self):
+        try:
+            from .browser import BrowserWindow
+            self.browser_window = BrowserWindow(main_window=self)
+            self.browser_window.setAttribute(Qt.WA_DeleteOnClose)
+            self.hide()
+            self.browser_window.show()
+        except Exception as e:
+            print("Error launching BrowserWindow:", e)
+    
     def start_oa(self):
-        msg = QMessageBox(self)
-        msg.setWindowTitle("Online Assessment")
-        msg.setText("Assessment mode is being prepared!")
-        msg.setInformativeText("This feature will simulate real interview conditions with timed questions and comprehensive scoring.")
-        msg.setIcon(QMessageBox.Information)
-        msg.setStyleSheet("""
-            QMessageBox {
-                background-color: white;
-                font-family: 'Segoe UI';
-            }
-            QMessageBox QPushButton {
-                background-color: #3498db;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                padding: 8px 20px;
-                font-weight: 500;
-            }
-            QMessageBox QPushButton:hover {
-                background-color: #5dade2;
-            }
-        """)
-        msg.exec_()
\ No newline at end of file
+        try:
+            from .oa import OAWindow
+            self.oa_window = OAWindow(main_window=self)
+            self.oa_window.setAttribute(Qt.WA_DeleteOnClose)
+            self.hide()
+            self.oa_window.show()
+        except Exception as e:
+            print("Error launching OAWindow:", e)
\ No newline at end of file
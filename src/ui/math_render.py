@@ -0,0 +1,199 @@
+"""Typeset formulas in question and answer text with matplotlib's mathtext.
+
+Only the formula fragments are rendered: words such as ``e^(-rT)``,
+``r_domestic``, ``√x`` or ``p̂`` (and anything inside ``\\(...\\)``) become
+PNG images inlined in the label's rich text, so the surrounding prose
+still wraps. Images are cached on disk under ``assets/.cache/math`` keyed
+by fragment and style, and the finished HTML of recent texts is kept in
+an LRU cache keyed by text and style (DPI, size, colour), so a text
+pre-rendered on a worker thread shows instantly. Without matplotlib texts
+are shown plain.
+"""
+import os
+import re
+import html
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join("assets", ".cache", "math")
+MAX_ENTRIES = 512
+# Bump when the conversion or rendering changes, so cached images are redrawn
+RENDER_VERSION = 1
+
+_EXPLICIT = re.compile(r"\\\((.+?)\\\)")
+_FORMULA = re.compile(r"[\^√̂]|[A-Za-z]_[A-Za-z0-9({]")
+_TOKEN = re.compile(r"(\\\(.+?\\\)|\s+)")
+_RUN = re.compile(r"[\w.]+")
+_TRAILING = ",.;:!?"
+SYMBOLS = {
+    "×": r"\times ", "·": r"\cdot ", "÷": r"\div ", "±": r"\pm ", "≈": r"\approx ", "≤": r"\leq ",
+    "≥": r"\geq ", "≠": r"\neq ", "∞": r"\infty ", "Σ": r"\Sigma ", "Δ": r"\Delta ", "σ": r"\sigma ",
+    "μ": r"\mu ", "π": r"\pi ", "$": r"\$", "%": r"\%", "#": r"\#", "&": r"\&",
+}
+
+
+def has_formula(text):
+    return bool(_FORMULA.search(text) or _EXPLICIT.search(text))
+
+
+def _argument(token, j):
+    """(argument text, index after it) for a ^, _ or √ at token[j - 1]"""
+    if j < len(token) and token[j] in "({":
+        close = ")" if token[j] == "(" else "}"
+        depth = 0
+        for k in range(j, len(token)):
+            if token[k] == token[j]:
+                depth += 1
+            elif token[k] == close:
+                depth -= 1
+                if not depth:
+                    return token[j + 1:k], k + 1
+        return token[j + 1:], len(token)
+    run = _RUN.match(token, j)
+    return (run.group(), run.end()) if run else ("", j)
+
+
+def to_mathtext(token):
+    """mathtext for one formula written the way the question files do (e^(-rT), r_f, √2, p̂)"""
+    out = []
+    i = 0
+    while i < len(token):
+        c = token[i]
+        if c in "^_√":
+            arg, i = _argument(token, i + 1)
+            inner = to_mathtext(arg)
+            if c == "√":
+                out.append(rf"\sqrt{{{inner}}}")
+            elif c == "_" and len(arg) > 1 and arg.isalpha():
+                out.append(rf"_{{\mathrm{{{arg}}}}}")
+            else:
+                out.append(f"{c}{{{inner}}}")
+        elif i + 1 < len(token) and token[i + 1] == "̂":
+            out.append(rf"\hat{{{c}}}")
+            i += 2
+        else:
+            out.append(SYMBOLS.get(c, c))
+            i += 1
+    return "".join(out)
+
+
+def _split_formula(word):
+    """(formula, trailing punctuation) so 'e^(rT),' renders 'e^(rT)' and keeps ',' as text"""
+    end = len(word)
+    while end and (word[end - 1] in _TRAILING
+                   or word[end - 1] in ")]" and word.count("(" if word[end - 1] == ")" else "[", 0, end)
+                   < word.count(word[end - 1], 0, end)):
+        end -= 1
+    return word[:end], word[end:]
+
+
+def _png_size(path):
+    with open(path, "rb") as f:
+        header = f.read(24)
+    return int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+
+
+class MathRenderer:
+    """Text to label HTML with formulas as images; safe to call from worker threads"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._html = OrderedDict()
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._available = None
+
+    @property
+    def available(self):
+        """Whether matplotlib is installed (checked without importing it)"""
+        if self._available is None:
+            self._available = importlib.util.find_spec("matplotlib") is not None
+        return self._available
+
+    def cached(self, text, style):
+        """HTML for text if it is ready, else None; style is (dpi, device pixel ratio, point size, colour)"""
+        key = (text, style)
+        with self._lock:
+            result = self._html.get(key)
+            if result is not None:
+                self._html.move_to_end(key)
+            return result
+
+    def render(self, text, style):
+        """HTML for text, rendering any formulas not yet on disk"""
+        result = self.cached(text, style)
+        if result is not None:
+            return result
+        parts = []
+        # Question files write line breaks as a literal \n
+        for piece in _TOKEN.split(text.replace("\\n", "\n")):
+            if not piece:
+                continue
+            explicit = _EXPLICIT.fullmatch(piece)
+            if explicit:
+                parts.append(self._image(explicit.group(1), style) or html.escape(explicit.group(1)))
+            elif not piece.isspace() and _FORMULA.search(piece) and self.available:
+                formula, rest = _split_formula(piece)
+                image = self._image(to_mathtext(formula), style)
+                parts.append((image or html.escape(formula)) + html.escape(rest))
+            else:
+                parts.append(html.escape(piece).replace("\n", "<br>"))
+        result = "".join(parts)
+        with self._lock:
+            self._html[(text, style)] = result
+            self._html.move_to_end((text, style))
+            while len(self._html) > self.max_entries:
+                self._html.popitem(last=False)
+        return result
+
+    def prerender(self, texts, style):
+        for text in texts:
+            if has_formula(text):
+                self.render(text, style)
+
+    def _image(self, source, style):
+        """<img> tag for one mathtext fragment, or None if it cannot be rendered"""
+        if not self.available:
+            return None
+        dpi, ratio, size, color = style
+        key = f"{RENDER_VERSION}|{source}|{dpi}|{size}|{color}".encode("utf-8")
+        path = os.path.abspath(os.path.join(self.cache_dir, hashlib.blake2b(key, digest_size=16).hexdigest() + ".png"))
+        if not os.path.exists(path):
+            try:
+                from matplotlib import mathtext
+                from matplotlib.font_manager import FontProperties
+            except ImportError:
+                self._available = False
+                return None
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                # mathtext shares parser state; one render at a time
+                with self._render_lock:
+                    mathtext.math_to_image(f"${source}$", tmp, prop=FontProperties(size=size), dpi=dpi,
+                                           format="png", color=color)
+                os.replace(tmp, path)
+            except (ValueError, OSError):
+                return None
+        width, height = _png_size(path)
+        return (f'<img src="{html.escape(path)}" width="{width / ratio:.0f}" height="{height / ratio:.0f}"'
+                f' align="middle">')
+
+
+def style_for(widget, color):
+    """Rendering style matching widget's font and screen"""
+    ratio = widget.devicePixelRatioF()
+    return (round(widget.logicalDpiY() * ratio), ratio, widget.font().pointSizeF(), color)
+
+
+_renderer = None
+
+
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = MathRenderer()
+    return _renderer
@@ -0,0 +1,373 @@
+import os
+import time
+from PyQt5.QtWidgets import (
+    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QMessageBox, QProgressBar
+)
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QTimer
+from ..Engine.oa_engine import SECONDS_PER_QUESTION, OAEngine
+from ..Engine.irt import get_item_parameters
+from ..Engine.attempt_log import get_attempt_log, new_session_id
+from ..Engine.stats import get_stats
+from ..Engine.session_log import OA, Checkpoint, checkpoint_path, load_session
+from ..Engine.instrument import traced
+from .pixmaps import scaled_pixmap
+from .watcher import get_watcher
+from .loader import get_loader, run_async
+
+DATA_DIR = os.path.join("data")
+LOGO_PATH = os.path.join("assets", "eigenprep.png")
+LENGTHS = (10, 15, 20)
+
+class OAWindow(QWidget):
+    """Timed adaptive assessment: each question is the most informative one for the current ability estimate"""
+
+    def __init__(self, main_window=None):
+        super().__init__()
+        self.setWindowTitle("EigenPrep Online Assessment")
+        self.setMinimumSize(800, 600)
+        self.setStyleSheet("background-color: white;")
+        self.main_window = main_window
+        self.engine = None
+        self.fit_task = None
+        self.current = None
+        self.session_id = None
+        self.checkpoint = None
+        self.saved_session = None
+        self.question_shown_at = 0.0
+        self.time_left = 0
+        self.active = False
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_timer)
+        self.init_ui()
+        self.apply_modern_styling()
+        get_watcher().bank_changed.connect(self.fill_categories)
+        self.prepare()
+
+    def init_ui(self):
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(50, 50, 50, 50)
+        self.layout.setSpacing(30)
+        self.launch_widget = QWidget()
+        launch_layout = QVBoxLayout(self.launch_widget)
+        launch_layout.setSpacing(20)
+        launch_layout.setContentsMargins(0, 0, 0, 0)
+
+        # Logo and title
+        logo_row = QHBoxLayout()
+        if os.path.exists(LOGO_PATH):
+            logo = QLabel()
+            logo.setPixmap(scaled_pixmap(LOGO_PATH, 90))
+            logo.setFixedSize(90, 90)
+            logo_row.addWidget(logo, alignment=Qt.AlignLeft | Qt.AlignTop)
+        title = QLabel("Online Assessment")
+        title.setFont(QFont("Segoe UI", 22, QFont.Bold))
+        title.setStyleSheet("color: #2c3e50;")
+        logo_row.addWidget(title, alignment=Qt.AlignVCenter)
+        logo_row.addStretch()
+        launch_layout.addLayout(logo_row)
+
+        description = QLabel(f"A timed assessment ({SECONDS_PER_QUESTION}s per question) that adapts to your answers. "
+                             "Each question is chosen to pin down your level as quickly as possible; "
+                             "no feedback is shown until the end.")
+        description.setFont(QFont("Segoe UI", 12))
+        description.setWordWrap(True)
+        description.setStyleSheet("color: #34495e;")
+        launch_layout.addWidget(description)
+
+        self.category_box = QComboBox()
+        self.category_box.setFont(QFont("Segoe UI", 13))
+        self.fill_categories()
+        launch_layout.addWidget(self.category_box)
+
+        self.length_box = QComboBox()
+        self.length_box.setFont(QFont("Segoe UI", 13))
+        for n in LENGTHS:
+            self.length_box.addItem(f"Up to {n} questions", n)
+        launch_layout.addWidget(self.length_box)
+
+        self.start_btn = QPushButton("Start Assessment")
+        self.start_btn.setFont(QFont("Segoe UI", 14, QFont.Medium))
+        self.start_btn.clicked.connect(self.start_assessment)
+        self.start_btn.setEnabled(False)
+        launch_layout.addWidget(self.start_btn)
+
+        # Offered when an assessment was closed (or the app crashed) before it finished
+        self.resume_btn = QPushButton("")
+        self.resume_btn.setFont(QFont("Segoe UI", 14, QFont.Medium))
+        self.resume_btn.clicked.connect(self.resume_assessment)
+        launch_layout.addWidget(self.resume_btn)
+        self.resume_btn.hide()
+
+        # Shown while the bank loads and question difficulties are estimated
+        self.loading_label = QLabel("Preparing assessment…")
+        self.loading_label.setFont(QFont("Segoe UI", 12))
+        self.loading_label.setStyleSheet("color: #7f8c8d;")
+        self.loading_bar = QProgressBar()
+        self.loading_bar.setRange(0, 0)
+        self.loading_bar.setTextVisible(False)
+        self.loading_bar.setFixedHeight(6)
+        launch_layout.addWidget(self.loading_label)
+        launch_layout.addWidget(self.loading_bar)
+
+        launch_layout.addStretch()
+        self.layout.addWidget(self.launch_widget)
+
+        # Assessment widget (hidden at first)
+        self.oa_widget = QWidget()
+        oa_layout = QVBoxLayout(self.oa_widget)
+        oa_layout.setSpacing(20)
+        oa_layout.setContentsMargins(0, 0, 0, 0)
+
+        timer_row = QHBoxLayout()
+        self.timer_label = QLabel("")
+        self.timer_label.setFont(QFont("Segoe UI", 13, QFont.Bold))
+        timer_row.addWidget(self.timer_label, alignment=Qt.AlignLeft)
+        timer_row.addStretch()
+        self.progress_label = QLabel("")
+        self.progress_label.setFont(QFont("Segoe UI", 13))
+        timer_row.addWidget(self.progress_label, alignment=Qt.AlignRight)
+        oa_layout.addLayout(timer_row)
+
+        self.question_label = QLabel("")
+        self.question_label.setFont(QFont("Segoe UI", 15))
+        self.question_label.setWordWrap(True)
+        self.question_label.setStyleSheet("color: #215bbb; margin-top: 20px; margin-bottom: 10px;")
+        oa_layout.addWidget(self.question_label)
+
+        self.answer_input = QLineEdit()
+        self.answer_input.setFont(QFont("Segoe UI", 13))
+        self.answer_input.setPlaceholderText("Type your answer here...")
+        self.answer_input.returnPressed.connect(self.submit_answer)
+        oa_layout.addWidget(self.answer_input)
+
+        nav_layout = QHBoxLayout()
+        self.submit_btn = QPushButton("Submit Answer")
+        self.submit_btn.setFont(QFont("Segoe UI", 12, QFont.Medium))
+        self.submit_btn.clicked.connect(self.submit_answer)
+        nav_layout.addWidget(self.submit_btn)
+
+        self.quit_btn = QPushButton("End Assessment")
+        self.quit_btn.setFont(QFont("Segoe UI", 12, QFont.Medium))
+        self.quit_btn.clicked.connect(self.close)
+        nav_layout.addWidget(self.quit_btn)
+        oa_layout.addLayout(nav_layout)
+        oa_layout.addStretch()
+
+        self.layout.addWidget(self.oa_widget)
+        self.oa_widget.hide()
+
+    def fill_categories(self, *args):
+        """(Re)list the question files, keeping the current choice if its file still exists"""
+        current = self.category_box.currentData()
+        self.category_box.clear()
+        self.category_box.addItem("All Categories", None)
+        for fname in os.listdir(DATA_DIR):
+            if fname.endswith(".csv"):
+                self.category_box.addItem(fname.replace(".csv", "").replace("-", " ").title(), fname)
+        index = self.category_box.findData(current) if current is not None else -1
+        if index > 0:
+            self.category_box.setCurrentIndex(index)
+
+    def apply_modern_styling(self):
+        self.setStyleSheet("""
+            QWidget { font-family: 'Segoe UI', Arial, sans-serif; background: white; }
+            QComboBox, QLineEdit {
+                border: 1.5px solid #215bbb;
+                border-radius: 8px;
+                padding: 8px 12px;
+                font-size: 15px;
+            }
+            QComboBox:focus, QLineEdit:focus {
+                border: 2px solid #215bbb;
+            }
+            QPushButton {
+                background: #215bbb;
+                color: white;
+                border: none;
+                border-radius: 12px;
+                padding: 12px 24px;
+                font-weight: 500;
+            }
+            QPushButton:hover {
+                background: #3570d1;
+            }
+            QPushButton:pressed {
+                background: #174080;
+            }
+            QPushButton:disabled {
+                background: #bdc3c7; color: #7f8c8d;
+            }
+        """)
+
+    def prepare(self):
+        """Wait for the whole bank, then fit item parameters off the GUI thread"""
+        loader = get_loader()
+        if loader.done:
+            self.fit_parameters()
+        else:
+            loader.finished.connect(self.fit_parameters)
+            loader.start()
+
+    def fit_parameters(self):
+        loader = get_loader()
+        try:
+            loader.finished.disconnect(self.fit_parameters)
+        except TypeError:
+            pass
+        get_attempt_log().flush()
+        self.fit_task = run_async(get_item_parameters, loader.bank,
+                                  on_done=self.on_parameters_ready, on_failed=self.on_parameters_failed)
+
+    def on_parameters_ready(self, params):
+        self.fit_task = None
+        self.engine = OAEngine(bank=get_loader().bank, params=params)
+        self.loading_label.hide()
+        self.loading_bar.hide()
+        self.start_btn.setEnabled(True)
+        self.offer_resume()
+
+    def on_parameters_failed(self, error):
+        self.fit_task = None
+        self.loading_label.setText(f"Could not prepare the assessment: {error}")
+        self.loading_bar.hide()
+
+    def start_assessment(self):
+        n = self.length_box.currentData()
+        source = self.category_box.currentData()
+        self.session_id = new_session_id()
+        self.engine.reset(self.session_id)
+        self.engine.start_adaptive(max_items=n, source=source)
+        self.time_left = n * SECONDS_PER_QUESTION
+        self.open_checkpoint(Checkpoint.create, checkpoint_path(OA), OA, self.session_id,
+                             meta={"source": source, "max_items": n}, clock=self.time_left)
+        self.begin()
+        self.next_question()
+
+    def open_checkpoint(self, opener, *args, **kwargs):
+        try:
+            self.checkpoint = opener(*args, **kwargs)
+        except OSError as e:
+            # The assessment still works, it just cannot be resumed
+            print("Could not write the assessment checkpoint:", e)
+            self.checkpoint = None
+
+    def begin(self):
+        self.saved_session = None
+        self.active = True
+        self.launch_widget.hide()
+        self.oa_widget.show()
+        self.timer_label.setText(self.format_time_left())
+        self.timer.start(1000)
+
+    def offer_resume(self):
+        """Show the resume button if an unfinished assessment was checkpointed"""
+        try:
+            state = load_session(checkpoint_path(OA))
+        except ValueError:
+            state = None
+        if state is None or state.clock <= 0:
+            return
+        self.saved_session = state
+        self.resume_btn.setText(f"Resume Assessment ({len(state.answers)} answered, "
+                                f"{int(state.clock) // 60}:{int(state.clock) % 60:02d} left)")
+        self.resume_btn.show()
+
+    def resume_assessment(self):
+        """Rebuild the saved assessment by replaying its answers, then carry on where it stopped"""
+        state = self.saved_session
+        if state is None:
+            return
+        answers = {index: correct for index, (correct, _) in state.answers.items()}
+        try:
+            pending = self.engine.resume_adaptive(state.question_ids, answers, state.meta.get("max_items", LENGTHS[0]),
+                                                  source=state.meta.get("source"))
+        except KeyError:
+            self.saved_session = None
+            self.resume_btn.hide()
+            QMessageBox.warning(self, "Resume Assessment", "The saved assessment's questions have been edited "
+                                                           "since, so it cannot be resumed.")
+            return
+        self.session_id = state.session_id
+        self.time_left = int(state.clock)
+        self.open_checkpoint(Checkpoint.reopen, checkpoint_path(OA), self.session_id)
+        self.begin()
+        if pending is None:
+            self.next_question()
+        else:
+            self.show_question(pending)
+
+    def format_time_left(self):
+        return f"Time left: {self.time_left // 60}:{self.time_left % 60:02d}"
+
+    def next_question(self):
+        question = self.engine.next_adaptive()
+        if question is None:
+            self.end_assessment()
+            return
+        if self.checkpoint is not None:
+            self.checkpoint.asked(question['id'], self.time_left)
+        self.show_question(question)
+
+    @traced("render.question")
+    def show_question(self, question):
+        self.current = question
+        asked = len(self.engine.adaptive.asked)
+        self.progress_label.setText(f"Question {asked} of up to {self.engine.adaptive.max_items}")
+        self.question_label.setText(self.current['question'])
+        self.answer_input.setText("")
+        self.answer_input.setFocus()
+        self.question_shown_at = time.monotonic()
+
+    def submit_answer(self):
+        if not self.active or self.current is None:
+            return
+        question_id = self.current['id']
+        correct = self.engine.submit_answer(question_id, self.answer_input.text())
+        get_stats()  # keeps the statistics aggregates listening to the log
+        get_attempt_log().append(question_id, correct, False, time.monotonic() - self.question_shown_at,
+                                 self.session_id)
+        if self.checkpoint is not None:
+            self.checkpoint.answered(len(self.engine.current_ids) - 1, question_id, correct, clock=self.time_left)
+        self.next_question()
+
+    def update_timer(self):
+        if not self.active:
+            return
+        self.time_left -= 1
+        self.timer_label.setText(self.format_time_left())
+        if self.time_left <= 0:
+            self.end_assessment()
+
+    def end_assessment(self):
+        if not self.active:
+            return
+        self.active = False
+        self.timer.stop()
+        if self.checkpoint is not None:
+            self.checkpoint.discard()
+            self.checkpoint = None
+        correct, answered = self.engine.score()
+        session = self.engine.adaptive
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Assessment Complete")
+        msg.setText("Assessment Complete!")
+        msg.setInformativeText(
+            f"Correct answers: {correct} / {answered}\n"
+            f"Estimated ability: {session.theta:+.2f} (± {session.standard_error:.2f})\n"
+            f"That is above roughly {session.percentile():.0%} of candidates.")
+        msg.setIcon(QMessageBox.Information)
+        msg.exec_()
+        self.close()
+
+    def closeEvent(self, event):
+        self.active = False
+        self.timer.stop()
+        if self.checkpoint is not None:
+            # Unfinished: keep the checkpoint so the assessment can be resumed with the time that was left
+            self.checkpoint.paused(self.time_left)
+            self.checkpoint.close()
+            self.checkpoint = None
+        if self.main_window is not None:
+            self.main_window.show()
+        super().closeEvent(event)
@@ -0,0 +1,26 @@
+import os
+from PyQt5.QtGui import QPixmap, QPixmapCache
+from PyQt5.QtCore import Qt
+
+CACHE_DIR = os.path.join("assets", ".cache")
+
+def scaled_pixmap(path, size):
+    """Image at path scaled to fit size x size, cached in memory and as a pre-scaled PNG"""
+    key = f"{path}@{size}"
+    pixmap = QPixmapCache.find(key)
+    if pixmap is not None:
+        return pixmap
+    name = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(CACHE_DIR, f"{name}@{size}.png")
+    pixmap = QPixmap()
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(path):
+        pixmap.load(cached)
+    if pixmap.isNull():
+        pixmap = QPixmap(path).scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            pixmap.save(cached, "PNG")
+        except OSError:
+            pass
+    QPixmapCache.insert(key, pixmap)
+    return pixmap
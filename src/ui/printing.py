@@ -0,0 +1,88 @@
+"""Printable PDFs of generated mock OA papers (see Engine/papers.py).
+
+Each paper starts on a new page, followed by its answer key on a page of
+its own so the keys can be pulled before printing. Papers are laid out one
+at a time with a single QTextDocument, so memory does not grow with the
+number of papers. Works without a display: when no Qt application is
+running one is created on the offscreen platform.
+"""
+import os
+import html
+from PyQt5.QtCore import QMarginsF, QRectF, QSizeF
+from PyQt5.QtGui import QFont, QGuiApplication, QPageLayout, QPageSize, QPainter, QPdfWriter, QTextDocument
+
+MARGIN_MM = 18
+FONT_SIZE = 11
+
+_app = None
+
+
+def _application():
+    global _app
+    if QGuiApplication.instance() is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        _app = QGuiApplication([])
+    return QGuiApplication.instance()
+
+
+def _text(value):
+    return html.escape(value).replace("\n", "<br>")
+
+
+def paper_html(number, paper, title, seed):
+    items = "".join(f"<li><p><small>{_text(q['category'])}</small><br>{_text(q['question'])}</p>"
+                    f"<p>&nbsp;</p></li>" for q in paper)
+    return (f"<h2>{_text(title)} &mdash; Paper {number}</h2>"
+            f"<p><small>Seed {seed} &middot; {len(paper)} questions</small></p>"
+            f"<p>Name: ______________________________</p><ol>{items}</ol>")
+
+
+def answers_html(number, paper, title):
+    items = "".join(f"<li><p>{_text(q['answer'])} <small>({q['id']})</small></p></li>" for q in paper)
+    return f"<h3>{_text(title)} &mdash; Paper {number}: answers</h3><ol>{items}</ol>"
+
+
+class _Pages:
+    """Paints documents onto a PDF, each from a new page"""
+
+    def __init__(self, path, title):
+        self.writer = QPdfWriter(path)
+        self.writer.setTitle(title)
+        self.writer.setPageSize(QPageSize(QPageSize.A4))
+        self.writer.setPageMargins(QMarginsF(MARGIN_MM, MARGIN_MM, MARGIN_MM, MARGIN_MM), QPageLayout.Millimeter)
+        self.painter = QPainter(self.writer)
+        self.document = QTextDocument()
+        # Lay text out in the PDF's own resolution so fonts keep their point size
+        self.document.documentLayout().setPaintDevice(self.writer)
+        self.document.setDefaultFont(QFont(self.document.defaultFont().family(), FONT_SIZE))
+        self.size = QSizeF(self.writer.width(), self.writer.height())
+        self.document.setPageSize(self.size)
+        self.empty = True
+
+    def add(self, text):
+        self.document.setHtml(text)
+        height = self.size.height()
+        for page in range(self.document.pageCount()):
+            if not self.empty:
+                self.writer.newPage()
+            self.empty = False
+            self.painter.save()
+            self.painter.translate(0, -page * height)
+            self.document.drawContents(self.painter, QRectF(0, page * height, self.size.width(), height))
+            self.painter.restore()
+
+    def close(self):
+        self.painter.end()
+
+
+def write_pdf(papers, path, answers=True, title="Mock OA"):
+    """One PDF of every paper (and its answer key unless answers is False)"""
+    _application()
+    pages = _Pages(path, title)
+    try:
+        for i, paper in enumerate(papers):
+            pages.add(paper_html(i + 1, paper, title, papers.seed))
+            if answers:
+                pages.add(answers_html(i + 1, paper, title))
+    finally:
+        pages.close()
@@ -1,14 +1,42 @@
 import os
-import random
-import pandas as pd
+import html
+import time
+from functools import partial
 from PyQt5.QtWidgets import (
-    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QMessageBox, QFrame, QSpacerItem, QSizePolicy
+    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QMessageBox, QFrame, QSpacerItem, QSizePolicy,
+    QProgressBar, QListWidget, QListWidgetItem
 )
-from PyQt5.QtGui import QFont, QPixmap
+from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, QTimer
+from ..Engine.scheduler import get_selector
+from ..Engine.attempt_log import get_attempt_log, new_session_id
+from ..Engine.stats import get_stats
+from ..Engine.search import get_search_index
+from ..Engine.generator import (CATEGORY as GENERATED_CATEGORY, DIFFICULTIES, SOURCE_PREFIX, QuestionGenerator,
+                                difficulty_of, generated_table)
+from ..Engine.session_log import QUIZ, Checkpoint, checkpoint_path, load_session
+from ..Engine.instrument import traced
+from .pixmaps import scaled_pixmap
+from .watcher import get_watcher
+from .loader import get_loader, run_async
+from .math_render import get_renderer, has_formula, style_for
 
 DATA_DIR = os.path.join("data")
+SEARCH_DELAY_MS = 150
+SEARCH_LIMIT = 20
+SELECTION_MODES = (("Random questions", "random"), ("Spaced repetition (due questions first)", "spaced"))
 LOGO_PATH = os.path.join("assets", "eigenprep.png")
+QUESTION_COLOR = "#215bbb"
+FEEDBACK_COLOR = "#16a085"
+# Questions ahead of the current one whose formulas are rendered in the background
+PRERENDER_AHEAD = 2
+
+
+def located(bank, rows):
+    """(records, checks) of bank rows; each check holds its row's table, so it still grades after a reload"""
+    pairs = [bank.locate(row) for row in rows]
+    return [table.record(i) for table, i in pairs], [partial(table.check, i) for table, i in pairs]
+
 
 class QuizWindow(QWidget):
     def __init__(self, main_window=None):
@@ -17,16 +45,30 @@ class QuizWindow(QWidget):
         self.setMinimumSize(800, 600)
         self.setStyleSheet("background-color: white;")
         self.main_window = main_window
-        self.questions = None
+        self.sampler = None
+        self.samplers = {}
+        self.waiting_for = None
+        self.waiting_then = None
+        self.saved_session = None
+        self.checkpoint = None
         self.quiz_questions = []
+        self.quiz_checks = []
         self.current_question_idx = 0
         self.score = 0
         self.timer = QTimer(self)
         self.time_elapsed = 0
         self.quiz_active = False
         self.was_overridden = False
+        self.session_id = None
+        self.question_shown_at = 0.0
+        self.pending_attempt = None
+        self.awaiting_render = {}
+        # Render tasks still running; each removes itself when it reports back
+        self.render_tasks = set()
         self.init_ui()
         self.apply_modern_styling()
+        get_watcher().bank_changed.connect(self.fill_categories)
+        self.offer_resume()
 
     def init_ui(self):
         self.layout = QVBoxLayout(self)
@@ -40,9 +82,8 @@ class QuizWindow(QWidget):
         # Logo and title
         logo_row = QHBoxLayout()
         if os.path.exists(LOGO_PATH):
-            pixmap = QPixmap(LOGO_PATH).scaled(90, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             logo = QLabel()
-            logo.setPixmap(pixmap)
+            logo.setPixmap(scaled_pixmap(LOGO_PATH, 90))
             logo.setFixedSize(90, 90)
             logo_row.addWidget(logo, alignment=Qt.AlignLeft | Qt.AlignTop)
         else:
@@ -55,18 +96,58 @@ class QuizWindow(QWidget):
         # Category selection
         self.category_box = QComboBox()
         self.category_box.setFont(QFont("Segoe UI", 13))
-        self.category_box.addItem("Select Category...")
-        for fname in os.listdir(DATA_DIR):
-            if fname.endswith(".csv"):
-                self.category_box.addItem(fname.replace(".csv", "").replace("-", " ").title(), fname)
+        self.fill_categories()
         launch_layout.addWidget(self.category_box)
 
+        # Question selection strategy
+        self.mode_box = QComboBox()
+        self.mode_box.setFont(QFont("Segoe UI", 13))
+        for label, mode in SELECTION_MODES:
+            self.mode_box.addItem(label, mode)
+        launch_layout.addWidget(self.mode_box)
+
         # Start button
         self.start_btn = QPushButton("Start Quiz")
         self.start_btn.setFont(QFont("Segoe UI", 14, QFont.Medium))
         self.start_btn.clicked.connect(self.start_quiz)
         launch_layout.addWidget(self.start_btn)
 
+        # Offered when a quiz was closed (or the app crashed) before its last question
+        self.resume_btn = QPushButton("")
+        self.resume_btn.setFont(QFont("Segoe UI", 14, QFont.Medium))
+        self.resume_btn.clicked.connect(self.resume_quiz)
+        launch_layout.addWidget(self.resume_btn)
+        self.resume_btn.hide()
+
+        # Shown while the chosen category is still loading in the background
+        self.loading_label = QLabel("")
+        self.loading_label.setFont(QFont("Segoe UI", 12))
+        self.loading_label.setStyleSheet("color: #7f8c8d;")
+        self.loading_bar = QProgressBar()
+        self.loading_bar.setRange(0, 0)
+        self.loading_bar.setTextVisible(False)
+        self.loading_bar.setFixedHeight(6)
+        launch_layout.addWidget(self.loading_label)
+        launch_layout.addWidget(self.loading_bar)
+        self.loading_label.hide()
+        self.loading_bar.hide()
+
+        # Search over every loaded question; activating a result practises that question
+        self.search_input = QLineEdit()
+        self.search_input.setFont(QFont("Segoe UI", 13))
+        self.search_input.setPlaceholderText("Search questions and answers...")
+        self.search_input.textChanged.connect(self.schedule_search)
+        launch_layout.addWidget(self.search_input)
+        self.search_results = QListWidget()
+        self.search_results.setFont(QFont("Segoe UI", 12))
+        self.search_results.setMaximumHeight(220)
+        self.search_results.itemActivated.connect(self.practice_result)
+        launch_layout.addWidget(self.search_results)
+        self.search_results.hide()
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+
         launch_layout.addStretch()
         self.layout.addWidget(self.launch_widget)
 
@@ -91,7 +172,7 @@ class QuizWindow(QWidget):
         self.question_label = QLabel("")
         self.question_label.setFont(QFont("Segoe UI", 15))
         self.question_label.setWordWrap(True)
-        self.question_label.setStyleSheet("color: #215bbb; margin-top: 20px; margin-bottom: 10px;")
+        self.question_label.setStyleSheet(f"color: {QUESTION_COLOR}; margin-top: 20px; margin-bottom: 10px;")
         quiz_layout.addWidget(self.question_label)
 
         # Answer input
@@ -103,7 +184,7 @@ class QuizWindow(QWidget):
         # Feedback label
         self.feedback_label = QLabel("")
         self.feedback_label.setFont(QFont("Segoe UI", 12))
-        self.feedback_label.setStyleSheet("color: #16a085; margin-top: 10px;")
+        self.feedback_label.setStyleSheet(f"color: {FEEDBACK_COLOR}; margin-top: 10px;")
         quiz_layout.addWidget(self.feedback_label)
 
         # Navigation buttons
@@ -138,6 +219,20 @@ class QuizWindow(QWidget):
         # Connect timer
         self.timer.timeout.connect(self.update_timer)
 
+    def fill_categories(self, *args):
+        """(Re)list the question files, keeping the current choice if its file still exists"""
+        current = self.category_box.currentData()
+        self.category_box.clear()
+        self.category_box.addItem("Select Category...")
+        for fname in os.listdir(DATA_DIR):
+            if fname.endswith(".csv"):
+                self.category_box.addItem(fname.replace(".csv", "").replace("-", " ").title(), fname)
+        for difficulty in DIFFICULTIES:
+            self.category_box.addItem(f"Fast Math (Generated, {difficulty.title()})", SOURCE_PREFIX + difficulty)
+        index = self.category_box.findData(current) if current is not None else -1
+        if index > 0:
+            self.category_box.setCurrentIndex(index)
+
     def apply_modern_styling(self):
         self.setStyleSheet("""
             QWidget { font-family: 'Segoe UI', Arial, sans-serif; background: white; }
@@ -175,51 +270,268 @@ class QuizWindow(QWidget):
             QMessageBox.warning(self, "Select Category", "Please select a question category to begin.")
             return
         fname = self.category_box.itemData(idx)
-        csv_path = os.path.join(DATA_DIR, fname)
+        difficulty = difficulty_of(fname)
+        # The session ID seeds the draws, so the quiz can be regenerated from it
+        session_id = new_session_id()
+        if difficulty is not None:
+            # Generated questions need no loading and never run out
+            picked = QuestionGenerator(difficulty, session_id).take_many(5)
+            questions = [table.record(i) for table, i in picked]
+            # Generated questions are in no file, so the checkpoint keeps their text
+            meta = {"source": fname, "questions": [[q['question'], q['answer']] for q in questions]}
+            self.begin_quiz(questions, [partial(table.check, i) for table, i in picked], meta, session_id=session_id)
+            return
+        loader = get_loader()
+        if not loader.is_loaded(fname) and not loader.done:
+            self.wait_for_source(loader, fname)
+            return
         try:
-            questions = pd.read_csv(csv_path)
-            if questions.empty:
+            bank = loader.bank
+            mode = self.mode_box.currentData()
+            if mode not in self.samplers:
+                self.samplers[mode] = get_selector(mode, bank)
+            self.sampler = self.samplers[mode]
+            # Select 5 questions with the chosen strategy
+            self.sampler.reset(session_id)
+            picked = self.sampler.draw_many(5, source=fname)
+            if not picked:
                 raise Exception("No questions found in this category.")
-            # Randomly select 5 questions
-            if len(questions) < 5:
-                self.quiz_questions = questions.sample(len(questions)).reset_index(drop=True)
-            else:
-                self.quiz_questions = questions.sample(5).reset_index(drop=True)
-            self.current_question_idx = 0
-            self.score = 0
-            self.time_elapsed = 0
-            self.quiz_active = True
-            self.launch_widget.hide()
-            self.quiz_widget.show()
-            self.show_question()
-            self.timer_label.setText(f"Time: {self.time_elapsed}s")
-            self.progress_label.setText(f"Question 1 of {len(self.quiz_questions)}")
-            self.timer.start(1000)
+            self.begin_quiz(*located(bank, picked), {"source": fname, "mode": mode}, session_id=session_id)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not load questions: {e}")
 
+    def begin_quiz(self, questions, checks, meta=None, resume=None, session_id=None):
+        # checks[i](answer) grades questions[i]; bank rows stay valid even if their file is reloaded mid-quiz
+        self.quiz_questions = questions
+        self.quiz_checks = checks
+        path = checkpoint_path(QUIZ)
+        try:
+            if resume is None:
+                self.session_id = new_session_id() if session_id is None else session_id
+                self.current_question_idx = 0
+                self.score = 0
+                self.time_elapsed = 0
+                self.checkpoint = Checkpoint.create(path, QUIZ, self.session_id, [q['id'] for q in questions], meta)
+            else:
+                self.session_id = resume.session_id
+                self.current_question_idx = resume.next_index()
+                self.score = resume.score
+                self.time_elapsed = int(resume.clock)
+                self.checkpoint = Checkpoint.reopen(path, self.session_id)
+        except OSError as e:
+            # The quiz still works, it just cannot be resumed
+            print("Could not write the quiz checkpoint:", e)
+            self.checkpoint = None
+        self.saved_session = None
+        self.resume_btn.hide()
+        self.quiz_active = True
+        self.launch_widget.hide()
+        self.quiz_widget.show()
+        self.show_question()
+        self.timer_label.setText(f"Time: {self.time_elapsed}s")
+        self.timer.start(1000)
+
+    def offer_resume(self):
+        """Show the resume button if an unfinished quiz was checkpointed"""
+        try:
+            state = load_session(checkpoint_path(QUIZ))
+        except ValueError:
+            state = None
+        if state is None or state.next_index() >= len(state.question_ids):
+            return
+        self.saved_session = state
+        self.resume_btn.setText(f"Resume Quiz (question {state.next_index() + 1} of {len(state.question_ids)}, "
+                                f"{int(state.clock)}s)")
+        self.resume_btn.show()
+
+    def resume_quiz(self):
+        state = self.saved_session
+        if state is None:
+            return
+        source = state.meta.get("source")
+        difficulty = difficulty_of(source) if source else None
+        if difficulty is not None:
+            table = generated_table(difficulty, *(list(c) for c in zip(*state.meta["questions"])))
+            questions = [table.record(i) for i in range(len(table))]
+            self.begin_quiz(questions, [partial(table.check, i) for i in range(len(table))], resume=state)
+            return
+        loader = get_loader()
+        loading = source and not loader.is_loaded(source) and os.path.exists(os.path.join(DATA_DIR, source))
+        if loading and not loader.done:
+            self.wait_for_source(loader, source, self.resume_quiz)
+            return
+        bank = loader.bank
+        rows = [bank.row_of(qid) for qid in state.question_ids]
+        if None in rows:
+            self.saved_session = None
+            self.resume_btn.hide()
+            QMessageBox.warning(self, "Resume Quiz", "The saved quiz's questions have been edited since, "
+                                                     "so it cannot be resumed.")
+            return
+        self.begin_quiz(*located(bank, rows), resume=state)
+
+    def schedule_search(self):
+        self.search_timer.start(SEARCH_DELAY_MS)
+
+    @traced("render.search")
+    def run_search(self):
+        query = self.search_input.text()
+        self.search_results.clear()
+        loader = get_loader()
+        if not query.strip() or not loader.started:
+            self.search_results.hide()
+            return
+        bank = loader.bank
+        index = get_search_index(bank)
+        for row, _ in index.search(query, SEARCH_LIMIT):
+            question = bank.record(row)
+            text = question['question'] if len(question['question']) <= 100 else question['question'][:97] + "..."
+            item = QListWidgetItem(f"{question['category']}: {text}")
+            item.setData(Qt.UserRole, question['id'])
+            self.search_results.addItem(item)
+        if not index.complete:
+            item = QListWidgetItem("Still indexing questions, results may be incomplete...")
+            item.setFlags(Qt.NoItemFlags)
+            self.search_results.addItem(item)
+        elif not self.search_results.count():
+            item = QListWidgetItem("No matching questions.")
+            item.setFlags(Qt.NoItemFlags)
+            self.search_results.addItem(item)
+        self.search_results.show()
+
+    def practice_result(self, item):
+        question_id = item.data(Qt.UserRole)
+        if question_id is None:
+            return
+        bank = get_loader().bank
+        row = bank.row_of(question_id)
+        if row is not None:
+            self.begin_quiz(*located(bank, [row]), {"source": bank.source(row)})
+
+    def wait_for_source(self, loader, fname, then=None):
+        """Show a loading state until the background loader has fname, then call then (default: start_quiz)"""
+        if self.waiting_for is None:
+            loader.source_loaded.connect(self.on_source_loaded)
+            loader.source_failed.connect(self.on_source_failed)
+        self.waiting_for = fname
+        self.waiting_then = then or self.start_quiz
+        self.start_btn.setEnabled(False)
+        self.resume_btn.setEnabled(False)
+        self.category_box.setEnabled(False)
+        self.mode_box.setEnabled(False)
+        self.loading_label.setText(f"Loading {self.category_box.itemText(self.category_box.findData(fname))} "
+                                   "questions…")
+        self.loading_label.show()
+        self.loading_bar.show()
+        loader.start()
+
+    def stop_waiting(self):
+        loader = get_loader()
+        loader.source_loaded.disconnect(self.on_source_loaded)
+        loader.source_failed.disconnect(self.on_source_failed)
+        self.waiting_for = None
+        self.start_btn.setEnabled(True)
+        self.resume_btn.setEnabled(True)
+        self.category_box.setEnabled(True)
+        self.mode_box.setEnabled(True)
+        self.loading_label.hide()
+        self.loading_bar.hide()
+
+    def on_source_loaded(self, fname):
+        if fname == self.waiting_for:
+            then = self.waiting_then
+            self.stop_waiting()
+            then()
+
+    def on_source_failed(self, fname, error):
+        if fname == self.waiting_for:
+            self.stop_waiting()
+            QMessageBox.critical(self, "Error", f"Could not load questions: {error}")
+
+    @traced("render.question")
     def show_question(self):
-        q = self.quiz_questions.iloc[self.current_question_idx]
-        self.question_label.setText(q['question'])
+        q = self.quiz_questions[self.current_question_idx]
+        self.set_math_text(self.question_label, q['question'], QUESTION_COLOR)
         self.answer_input.setText("")
         self.answer_input.setEnabled(True)
         self.submit_btn.setEnabled(True)
         self.next_btn.setEnabled(False)
         self.override_btn.setEnabled(False)
         self.was_overridden = False
-        self.feedback_label.setText("")
+        self.set_math_text(self.feedback_label, "", FEEDBACK_COLOR)
+        self.prerender_ahead()
+        self.question_shown_at = time.monotonic()
         self.progress_label.setText(f"Question {self.current_question_idx+1} of {len(self.quiz_questions)}")
 
+    def set_math_text(self, label, text, color, prefix=""):
+        """Show prefix + text with any formulas in text typeset, without waiting on rendering"""
+        self.awaiting_render.pop(label, None)
+        renderer = get_renderer()
+        rendered = renderer.cached(text, style_for(label, color)) if has_formula(text) else None
+        if rendered is not None:
+            label.setTextFormat(Qt.RichText)
+            label.setText(html.escape(prefix) + rendered)
+            return
+        label.setTextFormat(Qt.PlainText)
+        label.setText(prefix + text)
+        if has_formula(text) and renderer.available:
+            # Not pre-rendered yet: swap the typeset version in when it is ready
+            self.awaiting_render[label] = (text, prefix)
+            self.render_async(self.render_math, text, style_for(label, color), on_done=self.on_math_rendered)
+
+    def render_async(self, fn, *args, on_done=None):
+        """run_async() for rendering work, holding the task only until it finishes or fails"""
+        task = None
+
+        def release(_):
+            self.render_tasks.discard(task)
+
+        def done(result):
+            release(result)
+            if on_done is not None:
+                on_done(result)
+        task = run_async(fn, *args, on_done=done, on_failed=release)
+        self.render_tasks.add(task)
+
+    @staticmethod
+    def render_math(text, style):
+        return text, get_renderer().render(text, style)
+
+    def on_math_rendered(self, result):
+        text, rendered = result
+        for label, (awaited, prefix) in list(self.awaiting_render.items()):
+            if awaited == text:
+                del self.awaiting_render[label]
+                label.setTextFormat(Qt.RichText)
+                label.setText(html.escape(prefix) + rendered)
+
+    def prerender_ahead(self):
+        """Render the formulas of the next few questions and answers on a worker thread"""
+        upcoming = self.quiz_questions[self.current_question_idx + 1:self.current_question_idx + 1 + PRERENDER_AHEAD]
+        renderer = get_renderer()
+        if not renderer.available:
+            return
+        questions = [q['question'] for q in upcoming if has_formula(q['question'])]
+        # The current answer too, for the feedback shown after submitting
+        answers = [q['answer'] for q in self.quiz_questions[self.current_question_idx:][:PRERENDER_AHEAD + 1]
+                   if has_formula(q['answer'])]
+        if questions:
+            self.render_async(renderer.prerender, questions, style_for(self.question_label, QUESTION_COLOR))
+        if answers:
+            self.render_async(renderer.prerender, answers, style_for(self.feedback_label, FEEDBACK_COLOR))
+
+    @traced("grade.answer")
     def check_answer(self):
-        q = self.quiz_questions.iloc[self.current_question_idx]
-        user_answer = self.answer_input.text().strip().lower()
-        correct_answer = str(q['answer']).strip().lower()
-        if user_answer == correct_answer:
-            self.feedback_label.setText("✅ Correct!")
+        q = self.quiz_questions[self.current_question_idx]
+        correct = self.quiz_checks[self.current_question_idx](self.answer_input.text())
+        self.pending_attempt = (q['id'], correct, time.monotonic() - self.question_shown_at,
+                                q['category'] == GENERATED_CATEGORY)
+        if correct:
+            self.set_math_text(self.feedback_label, "", FEEDBACK_COLOR, "✅ Correct!")
             self.score += 1
             self.override_btn.setEnabled(False)
         else:
-            self.feedback_label.setText(f"❌ Incorrect. Correct answer: {q['answer']}")
+            self.set_math_text(self.feedback_label, q['answer'], FEEDBACK_COLOR, "❌ Incorrect. Correct answer: ")
             self.override_btn.setEnabled(True)
         self.submit_btn.setEnabled(False)
         self.next_btn.setEnabled(True)
@@ -228,11 +540,26 @@ class QuizWindow(QWidget):
     def override_correct(self):
         if not self.was_overridden:
             self.score += 1
-            self.feedback_label.setText(self.feedback_label.text() + "\n✔️ Marked correct by override.")
+            self.awaiting_render.pop(self.feedback_label, None)
+            rich = self.feedback_label.textFormat() == Qt.RichText
+            self.feedback_label.setText(self.feedback_label.text() + ("<br>" if rich else "\n")
+                                        + "✔️ Marked correct by override.")
             self.override_btn.setEnabled(False)
             self.was_overridden = True
 
+    def log_attempt(self):
+        # Logged when leaving a question so a later override is included
+        if self.pending_attempt is not None:
+            question_id, correct, latency, generated = self.pending_attempt
+            get_stats()  # keeps the statistics aggregates listening to the log
+            get_attempt_log().append(question_id, correct, self.was_overridden, latency, self.session_id, generated)
+            if self.checkpoint is not None:
+                self.checkpoint.answered(self.current_question_idx, question_id, correct, self.was_overridden,
+                                         self.time_elapsed)
+            self.pending_attempt = None
+
     def next_question(self):
+        self.log_attempt()
         if self.current_question_idx + 1 < len(self.quiz_questions):
             self.current_question_idx += 1
             self.show_question()
@@ -248,6 +575,9 @@ class QuizWindow(QWidget):
     def end_quiz(self):
         self.quiz_active = False
         self.timer.stop()
+        if self.checkpoint is not None:
+            self.checkpoint.discard()
+            self.checkpoint = None
         msg = QMessageBox(self)
         msg.setWindowTitle("Quiz Complete")
         msg.setText("Quiz Complete!")
@@ -257,6 +587,12 @@ class QuizWindow(QWidget):
         self.close()
 
     def closeEvent(self, event):
+        self.log_attempt()
+        if self.checkpoint is not None:
+            # Unfinished: keep the checkpoint so the quiz can be resumed where it stopped
+            self.checkpoint.paused(self.time_elapsed)
+            self.checkpoint.close()
+            self.checkpoint = None
         if self.main_window is not None:
             self.main_window.show()
         super().closeEvent(event) 
\ No newline at end of file
@@ -0,0 +1,126 @@
+import os
+import math
+from PyQt5.QtWidgets import (
+    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView,
+    QAbstractItemView
+)
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt
+from ..Engine.stats import get_stats
+from ..Engine.instrument import traced
+from .pixmaps import scaled_pixmap
+
+LOGO_PATH = os.path.join("assets", "eigenprep.png")
+COLUMNS = ("Category", "Attempts", "Accuracy", "Mean Time", "Median Time", "90th Pct. Time", "Overrides")
+
+def format_rate(value):
+    return "–" if math.isnan(value) else f"{value:.0%}"
+
+def format_seconds(value):
+    return "–" if math.isnan(value) else f"{value:.1f}s"
+
+class StatsWindow(QWidget):
+    """Per-category progress, read from the running statistics aggregates"""
+
+    def __init__(self, main_window=None):
+        super().__init__()
+        self.setWindowTitle("EigenPrep Statistics")
+        self.setMinimumSize(800, 600)
+        self.main_window = main_window
+        self.init_ui()
+        self.apply_modern_styling()
+        self.refresh()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(50, 50, 50, 50)
+        layout.setSpacing(20)
+
+        # Logo and title
+        header = QHBoxLayout()
+        if os.path.exists(LOGO_PATH):
+            logo = QLabel()
+            logo.setPixmap(scaled_pixmap(LOGO_PATH, 90))
+            logo.setFixedSize(90, 90)
+            header.addWidget(logo, alignment=Qt.AlignLeft | Qt.AlignTop)
+        title = QLabel("Your Statistics")
+        title.setFont(QFont("Segoe UI", 22, QFont.Bold))
+        title.setStyleSheet("color: #2c3e50;")
+        header.addWidget(title, alignment=Qt.AlignVCenter)
+        header.addStretch()
+        layout.addLayout(header)
+
+        self.summary_label = QLabel("")
+        self.summary_label.setFont(QFont("Segoe UI", 13))
+        self.summary_label.setStyleSheet("color: #34495e;")
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setFont(QFont("Segoe UI", 12))
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        close_btn = QPushButton("Back to Menu")
+        close_btn.setFont(QFont("Segoe UI", 12, QFont.Medium))
+        close_btn.clicked.connect(self.close)
+        layout.addWidget(close_btn, alignment=Qt.AlignRight)
+
+    def apply_modern_styling(self):
+        self.setStyleSheet("""
+            QWidget { font-family: 'Segoe UI', Arial, sans-serif; background: white; }
+            QTableWidget {
+                border: 1.5px solid #215bbb;
+                border-radius: 8px;
+                gridline-color: #ecf0f1;
+            }
+            QHeaderView::section {
+                background: #f5f7fa;
+                color: #2c3e50;
+                border: none;
+                padding: 8px;
+                font-weight: 600;
+            }
+            QPushButton {
+                background: #215bbb;
+                color: white;
+                border: none;
+                border-radius: 12px;
+                padding: 12px 24px;
+                font-weight: 500;
+            }
+            QPushButton:hover {
+                background: #3570d1;
+            }
+            QPushButton:pressed {
+                background: #174080;
+            }
+        """)
+
+    @traced("render.stats")
+    def refresh(self):
+        rows = get_stats().summary()
+        attempts = sum(stats.attempts for _, stats in rows)
+        correct = sum(stats.correct for _, stats in rows)
+        if attempts:
+            self.summary_label.setText(f"{attempts} questions answered, {correct / attempts:.0%} correct")
+        else:
+            self.summary_label.setText("No answers recorded yet. Take a quiz to start tracking your progress.")
+        self.table.setRowCount(len(rows))
+        for r, (category, stats) in enumerate(rows):
+            values = (category, str(stats.attempts), format_rate(stats.accuracy), format_seconds(stats.mean_time),
+                      format_seconds(stats.times.quantile(0.5)), format_seconds(stats.times.quantile(0.9)),
+                      format_rate(stats.override_rate))
+            for c, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if c:
+                    item.setTextAlignment(Qt.AlignCenter)
+                self.table.setItem(r, c, item)
+
+    def closeEvent(self, event):
+        if self.main_window is not None:
+            self.main_window.show()
+        super().closeEvent(event)
@@ -0,0 +1,98 @@
+import os
+from functools import partial
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from .loader import get_loader, run_async
+
+# Editors often save in several steps (truncate, write, rename); wait for the file to settle
+SETTLE_MS = 300
+
+class DataWatcher(QObject):
+    """Reloads question files in the data directory as they are edited, added or removed.
+
+    Only the affected file is reparsed (through its binary cache) and
+    swapped into the shared bank; the search index then reindexes just that
+    file. bank_changed is emitted on the GUI thread afterwards.
+    """
+    bank_changed = pyqtSignal(str)
+    source_failed = pyqtSignal(str, str)
+
+    def __init__(self, data_dir=None):
+        super().__init__()
+        self.data_dir = data_dir
+        self.watcher = QFileSystemWatcher(self)
+        self.timers = {}
+        self.tasks = {}
+        self.watcher.fileChanged.connect(self.schedule_reload)
+        self.watcher.directoryChanged.connect(self.scan_directory)
+
+    def start(self):
+        """Begin watching; call once the initial load has finished"""
+        from ..Engine.question_bank import DATA_DIR, csv_paths
+        if self.data_dir is None:
+            self.data_dir = get_loader().data_dir or DATA_DIR
+        if os.path.isdir(self.data_dir):
+            self.watcher.addPath(self.data_dir)
+        paths = csv_paths(self.data_dir)
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def scan_directory(self, *args):
+        from ..Engine.question_bank import csv_paths
+        bank = get_loader().bank
+        present = {os.path.basename(p): p for p in csv_paths(self.data_dir)}
+        watched = set(self.watcher.files())
+        for source, path in present.items():
+            if path not in watched:
+                self.watcher.addPath(path)
+            if source not in bank.by_source:
+                self.schedule_reload(path)
+        for source in bank.sources:
+            if source not in present:
+                bank.remove_source(source)
+                self.bank_changed.emit(source)
+
+    def schedule_reload(self, path):
+        timer = self.timers.get(path)
+        if timer is None:
+            timer = self.timers[path] = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(partial(self.reload, path))
+        timer.start(SETTLE_MS)
+
+    def reload(self, path):
+        source = os.path.basename(path)
+        if not os.path.exists(path):
+            # Removed, or mid-replace; the directory scan settles which
+            self.scan_directory()
+            return
+        # Replacing a file drops it from some watchers
+        if path not in self.watcher.files():
+            self.watcher.addPath(path)
+        self.tasks[source] = run_async(self._reload_file, path,
+                                       on_done=partial(self._reloaded, source),
+                                       on_failed=partial(self._failed, source))
+
+    def _reload_file(self, path):
+        # Pool thread: parse the one file, patch the bank, then the search index
+        from ..Engine.search import get_search_index
+        bank = get_loader().bank
+        table = bank.reload_file(path)
+        if table is not None:
+            get_search_index(bank).sync()
+        return table is not None
+
+    def _reloaded(self, source, changed):
+        if changed:
+            self.bank_changed.emit(source)
+
+    def _failed(self, source, error):
+        self.source_failed.emit(source, error)
+
+_watcher = None
+
+def get_watcher():
+    """The application-wide DataWatcher; must be first called from the GUI thread"""
+    global _watcher
+    if _watcher is None:
+        _watcher = DataWatcher()
+    return _watcher